@@ -1,12 +1,28 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from database import get_session, Doador, Receptor, Pet, ItemDoacao, Usuario
-from database import hash_senha, gerar_salt, verificar_senha
+from database import leitura, transacao, Doador, Receptor, Pet, ItemDoacao, Usuario
+from database import inicializar_banco, sincronizar_itens
+from autenticacao import (SistemaOcupado, gerar_hash, criar_senha, verificar_senha, precisa_atualizar, hash_ficticio,
+                          executar_em_segundo_plano, tentativa_bloqueada, registrar_falha, registrar_sucesso,
+                          metricas_senhas)
+from armazenamento import (get_armazenamento, guardar_foto, carregar_foto, carregar_miniatura, campos_foto, tem_foto,
+                           foto_pendente, guardar_original, concluir_foto, agendar_fotos, converter_foto_legada)
+from semelhanca import possiveis_correspondencias
+from fila import iniciar_no_app, metricas_fila, listar_falhas, reenfileirar, descartar
+from imagens import ImagemInvalida, eh_webp
+from consultas import TAMANHOS_PAGINA, usa_busca_textual
+from cache_pesquisa import CachePesquisa
+from estatisticas import obter_estatisticas
+from instrumentacao import (iniciar_pagina, finalizar_pagina, medir, resumo as resumo_metricas, texto_prometheus,
+                             zerar as zerar_metricas, iniciar_servidor_metricas)
+from correspondencia import CATEGORIAS, obter_motor, categorias_do_pedido
+from geografia import RAIOS_KM, localizar_cep, distancia_km
+from exportacao import CONJUNTOS, FORMATOS, COM_FILTROS, exportar_temporario
+from importacao import ler_planilha, importar, relatorio_erros, CAMPOS as CAMPOS_IMPORTACAO, OBRIGATORIOS as OBRIGATORIOS_IMPORTACAO
+from consultas import listar_doadores, listar_receptores, listar_pets, filtrar_pets, listar_usuarios_com_contagens
 import base64
-import io
-from PIL import Image
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload, undefer
 from sqlalchemy import text
 
 # Configuração da página
@@ -302,20 +318,52 @@ def inicializar_sessao():
         st.session_state.termo_pesquisa = ''
     if 'acao_formulario' not in st.session_state:
         st.session_state.acao_formulario = None
+    if 'pesquisa_cursor' not in st.session_state:
+        st.session_state.pesquisa_cursor = {'depois': None, 'antes': None, 'pagina': 1}
+    if 'pesquisa_assinatura' not in st.session_state:
+        st.session_state.pesquisa_assinatura = None
+    if 'cache_pesquisa' not in st.session_state:
+        st.session_state.cache_pesquisa = CachePesquisa()
 
-def fazer_login(login, senha):
-    session = get_session()
+def ip_cliente():
     try:
+        return st.context.ip_address
+    except Exception:
+        return None
+
+def regravar_senha(usuario_id, senha, hash_antigo):
+    """Roda no pool de senhas: grava o hash novo só se ninguém trocou a senha nesse meio tempo"""
+    with transacao() as session:
+        session.query(Usuario).filter(Usuario.id == usuario_id, Usuario.senha_hash == hash_antigo).update(
+            {Usuario.senha_hash: gerar_hash(senha), Usuario.salt: None}, synchronize_session=False)
+
+def fazer_login(login, senha):
+    """(sucesso, mensagem); o limite de tentativas é conferido antes de calcular qualquer hash"""
+    bloqueio = tentativa_bloqueada(login, ip_cliente())
+    if bloqueio:
+        return False, bloqueio
+    with leitura() as session:
         usuario = session.query(Usuario).filter(Usuario.login == login).first()
-        if usuario and verificar_senha(senha, usuario.salt, usuario.senha_hash):
-            st.session_state.usuario_logado = usuario.login
-            st.session_state.is_admin = usuario.is_admin
-            st.session_state.user_id = usuario.id
-            st.session_state.user_cpf = usuario.cpf
-            return True
-        return False
-    finally:
-        session.close()
+    try:
+        if usuario:
+            ok = verificar_senha(senha, usuario.senha_hash, usuario.salt)
+        else:
+            verificar_senha(senha, hash_ficticio())
+            ok = False
+        if not ok:
+            registrar_falha(login)
+            return False, "Usuário ou senha inválidos"
+        registrar_sucesso(login)
+        if precisa_atualizar(usuario.senha_hash):
+            # Refaz com o algoritmo/custo atual sem atrasar o login
+            executar_em_segundo_plano(regravar_senha, usuario.id, senha, usuario.senha_hash)
+        st.session_state.usuario_logado = usuario.login
+        st.session_state.is_admin = usuario.is_admin
+        st.session_state.user_id = usuario.id
+        st.session_state.user_cpf = usuario.cpf
+        return True, "Login realizado!"
+    except SistemaOcupado as e:
+        return False, str(e)
 
 def fazer_logout():
     st.session_state.usuario_logado = None
@@ -329,17 +377,21 @@ def fazer_logout():
     st.session_state.edicao_ativa = None
     st.session_state.termo_pesquisa = ''
     st.session_state.acao_formulario = None
+    st.session_state.pesquisa_cursor = {'depois': None, 'antes': None, 'pagina': 1}
+    st.session_state.pesquisa_assinatura = None
 
 def cadastrar_usuario(login, email, whatsapp, senha, cpf):
-    session = get_session()
+    bloqueio = tentativa_bloqueada(ip=ip_cliente())
+    if bloqueio:
+        return False, bloqueio
     try:
-        # Verificar se usuário já existe
-        existe = session.query(Usuario).filter(Usuario.login == login).first()
+        with leitura() as session:
+            # Verificar se usuário já existe
+            existe = session.query(Usuario.id).filter(Usuario.login == login).first()
+            # Verificar se CPF já existe
+            existe_cpf = session.query(Usuario.id).filter(Usuario.cpf == cpf).first()
         if existe:
             return False, "Usuário já existe"
-        
-        # Verificar se CPF já existe
-        existe_cpf = session.query(Usuario).filter(Usuario.cpf == cpf).first()
         if existe_cpf:
             return False, "CPF já cadastrado"
         
@@ -349,8 +401,7 @@ def cadastrar_usuario(login, email, whatsapp, senha, cpf):
         if not validar_cpf(cpf):
             return False, "CPF inválido"
         
-        salt = gerar_salt()
-        senha_hash = hash_senha(senha, salt)
+        senha_hash = criar_senha(senha)
         
         # Definir como admin se for o CPF especial
         is_admin = (cpf == "00000000001")
@@ -360,32 +411,24 @@ def cadastrar_usuario(login, email, whatsapp, senha, cpf):
             email=email,
             whatsapp=whatsapp,
             senha_hash=senha_hash,
-            salt=salt,
             cpf=cpf,
             is_admin=is_admin
         )
         
-        session.add(novo_usuario)
-        session.commit()
+        with transacao() as session:
+            session.add(novo_usuario)
         return True, "Usuário cadastrado com sucesso!"
         
+    except SistemaOcupado as e:
+        return False, str(e)
     except Exception as e:
-        session.rollback()
         return False, f"Erro ao cadastrar: {e}"
-    finally:
-        session.close()
 
 def verificar_cpf_existente(cpf, tipo):
     """Verifica se CPF já existe no sistema"""
-    session = get_session()
-    try:
-        if tipo == "doador":
-            existe = session.query(Doador).filter(Doador.cpf == cpf).first()
-        else:  # receptor
-            existe = session.query(Receptor).filter(Receptor.cpf == cpf).first()
-        return existe is not None
-    finally:
-        session.close()
+    modelo = Doador if tipo == "doador" else Receptor
+    with leitura() as session:
+        return session.query(modelo.id).filter(modelo.cpf == cpf).first() is not None
 
 def formatar_cpf(cpf):
     """Remove formatação do CPF para verificação"""
@@ -408,34 +451,65 @@ def usuario_tem_permissao(registro):
         return True
     return False
 
-def processar_imagem(uploaded_file):
-    """Processa a imagem para salvar no banco"""
-    if uploaded_file is not None:
-        # Ler a imagem
-        image = Image.open(uploaded_file)
-        
-        # Redimensionar para tamanho razoável (opcional)
-        image.thumbnail((800, 800))
-        
-        # Converter para bytes
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='JPEG')
-        img_byte_arr = img_byte_arr.getvalue()
-        
-        return img_byte_arr
-    return None
-
-def exibir_imagem(imagem_bytes):
-    """Exibe imagem a partir de bytes"""
-    if imagem_bytes:
-        image = Image.open(io.BytesIO(imagem_bytes))
-        st.image(image, use_container_width=True)
+@medir("receber_foto")
+def receber_foto(uploaded_file):
+    """Guarda o arquivo como veio e agenda as versões no worker (fila.py); None se for recusado"""
+    try:
+        return guardar_original(uploaded_file.getvalue())
+    except ImagemInvalida as erro:
+        st.error(str(erro))
+        return None
+
+def exibir_foto_pendente():
+    st.info("⏳ Foto recebida; a versão para exibição fica pronta em instantes.")
+
+def exibir_campos_foto(campos):
+    """Preview de uma foto do formulário (campos de guardar_foto/guardar_original/campos_foto)"""
+    if campos.get('foto_legada') is not None:
+        exibir_imagem(carregar_foto(campos['foto_legada']))
+    elif campos['foto_hash']:
+        exibir_imagem(get_armazenamento().abrir(campos['foto_hash']))
+    else:
+        exibir_foto_pendente()
+
+@medir("exibir_imagem")
+def exibir_imagem(imagem_bytes, legenda=None, largura_total=True):
+    """Exibe imagem a partir dos bytes JPEG/WebP já prontos (sem decodificar com PIL)"""
+    if imagem_bytes and eh_webp(imagem_bytes):
+        # Foto com transparência: st.image recodificaria o WebP (em JPEG, sem o alfa) a cada exibição
+        largura = "width:100%" if largura_total else "max-width:100%"
+        legenda_html = f'<figcaption style="font-size:0.875rem;opacity:0.6">{legenda}</figcaption>' if legenda else ""
+        st.markdown(f'<figure style="margin:0"><img src="data:image/webp;base64,{base64.b64encode(imagem_bytes).decode()}" '
+                    f'style="{largura}">{legenda_html}</figure>', unsafe_allow_html=True)
+    elif imagem_bytes:
+        st.image(imagem_bytes, caption=legenda, width="stretch" if largura_total else "content", output_format="JPEG")
     else:
         st.info("Sem foto disponível")
 
+def exibir_correspondencias_pet(sugestoes):
+    """Pets da situação oposta (perdido x encontrado) com foto parecida (semelhanca.py)"""
+    st.markdown("**🔗 Possíveis correspondências (foto parecida):**")
+    for bits, outro in sugestoes:
+        col_foto, col_dados = st.columns([1, 3])
+        with col_foto:
+            exibir_imagem(carregar_miniatura(outro), largura_total=False)
+        with col_dados:
+            st.write(f"**{outro.nome if outro.nome else 'Sem nome'}** - {outro.situacao} em {outro.local_encontro} "
+                     f"({round(100 * (64 - bits) / 64)}% parecida)")
+            st.write(f"📞 {outro.contato}")
+
+# Banco: esquema e admin só na primeira execução do processo (reruns não repetem)
+inicializar_banco()
+# Worker da fila de tarefas dentro do app (TAREFAS_NO_APP threads; o `gerenciar.py worker` pode rodar junto)
+iniciar_no_app()
+
 # Inicializar sessão
 inicializar_sessao()
 
+# Métricas do rerun (instrumentacao.py); /metrics só sobe se METRICAS_PORTA estiver definida
+iniciar_servidor_metricas()
+iniciar_pagina(st.session_state.pagina_atual if st.session_state.usuario_logado else "Login")
+
 # Sidebar com melhorias de acessibilidade
 st.sidebar.title("Login ou Cadastro")
 
@@ -486,11 +560,12 @@ else:
                                  help="Digite sua senha")
             if st.button("Entrar", key="login_btn", width='stretch'):
                 if login and senha:
-                    if fazer_login(login, senha):
-                        st.success("Login realizado!")
+                    sucesso, mensagem = fazer_login(login, senha)
+                    if sucesso:
+                        st.success(mensagem)
                         st.rerun()
                     else:
-                        st.error("Usuário ou senha inválidos")
+                        st.error(mensagem)
                 else:
                     st.error("Preencha usuário e senha")
     
@@ -556,8 +631,7 @@ if not st.session_state.usuario_logado:
     # st.info("Faça login na sidebar para acessar o sistema completo.")
     
 else:
-    # Sessão do banco
-    session = get_session()
+    # Cada página abre sessões curtas (database.leitura/transacao) só onde acessa o banco
     
     # Página Inicial
     if st.session_state.pagina_atual == "Início":
@@ -577,24 +651,21 @@ else:
         ####
         """)
         
-        # Métricas
+        # Métricas (em cache no processo; ver estatisticas.py)
+        estatisticas = obter_estatisticas()
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            total_doadores = session.query(Doador).count()
-            st.markdown(f'<div class="metric-card"><h3>👥 Doadores</h3><h2>{total_doadores}</h2></div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="metric-card"><h3>👥 Doadores</h3><h2>{estatisticas["doadores"]}</h2></div>', unsafe_allow_html=True)
         
         with col2:
-            total_itens = session.query(ItemDoacao).count()
-            st.markdown(f'<div class="metric-card"><h3>📦 Itens</h3><h2>{total_itens}</h2></div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="metric-card"><h3>📦 Itens</h3><h2>{estatisticas["itens"]}</h2></div>', unsafe_allow_html=True)
         
         with col3:
-            total_receptores = session.query(Receptor).count()
-            st.markdown(f'<div class="metric-card"><h3>🆘 Solicitações</h3><h2>{total_receptores}</h2></div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="metric-card"><h3>🆘 Solicitações</h3><h2>{estatisticas["receptores"]}</h2></div>', unsafe_allow_html=True)
         
         with col4:
-            total_pets = session.query(Pet).count()
-            st.markdown(f'<div class="metric-card"><h3>🐾 Pets</h3><h2>{total_pets}</h2></div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="metric-card"><h3>🐾 Pets</h3><h2>{estatisticas["pets"]}</h2></div>', unsafe_allow_html=True)
 
         # Adicionar mais conteúdo para a página inicial
         st.markdown("---")
@@ -626,7 +697,9 @@ else:
         doador_editando = None
         if st.session_state.edicao_ativa and st.session_state.edicao_ativa.startswith("doador_"):
             doador_id = int(st.session_state.edicao_ativa.split("_")[1])
-            doador_editando = session.query(Doador).filter(Doador.id == doador_id).first()
+            with leitura() as session:
+                doador_editando = (session.query(Doador).options(selectinload(Doador.itens))
+                                   .filter(Doador.id == doador_id).first())
             
             if doador_editando and not usuario_tem_permissao(doador_editando):
                 st.error("Você não tem permissão para editar esta doação.")
@@ -735,10 +808,11 @@ else:
                 st.session_state.itens_doacao = []
                 for item in doador_editando.itens:
                     st.session_state.itens_doacao.append({
+                        'id': item.id,
                         'item': item.item,
                         'quantidade': item.quantidade,
                         'descricao': item.descricao or '',
-                        'foto': item.foto
+                        'foto': campos_foto(item)
                     })
             
             st.write(f"**Cadastrando {len(st.session_state.itens_doacao)} item(s)**")
@@ -780,16 +854,20 @@ else:
                 with col2:
                     # Upload de foto para o item
                     foto_item = st.file_uploader(f"Foto do Item {i+1}", 
-                                               type=['jpg', 'jpeg', 'png'], 
+                                               type=['jpg', 'jpeg', 'png', 'webp'], 
                                                key=f"foto_item_{i}")
                     if foto_item:
-                        # Processar e armazenar a imagem
-                        st.session_state.itens_doacao[i]['foto'] = processar_imagem(foto_item)
-                        st.success("✅ Foto carregada com sucesso!")
+                        # Uma vez por arquivo: guarda como veio e o worker gera as versões (no banco fica só o hash)
+                        if st.session_state.itens_doacao[i].get('upload') != foto_item.file_id:
+                            st.session_state.itens_doacao[i]['foto'] = receber_foto(foto_item)
+                            st.session_state.itens_doacao[i]['upload'] = foto_item.file_id
+                        if st.session_state.itens_doacao[i]['foto']:
+                            st.success("✅ Foto carregada com sucesso!")
                     
-                    # Exibir preview da foto se existir
+                    # Exibir preview da foto se existir (ou o aviso, enquanto o worker não terminou)
+                    st.session_state.itens_doacao[i]['foto'] = concluir_foto(st.session_state.itens_doacao[i]['foto'])
                     if st.session_state.itens_doacao[i]['foto']:
-                        exibir_imagem(st.session_state.itens_doacao[i]['foto'])
+                        exibir_campos_foto(st.session_state.itens_doacao[i]['foto'])
                     
                     # Botão para remover item (exceto se for o único)
                     if len(st.session_state.itens_doacao) > 1:
@@ -843,41 +921,38 @@ else:
                     campos_pessoais_ok = False
                 
                 if campos_pessoais_ok:
+                    # Fotos cujas versões já ficaram prontas entram completas
+                    for item_data in itens_validos:
+                        item_data['foto'] = concluir_foto(item_data['foto'])
                     try:
                         if doador_editando:
                             # ATUALIZAR DOAÇÃO EXISTENTE
                             if not usuario_tem_permissao(doador_editando):
                                 st.error("Você não tem permissão para editar esta doação.")
                             else:
-                                # Atualizar dados do doador
-                                doador_editando.nome = nome
-                                doador_editando.endereco = endereco
-                                doador_editando.numero = numero
-                                doador_editando.cep = cep
-                                doador_editando.bairro = bairro
-                                doador_editando.cidade = cidade
-                                doador_editando.estado = estado
-                                doador_editando.telefone = telefone
-                                doador_editando.whatsapp = whatsapp
-                                doador_editando.pode_entregar = pode_entregar == "Sim"
-                                doador_editando.prazo_disponibilidade = prazo_disponibilidade
-                                
-                                # Remover itens antigos
-                                for item in doador_editando.itens:
-                                    session.delete(item)
-                                
-                                # Adicionar novos itens
+                                # Foto legada dos itens só vai para o armazenamento agora, ao salvar
                                 for item_data in itens_validos:
-                                    novo_item = ItemDoacao(
-                                        doador_id=doador_editando.id,
-                                        item=item_data['item'],
-                                        quantidade=item_data['quantidade'],
-                                        descricao=item_data['descricao'].strip() if item_data['descricao'].strip() else None,
-                                        foto=item_data['foto']
-                                    )
-                                    session.add(novo_item)
+                                    item_data['foto'] = converter_foto_legada(item_data['foto'])
+                                with transacao() as session:
+                                    doador = (session.query(Doador).options(selectinload(Doador.itens))
+                                              .filter(Doador.id == doador_editando.id).one())
+                                    # Atualizar dados do doador
+                                    doador.nome = nome
+                                    doador.endereco = endereco
+                                    doador.numero = numero
+                                    doador.cep = cep
+                                    doador.bairro = bairro
+                                    doador.cidade = cidade
+                                    doador.estado = estado
+                                    doador.telefone = telefone
+                                    doador.whatsapp = whatsapp
+                                    doador.pode_entregar = pode_entregar == "Sim"
+                                    doador.prazo_disponibilidade = prazo_disponibilidade
+                                    
+                                    # Itens: atualiza por id só o que mudou, inclui os novos e apaga os removidos
+                                    sincronizar_itens(session, doador, itens_validos)
+                                agendar_fotos(item_data['foto'] for item_data in itens_validos)
                                 
-                                session.commit()
                                 st.success("Doação atualizada com sucesso!")
                                 st.session_state.edicao_ativa = None
                                 st.session_state.itens_doacao = [{'item': '', 'quantidade': 1, 'descricao': '', 'foto': None}]
@@ -885,7 +960,8 @@ else:
                         else:
                             # NOVA DOAÇÃO
                             cpf_formatado = formatar_cpf(cpf)
-                            doador_existente = session.query(Doador).filter(Doador.cpf == cpf_formatado).first()
+                            with leitura() as session:
+                                doador_existente = session.query(Doador.nome).filter(Doador.cpf == cpf_formatado).first()
                             if doador_existente:
                                 st.error("Já existe um doador cadastrado com este CPF!")
                                 st.info(f"CPF {cpf} já pertence a: {doador_existente.nome}")
@@ -908,21 +984,22 @@ else:
                                     pode_entregar=pode_entregar == "Sim",
                                     prazo_disponibilidade=prazo_disponibilidade
                                 )
-                                session.add(novo_doador)
-                                session.flush()
-                                
-                                # Cadastra os itens
-                                for item_data in itens_validos:
-                                    novo_item = ItemDoacao(
-                                        doador_id=novo_doador.id,
-                                        item=item_data['item'],
-                                        quantidade=item_data['quantidade'],
-                                        descricao=item_data['descricao'].strip() if item_data['descricao'].strip() else None,
-                                        foto=item_data['foto']
-                                    )
-                                    session.add(novo_item)
+                                with transacao() as session:
+                                    session.add(novo_doador)
+                                    session.flush()
+                                    
+                                    # Cadastra os itens
+                                    for item_data in itens_validos:
+                                        novo_item = ItemDoacao(
+                                            doador_id=novo_doador.id,
+                                            item=item_data['item'],
+                                            quantidade=item_data['quantidade'],
+                                            descricao=item_data['descricao'].strip() if item_data['descricao'].strip() else None,
+                                            **(item_data['foto'] or guardar_foto(None))
+                                        )
+                                        session.add(novo_item)
+                                agendar_fotos(item_data['foto'] for item_data in itens_validos)
                                 
-                                session.commit()
                                 st.success("Doação cadastrada com sucesso!")
                                 
                                 # Mostra resumo final
@@ -938,7 +1015,6 @@ else:
                                 st.session_state.itens_doacao = [{'item': '', 'quantidade': 1, 'descricao': '', 'foto': None}]
                             
                     except Exception as e:
-                        session.rollback()
                         st.error(f"Erro ao cadastrar doação: {e}")
                 else:
                     st.error("Preencha todos os campos obrigatórios!")
@@ -957,11 +1033,11 @@ else:
         st.markdown('<h1 class="main-header">Pesquisar Doações Disponíveis</h1>', unsafe_allow_html=True)
         
         # Filtro de pesquisa
-        col1, col2, col3 = st.columns([3, 1, 1])
+        col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
         with col1:
             termo_pesquisa = st.text_input(
                 "🔍 Pesquisar itens:", 
-                placeholder="Digite o nome do item (ex: cama, roupa, alimento...)",
+                placeholder="Digite o nome ou a descrição do item (ex: cama, roupa, alimento...)",
                 value=st.session_state.termo_pesquisa,
                 key='pesquisa_input'
             )
@@ -972,6 +1048,12 @@ else:
                 key="filtro_status"
             )
         with col3:
+            tamanho_pagina = st.selectbox(
+                "Itens por página:",
+                TAMANHOS_PAGINA,
+                key="pesquisa_tamanho_pagina"
+            )
+        with col4:
             st.write("")
             st.write("")
             if st.button("Limpar Filtros", width='stretch'):
@@ -981,31 +1063,62 @@ else:
         if termo_pesquisa != st.session_state.termo_pesquisa:
             st.session_state.termo_pesquisa = termo_pesquisa
 
-        # QUERY
+        # Perto de mim: CEP -> centroide aproximado (tabela offline), distância pelo índice espacial
+        geo1, geo2, geo3 = st.columns([2, 1, 1])
+        with geo1:
+            cep_origem = st.text_input("📍 Seu CEP (para ver distâncias):", placeholder="00000-000",
+                                       key="pesquisa_cep")
+        with geo2:
+            raio_km = st.selectbox("Distância:", [None] + RAIOS_KM, key="pesquisa_raio",
+                                   format_func=lambda raio: "Qualquer" if raio is None else f"até {raio} km")
+        with geo3:
+            st.write("")
+            st.write("")
+            por_distancia = st.checkbox("Mais próximos primeiro", key="pesquisa_por_distancia")
+        origem = localizar_cep(cep_origem) if cep_origem else None
+        if cep_origem and origem is None:
+            st.warning("CEP não reconhecido; a pesquisa segue sem filtro de distância.")
+        elif origem is not None:
+            st.caption("Distâncias aproximadas pelo CEP; doadores sem CEP reconhecido não aparecem nesta pesquisa.")
+
+        # Qualquer mudança de filtro volta para a primeira página
+        assinatura = (st.session_state.termo_pesquisa, filtro_disponibilidade, tamanho_pagina,
+                      origem, raio_km, por_distancia)
+        if assinatura != st.session_state.pesquisa_assinatura:
+            st.session_state.pesquisa_assinatura = assinatura
+            st.session_state.pesquisa_cursor = {'depois': None, 'antes': None, 'pagina': 1}
+        cursor = st.session_state.pesquisa_cursor
+
+        # QUERY - COUNT separado + uma página por keyset (A-Z, ou por relevância quando há termo).
+        # Reruns com os mesmos filtros (expander, "Ver Foto") saem do cache da sessão
+        cache = st.session_state.cache_pesquisa
         try:
-            query = session.query(ItemDoacao, Doador).join(Doador, ItemDoacao.doador_id == Doador.id)
-            
-            if st.session_state.termo_pesquisa:
-                query = query.filter(ItemDoacao.item.ilike(f"%{st.session_state.termo_pesquisa}%"))
-            
-            hoje = datetime.today().date()
-            if filtro_disponibilidade == "Disponíveis":
-                query = query.filter(Doador.prazo_disponibilidade >= hoje)
-            elif filtro_disponibilidade == "Vencidos":
-                query = query.filter(Doador.prazo_disponibilidade < hoje)
-            
-            # Ordenar por nome do item (A-Z)
-            resultados = query.order_by(ItemDoacao.item.asc()).all()
+            # Acerto no cache não chega a abrir conexão: a sessão só conecta na primeira consulta
+            with leitura() as session:
+                total_resultados = cache.contar_itens(session, st.session_state.termo_pesquisa, filtro_disponibilidade,
+                                                      origem, raio_km)
+                resultados, cursor_anterior, cursor_proximo = cache.pagina_itens(
+                    session, st.session_state.termo_pesquisa, filtro_disponibilidade, tamanho_pagina,
+                    depois=cursor['depois'], antes=cursor['antes'],
+                    origem=origem, raio_km=raio_km, por_distancia=por_distancia)
             
         except Exception as e:
             st.error(f"Erro ao carregar itens: {e}")
-            resultados = []
+            total_resultados = 0
+            resultados, cursor_anterior, cursor_proximo = [], None, None
         
         # EXIBIÇÃO COM EXPANDERS
         if not resultados:
             st.info("Nenhum item de doação encontrado com os filtros aplicados.")
         else:
-            st.write(f"**Encontrados {len(resultados)} item(s) - ordenados por nome:**")
+            total_paginas = max(1, -(-total_resultados // tamanho_pagina))
+            if por_distancia and origem is not None:
+                ordenacao = "por distância"
+            elif usa_busca_textual(st.session_state.termo_pesquisa):
+                ordenacao = "por relevância"
+            else:
+                ordenacao = "por nome"
+            st.write(f"**Encontrados {total_resultados} item(s) - ordenados {ordenacao} (página {cursor['pagina']} de {total_paginas}):**")
             
             for idx, (item, doador) in enumerate(resultados):
                 esta_vencido = doador.prazo_disponibilidade < datetime.today().date()
@@ -1020,6 +1133,8 @@ else:
                     doador_nome = doador_nome[:20] + "..."
                 
                 expander_title = f"{status_icon} {item.item} | QTDE: {item.quantidade} | 👤 {doador_nome} | {entrega_icon} {'Sim' if doador.pode_entregar else 'Não'}"
+                if origem is not None and doador.latitude is not None:
+                    expander_title += f" | 📍 ~{distancia_km(origem, (doador.latitude, doador.longitude)):.0f} km"
                 
                 with st.expander(expander_title, expanded=False):
                     col1, col2 = st.columns([2, 1])
@@ -1045,19 +1160,40 @@ else:
                     
                     with col2:
                         # Foto com possibilidade de expandir
-                        if item.foto:
+                        if foto_pendente(item):
+                            exibir_foto_pendente()
+                        elif tem_foto(item):
+                            # O resultado em cache não traz os bytes legados: só essas linhas vão ao banco
+                            registro_foto = item
+                            if not item.foto_hash:
+                                with leitura() as session:
+                                    registro_foto = session.get(ItemDoacao, item.id, options=[undefer(ItemDoacao.foto)])
                             # Exibir foto em tamanho médio que pode ser clicada para expandir
                             if st.button("📸 Ver Foto em Tamanho Real", key=f"foto_{item.id}", width='stretch'):
                                 # Se clicar no botão, exibe a foto em tamanho grande
-                                exibir_imagem(item.foto)
+                                exibir_imagem(carregar_foto(registro_foto))
                             else:
-                                # Exibe preview pequeno
-                                image = Image.open(io.BytesIO(item.foto))
-                                image.thumbnail((150, 150))
-                                st.image(image, caption="Preview da foto")
+                                # Exibe o preview de 150px gerado no upload
+                                exibir_imagem(carregar_miniatura(registro_foto), legenda="Preview da foto", largura_total=False)
                         else:
                             st.info("Sem foto disponível")
 
+            # Navegação entre páginas (o cursor fica no session_state)
+            nav1, nav2, nav3 = st.columns([1, 2, 1])
+            with nav1:
+                if st.button("⬅️ Anterior", key="pesquisa_anterior", disabled=cursor_anterior is None, width='stretch'):
+                    st.session_state.pesquisa_cursor = {'depois': None, 'antes': cursor_anterior,
+                                                        'pagina': cursor['pagina'] - 1}
+                    st.rerun()
+            with nav2:
+                st.markdown(f"<p style='text-align: center;'>Página {cursor['pagina']} de {total_paginas}</p>",
+                            unsafe_allow_html=True)
+            with nav3:
+                if st.button("Próxima ➡️", key="pesquisa_proxima", disabled=cursor_proximo is None, width='stretch'):
+                    st.session_state.pesquisa_cursor = {'depois': cursor_proximo, 'antes': None,
+                                                        'pagina': cursor['pagina'] + 1}
+                    st.rerun()
+
     # Solicitar Ajuda
     elif st.session_state.pagina_atual == "Solicitar Ajuda":
         st.markdown('<h1 class="main-header">Solicitar Ajuda</h1>', unsafe_allow_html=True)
@@ -1066,7 +1202,8 @@ else:
         receptor_editando = None
         if st.session_state.edicao_ativa and st.session_state.edicao_ativa.startswith("receptor_"):
             receptor_id = int(st.session_state.edicao_ativa.split("_")[1])
-            receptor_editando = session.query(Receptor).filter(Receptor.id == receptor_id).first()
+            with leitura() as session:
+                receptor_editando = session.query(Receptor).filter(Receptor.id == receptor_id).first()
             
             if receptor_editando and not usuario_tem_permissao(receptor_editando):
                 st.error("Você não tem permissão para editar esta solicitação.")
@@ -1116,6 +1253,12 @@ else:
                 pode_retirar = st.selectbox("Pode retirar os itens?*", ["", "Sim", "Não"],
                                           index=1 if receptor_editando and receptor_editando.pode_retirar else 0)
             
+            necessidades = st.multiselect("Do que você precisa?", list(CATEGORIAS),
+                                          default=[chave for chave in (receptor_editando.necessidades or "").split(",")
+                                                   if chave in CATEGORIAS] if receptor_editando else [],
+                                          format_func=lambda chave: CATEGORIAS[chave][0],
+                                          help="Deixe vazio se precisa de qualquer tipo de item")
+            
             st.subheader("Endereço para Entrega")
             col1, col2 = st.columns(2)
             
@@ -1156,19 +1299,20 @@ else:
                             if not usuario_tem_permissao(receptor_editando):
                                 st.error("Você não tem permissão para editar esta solicitação.")
                             else:
-                                receptor_editando.nome = nome
-                                receptor_editando.endereco = endereco
-                                receptor_editando.numero = numero
-                                receptor_editando.cep = cep
-                                receptor_editando.bairro = bairro
-                                receptor_editando.cidade = cidade
-                                receptor_editando.estado = estado
-                                receptor_editando.telefone = telefone
-                                receptor_editando.whatsapp = whatsapp
-                                receptor_editando.qtde_pessoas = qtde_pessoas
-                                receptor_editando.pode_retirar = pode_retirar == "Sim"
-                                
-                                session.commit()
+                                with transacao() as session:
+                                    receptor = session.get(Receptor, receptor_editando.id)
+                                    receptor.nome = nome
+                                    receptor.endereco = endereco
+                                    receptor.numero = numero
+                                    receptor.cep = cep
+                                    receptor.bairro = bairro
+                                    receptor.cidade = cidade
+                                    receptor.estado = estado
+                                    receptor.telefone = telefone
+                                    receptor.whatsapp = whatsapp
+                                    receptor.qtde_pessoas = qtde_pessoas
+                                    receptor.pode_retirar = pode_retirar == "Sim"
+                                    receptor.necessidades = ",".join(necessidades) or None
                                 
                                 st.success("Solicitação atualizada com sucesso!")
                                 st.session_state.edicao_ativa = None
@@ -1177,7 +1321,8 @@ else:
                             # NOVA SOLICITAÇÃO
                             # VERIFICAR SE CPF JÁ EXISTE (verificação final)
                             cpf_formatado = formatar_cpf(cpf)
-                            receptor_existente = session.query(Receptor).filter(Receptor.cpf == cpf_formatado).first()
+                            with leitura() as session:
+                                receptor_existente = session.query(Receptor.nome).filter(Receptor.cpf == cpf_formatado).first()
                             if receptor_existente:
                                 st.error("Já existe uma solicitação cadastrada com este CPF!")
                                 st.info(f"CPF {cpf} já pertence a: {receptor_existente.nome}")
@@ -1197,11 +1342,12 @@ else:
                                     telefone=telefone,
                                     whatsapp=whatsapp,
                                     qtde_pessoas=qtde_pessoas,
-                                    pode_retirar=pode_retirar == "Sim"
+                                    pode_retirar=pode_retirar == "Sim",
+                                    necessidades=",".join(necessidades) or None
                                 )
                                 
-                                session.add(novo_receptor)
-                                session.commit()
+                                with transacao() as session:
+                                    session.add(novo_receptor)
                                 
                                 st.success("Solicitação de ajuda cadastrada com sucesso!")
                                 
@@ -1214,7 +1360,6 @@ else:
                                 """)
                             
                     except Exception as e:
-                        session.rollback()
                         st.error(f"Erro ao cadastrar solicitação: {e}")
                 else:
                     st.error("Preencha todos os campos obrigatórios!")
@@ -1237,7 +1382,8 @@ else:
             pet_editando = None
             if st.session_state.edicao_ativa and st.session_state.edicao_ativa.startswith("pet_"):
                 pet_id = int(st.session_state.edicao_ativa.split("_")[1])
-                pet_editando = session.query(Pet).filter(Pet.id == pet_id).first()
+                with leitura() as session:
+                    pet_editando = session.query(Pet).filter(Pet.id == pet_id).first()
                 
                 if pet_editando and not usuario_tem_permissao(pet_editando):
                     st.error("Você não tem permissão para editar este pet.")
@@ -1273,17 +1419,25 @@ else:
                 # Upload de foto do pet
                 st.subheader("Foto do Pet")
                 foto_pet = st.file_uploader("Adicione uma foto do pet (opcional)", 
-                                          type=['jpg', 'jpeg', 'png'],
+                                          type=['jpg', 'jpeg', 'png', 'webp'],
                                           key="foto_pet_upload")
                 
+                foto_pet_campos = None
                 if foto_pet:
-                    foto_processada = processar_imagem(foto_pet)
-                    st.success("✅ Foto carregada com sucesso!")
-                    if foto_processada:
-                        exibir_imagem(foto_processada)
-                elif pet_editando and pet_editando.foto:
+                    # Uma vez por arquivo, como nos itens de doação
+                    if st.session_state.get('foto_pet_arquivo') != foto_pet.file_id:
+                        st.session_state.foto_pet_campos = receber_foto(foto_pet)
+                        st.session_state.foto_pet_arquivo = foto_pet.file_id
+                    foto_pet_campos = st.session_state.foto_pet_campos = concluir_foto(st.session_state.foto_pet_campos)
+                    if foto_pet_campos:
+                        st.success("✅ Foto carregada com sucesso!")
+                        exibir_campos_foto(foto_pet_campos)
+                elif pet_editando and foto_pendente(pet_editando):
+                    st.info("Foto atual do pet:")
+                    exibir_foto_pendente()
+                elif pet_editando and tem_foto(pet_editando):
                     st.info("Foto atual do pet:")
-                    exibir_imagem(pet_editando.foto)
+                    exibir_imagem(carregar_foto(pet_editando))
                 
                 if pet_editando:
                     submitted = st.form_submit_button("💾 Atualizar Pet", width='stretch')
@@ -1300,17 +1454,21 @@ else:
                                 if not usuario_tem_permissao(pet_editando):
                                     st.error("Você não tem permissão para editar este pet.")
                                 else:
-                                    pet_editando.nome = nome if nome else None
-                                    pet_editando.especie = especie
-                                    pet_editando.raca = raca if raca else None
-                                    pet_editando.descricao = descricao
-                                    pet_editando.situacao = situacao
-                                    pet_editando.local_encontro = local_encontro
-                                    pet_editando.contato = contato
-                                    if foto_pet:
-                                        pet_editando.foto = processar_imagem(foto_pet)
+                                    with transacao() as session:
+                                        pet = session.get(Pet, pet_editando.id)
+                                        pet.nome = nome if nome else None
+                                        pet.especie = especie
+                                        pet.raca = raca if raca else None
+                                        pet.descricao = descricao
+                                        pet.situacao = situacao
+                                        pet.local_encontro = local_encontro
+                                        pet.contato = contato
+                                        if foto_pet_campos:
+                                            for campo, valor in foto_pet_campos.items():
+                                                setattr(pet, campo, valor)
+                                            pet.foto = None
+                                    agendar_fotos([foto_pet_campos])
                                     
-                                    session.commit()
                                     st.success("Pet atualizado com sucesso!")
                                     st.session_state.edicao_ativa = None
                                     
@@ -1327,15 +1485,15 @@ else:
                                     situacao=situacao,
                                     local_encontro=local_encontro,
                                     contato=contato,
-                                    foto=processar_imagem(foto_pet) if foto_pet else None
+                                    **(foto_pet_campos or guardar_foto(None))
                                 )
                                 
-                                session.add(novo_pet)
-                                session.commit()
+                                with transacao() as session:
+                                    session.add(novo_pet)
+                                agendar_fotos([foto_pet_campos])
                                 st.success("Pet cadastrado com sucesso!")
                                 
                         except Exception as e:
-                            session.rollback()
                             st.error(f"Erro ao cadastrar pet: {e}")
                     else:
                         st.error("Preencha todos os campos obrigatórios!")
@@ -1349,7 +1507,9 @@ else:
         
         with tab2:
             st.subheader("Pets Cadastrados")
-            pets = session.query(Pet).all()
+            with leitura() as session:
+                pets = listar_pets(session)
+                sugestoes_pets = possiveis_correspondencias(session, pets)
             
             if not pets:
                 st.info("Nenhum pet cadastrado ainda.")
@@ -1369,11 +1529,16 @@ else:
                             st.write(f"**Cadastrado por:** {pet.usuario.login}")
                         
                         with col2:
-                            if pet.foto:
-                                exibir_imagem(pet.foto)
+                            if foto_pendente(pet):
+                                exibir_foto_pendente()
+                            elif tem_foto(pet):
+                                exibir_imagem(carregar_foto(pet))
                             else:
                                 st.info("📷 Sem foto disponível")
                         
+                        if pet.id in sugestoes_pets:
+                            exibir_correspondencias_pet(sugestoes_pets[pet.id])
+                        
                         # Botões de ação
                         if usuario_tem_permissao(pet):
                             col_edit, col_del = st.columns(2)
@@ -1386,8 +1551,8 @@ else:
                             
                             with col_del:
                                 if st.button("🗑️ Excluir", key=f"del_pet_{pet.id}", width='stretch'):
-                                    session.delete(pet)
-                                    session.commit()
+                                    with transacao() as session:
+                                        session.delete(session.get(Pet, pet.id))
                                     st.success("Pet excluído com sucesso!")
                                     st.rerun()
                         
@@ -1409,18 +1574,9 @@ else:
                     pass
             
             # Buscar pets com filtros
-            pets_query = session.query(Pet)
-            
-            if filtro_especie != "Todas":
-                pets_query = pets_query.filter(Pet.especie == filtro_especie)
-            
-            if filtro_situacao != "Todas":
-                pets_query = pets_query.filter(Pet.situacao == filtro_situacao)
-            
-            if filtro_nome:
-                pets_query = pets_query.filter(Pet.nome.ilike(f"%{filtro_nome}%"))
-            
-            pets_filtrados = pets_query.all()
+            with leitura() as session:
+                pets_filtrados = filtrar_pets(session, filtro_especie, filtro_situacao, filtro_nome)
+                sugestoes_pets = possiveis_correspondencias(session, pets_filtrados)
             
             if not pets_filtrados:
                 st.info("Nenhum pet encontrado com os filtros aplicados.")
@@ -1432,8 +1588,10 @@ else:
                         col1, col2 = st.columns([1, 2])
                         
                         with col1:
-                            if pet.foto:
-                                exibir_imagem(pet.foto)
+                            if foto_pendente(pet):
+                                exibir_foto_pendente()
+                            elif tem_foto(pet):
+                                exibir_imagem(carregar_foto(pet))
                             else:
                                 st.info("📷 Sem foto disponível")
                         
@@ -1450,17 +1608,21 @@ else:
                             st.write(f"**📅 Cadastrado em:** {pet.data_cadastro.strftime('%d/%m/%Y')}")
                             st.markdown('</div>', unsafe_allow_html=True)
                         
+                        if pet.id in sugestoes_pets:
+                            exibir_correspondencias_pet(sugestoes_pets[pet.id])
+                        
                         st.divider()
 
     # Visualizar Cadastros
     elif st.session_state.pagina_atual == "Visualizar Cadastros":
         st.markdown('<h1 class="main-header">Visualizar Cadastros</h1>', unsafe_allow_html=True)
         
-        tab1, tab2, tab3 = st.tabs(["Doações", "Solicitações", "Pets"])
+        tab1, tab2, tab3, tab4 = st.tabs(["Doações", "Solicitações", "Pets", "Correspondências"])
         
         with tab1:
             st.subheader("Doações Cadastradas")
-            doadores = session.query(Doador).all()
+            with leitura() as session:
+                doadores = listar_doadores(session)
             
             if not doadores:
                 st.info("Nenhuma doação cadastrada ainda.")
@@ -1489,9 +1651,11 @@ else:
                                     st.write(f"• {item.quantidade}x {item.item}" + 
                                            (f" - {item.descricao}" if item.descricao else ""))
                                 with col_item2:
-                                    if item.foto:
+                                    if foto_pendente(item):
+                                        st.caption("⏳ Foto em processamento")
+                                    elif tem_foto(item):
                                         if st.button("📷 Ver Foto", key=f"foto_item_{item.id}", width='stretch'):
-                                            exibir_imagem(item.foto)
+                                            exibir_imagem(carregar_foto(item))
                         
                         # Botões de ação - apenas para usuário que criou ou admin
                         if usuario_tem_permissao(doador):
@@ -1505,17 +1669,19 @@ else:
                             
                             with col_del:
                                 if st.button("🗑️ Excluir", key=f"del_doador_{doador.id}", width='stretch'):
-                                    # Excluir itens primeiro
-                                    for item in doador.itens:
-                                        session.delete(item)
-                                    session.delete(doador)
-                                    session.commit()
+                                    with transacao() as session:
+                                        registro = session.get(Doador, doador.id, options=[selectinload(Doador.itens)])
+                                        # Excluir itens primeiro
+                                        for item in registro.itens:
+                                            session.delete(item)
+                                        session.delete(registro)
                                     st.success("Doação excluída com sucesso!")
                                     st.rerun()
         
         with tab2:
             st.subheader("Solicitações de Ajuda")
-            receptores = session.query(Receptor).all()
+            with leitura() as session:
+                receptores = listar_receptores(session)
             
             if not receptores:
                 st.info("Nenhuma solicitação de ajuda cadastrada ainda.")
@@ -1529,6 +1695,8 @@ else:
                             st.write(f"**WhatsApp:** {receptor.whatsapp}")
                             st.write(f"**Pessoas na família:** {receptor.qtde_pessoas}")
                             st.write(f"**Pode retirar:** {'Sim' if receptor.pode_retirar else 'Não'}")
+                            if receptor.necessidades:
+                                st.write(f"**Precisa de:** {', '.join(CATEGORIAS[c][0] for c in categorias_do_pedido(receptor.necessidades))}")
                         
                         with col2:
                             st.write(f"**Endereço:** {receptor.endereco}, {receptor.numero}")
@@ -1548,14 +1716,15 @@ else:
                             
                             with col_del:
                                 if st.button("🗑️ Excluir", key=f"del_receptor_{receptor.id}", width='stretch'):
-                                    session.delete(receptor)
-                                    session.commit()
+                                    with transacao() as session:
+                                        session.delete(session.get(Receptor, receptor.id))
                                     st.success("Solicitação excluída com sucesso!")
                                     st.rerun()
         
         with tab3:
             st.subheader("Pets Cadastrados")
-            pets = session.query(Pet).all()
+            with leitura() as session:
+                pets = listar_pets(session)
             
             if not pets:
                 st.info("Nenhum pet cadastrado ainda.")
@@ -1573,8 +1742,10 @@ else:
                             st.write(f"**Contato:** {pet.contato}")
                         
                         with col2:
-                            if pet.foto:
-                                exibir_imagem(pet.foto)
+                            if foto_pendente(pet):
+                                exibir_foto_pendente()
+                            elif tem_foto(pet):
+                                exibir_imagem(carregar_foto(pet))
                             else:
                                 st.info("📷 Sem foto disponível")
                             
@@ -1593,10 +1764,38 @@ else:
                             
                             with col_del:
                                 if st.button("🗑️ Excluir", key=f"del_pet_{pet.id}", width='stretch'):
-                                    session.delete(pet)
-                                    session.commit()
+                                    with transacao() as session:
+                                        session.delete(session.get(Pet, pet.id))
                                     st.success("Pet excluído com sucesso!")
                                     st.rerun()
+        
+        with tab4:
+            st.subheader("Doações sugeridas para cada solicitação")
+            motor = obter_motor()
+            
+            if not motor.pedidos:
+                st.info("Nenhuma solicitação de ajuda cadastrada ainda.")
+            else:
+                pedidos = sorted(motor.pedidos.values(), key=lambda pedido: pedido.nome or "")
+                pedido = st.selectbox("Solicitação", pedidos, key="correspondencia_pedido",
+                                      format_func=lambda p: f"{p.nome} - {p.cidade.title()}/{p.estado.upper()} "
+                                                            f"({p.qtde_pessoas} pessoa(s))")
+                candidatos = motor.resultado(pedido.id)
+                if not candidatos:
+                    st.info("Nenhuma doação disponível combina com esta solicitação.")
+                else:
+                    st.dataframe(pd.DataFrame([{
+                        'Pontuação': pontuacao,
+                        'Item': oferta.item,
+                        'Categoria': CATEGORIAS[oferta.categoria][0],
+                        'Quantidade': oferta.quantidade,
+                        'Doador': oferta.doador_nome,
+                        'WhatsApp': oferta.whatsapp,
+                        'Bairro': oferta.bairro.title(),
+                        'Cidade': oferta.cidade.title(),
+                        'Entrega': 'Sim' if oferta.pode_entregar else 'Não',
+                        'Disponível até': oferta.prazo.strftime('%d/%m/%Y'),
+                    } for pontuacao, oferta in candidatos]), hide_index=True, width='stretch')
 
     # Administração
     elif st.session_state.pagina_atual == "Administração":
@@ -1606,28 +1805,190 @@ else:
             st.error("Acesso negado. Apenas administradores podem acessar esta página.")
         else:
             st.subheader("Estatísticas do Sistema")
+            estatisticas = obter_estatisticas()
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                total_usuarios = session.query(Usuario).count()
-                st.metric("Total de Usuários", total_usuarios)
+                st.metric("Total de Usuários", estatisticas["usuarios"])
             
             with col2:
-                total_doadores = session.query(Doador).count()
-                st.metric("Doadores", total_doadores)
+                st.metric("Doadores", estatisticas["doadores"])
             
             with col3:
-                total_receptores = session.query(Receptor).count()
-                st.metric("Solicitantes", total_receptores)
+                st.metric("Solicitantes", estatisticas["receptores"])
             
             with col4:
-                total_pets = session.query(Pet).count()
-                st.metric("Pets", total_pets)
-            
+                st.metric("Pets", estatisticas["pets"])
+
+            st.subheader("Fila de Senhas")
+            metricas = metricas_senhas()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Na fila", metricas["na_fila"], help=f"Máximo observado: {metricas['fila_maxima']}")
+            with col2:
+                st.metric("Processados", metricas["concluidos"],
+                          help=f"{metricas['workers']} worker(s), {metricas['algoritmo']}")
+            with col3:
+                st.metric("Recusados", metricas["recusados"] + metricas["esgotados"],
+                          help="Fila cheia ou tempo de espera esgotado")
+            with col4:
+                st.metric("Espera / cálculo", f"{metricas['espera_media_ms']:.0f} / {metricas['execucao_media_ms']:.0f} ms")
+
+            st.subheader("Fila de Tarefas")
+            with leitura() as session:
+                fila = metricas_fila(session)
+                falhas = listar_falhas(session)
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Pendentes", fila['pendentes'], help=f"{fila['executando']} executando agora; "
+                                                               f"a mais antiga espera há {fila['atraso_s']:.0f} s")
+            with col2:
+                st.metric("Concluídas / min", f"{fila['por_minuto']:.1f}",
+                          help=f"{fila['concluidas']} nos últimos {fila['janela_min']} min")
+            with col3:
+                st.metric("Execução p50 / p95", f"{fila['duracao_p50_ms']:.0f} / {fila['duracao_p95_ms']:.0f} ms")
+            with col4:
+                st.metric("Espera p50 / p95", f"{fila['espera_p50_ms'] / 1000:.1f} / {fila['espera_p95_ms'] / 1000:.1f} s",
+                          help="Da inclusão na fila até um worker pegar a tarefa")
+            if not falhas:
+                st.caption("Nenhuma tarefa com falha.")
+            else:
+                st.warning(f"{len(falhas)} tarefa(s) esgotaram as tentativas. Selecione para reenfileirar ou descartar.")
+                selecao = st.dataframe(pd.DataFrame([{
+                    'Id': falha.id,
+                    'Tipo': falha.tipo,
+                    'Chave': falha.chave,
+                    'Tentativas': falha.tentativas,
+                    'Erro': falha.erro.strip().splitlines()[-1] if falha.erro else '',
+                    'Criada em': falha.criada_em.strftime('%d/%m/%Y %H:%M'),
+                    'Falhou em': falha.concluida_em.strftime('%d/%m/%Y %H:%M') if falha.concluida_em else '',
+                } for falha in falhas]), hide_index=True, width='stretch', on_select="rerun",
+                    selection_mode="multi-row", key="tarefas_falhas")
+                selecionadas = [falhas[linha].id for linha in selecao.selection.rows]
+                col1, col2 = st.columns(2)
+                with col1:
+                    if st.button("🔁 Reenfileirar", key="tarefas_reenfileirar", disabled=not selecionadas,
+                                 width='stretch'):
+                        reenfileirar(selecionadas)
+                        st.rerun()
+                with col2:
+                    if st.button("🗑️ Descartar", key="tarefas_descartar", disabled=not selecionadas,
+                                 width='stretch'):
+                        descartar(selecionadas)
+                        st.rerun()
+
+            st.subheader("Desempenho por Página")
+            paginas_metricas, blocos_metricas = resumo_metricas()
+            if not paginas_metricas:
+                st.info("Nenhum rerun medido ainda neste processo.")
+            else:
+                st.caption("Percentis das últimas medidas de cada página, neste processo. "
+                           "SQL = tempo somado dos comandos do rerun.")
+                st.dataframe(pd.DataFrame([{
+                    'Página': linha['pagina'],
+                    'Reruns': linha['reruns'],
+                    'p50 (ms)': round(linha['p50_ms'], 1),
+                    'p95 (ms)': round(linha['p95_ms'], 1),
+                    'p99 (ms)': round(linha['p99_ms'], 1),
+                    'SQL p50 (ms)': round(linha['sql_p50_ms'], 1),
+                    'SQL p95 (ms)': round(linha['sql_p95_ms'], 1),
+                    'Comandos/rerun': round(linha['comandos_media'], 1),
+                    'Comando p99 (ms)': round(linha['consulta_p99_ms'], 2),
+                } for linha in paginas_metricas]), hide_index=True, width='stretch')
+                if blocos_metricas:
+                    st.dataframe(pd.DataFrame([{
+                        'Bloco': linha['bloco'],
+                        'Página': linha['pagina'],
+                        'Chamadas': linha['chamadas'],
+                        'p50 (ms)': round(linha['p50_ms'], 1),
+                        'p95 (ms)': round(linha['p95_ms'], 1),
+                        'p99 (ms)': round(linha['p99_ms'], 1),
+                    } for linha in blocos_metricas]), hide_index=True, width='stretch')
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button("📈 Métricas (Prometheus)", texto_prometheus, file_name="metricas.txt",
+                                   mime="text/plain", key="metricas_btn", on_click="ignore", width='stretch')
+            with col2:
+                if st.button("🧹 Zerar métricas", key="zerar_metricas_btn", width='stretch'):
+                    zerar_metricas()
+                    st.rerun()
+
+            st.subheader("Importar Planilha")
+            tipo_importacao = st.radio("Tipo de cadastro", ["doacoes", "solicitacoes"], horizontal=True,
+                                       key="importacao_tipo",
+                                       format_func=lambda tipo: "Doações" if tipo == "doacoes" else "Solicitações de ajuda")
+            st.caption(f"Colunas: {', '.join(CAMPOS_IMPORTACAO[tipo_importacao])}. "
+                       f"Obrigatórias: {', '.join(OBRIGATORIOS_IMPORTACAO[tipo_importacao])}."
+                       + (" Uma linha por item; linhas com o mesmo CPF formam uma doação."
+                          if tipo_importacao == "doacoes" else ""))
+            st.download_button("📄 Baixar modelo", ";".join(CAMPOS_IMPORTACAO[tipo_importacao]) + "\n",
+                               file_name=f"modelo_{tipo_importacao}.csv", mime="text/csv", key="importacao_modelo")
+            planilha = st.file_uploader("Planilha (CSV ou XLSX)", type=["csv", "xlsx"], key="importacao_arquivo")
+            if planilha and st.button("📥 Importar", key="importacao_btn", type="primary"):
+                try:
+                    tabela = ler_planilha(planilha, planilha.name)
+                    with st.spinner(f"Importando {len(tabela)} linha(s)..."):
+                        resultado = importar(tabela, tipo_importacao, usuario_id=st.session_state.user_id)
+                except Exception as e:
+                    st.error(f"Erro ao ler a planilha: {e}")
+                else:
+                    st.success(f"{resultado['cadastrados']} cadastro(s) e {resultado['itens']} item(ns) "
+                               f"importados de {len(tabela)} linha(s).")
+                    if resultado['ignoradas']:
+                        st.warning(f"Colunas ignoradas: {', '.join(resultado['ignoradas'])}")
+                    if resultado['erros']:
+                        st.error(f"{len(resultado['erros'])} linha(s) não importada(s).")
+                        st.dataframe(pd.DataFrame(resultado['erros'][:200]), hide_index=True, width='stretch')
+                        st.download_button("📄 Baixar relatório de erros", relatorio_erros(resultado['erros']),
+                                           file_name="erros_importacao.csv", mime="text/csv",
+                                           key="importacao_relatorio")
+
+            st.subheader("Exportar Dados")
+            col1, col2 = st.columns(2)
+            with col1:
+                conjunto = st.selectbox("Dados", list(CONJUNTOS), key="exportacao_conjunto",
+                                        format_func=lambda nome: CONJUNTOS[nome][0])
+            with col2:
+                formato = st.selectbox("Formato", list(FORMATOS), key="exportacao_formato",
+                                       format_func=lambda nome: FORMATOS[nome][0])
+            if formato == "xlsx":
+                st.caption("O Excel é gerado bem mais devagar que CSV/Parquet (alguns milhares de linhas por segundo); "
+                           "para tabelas grandes prefira CSV ou Parquet.")
+            filtros = {}
+            if conjunto in COM_FILTROS:
+                # Mesmos filtros da página "Pesquisar Doações"
+                col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+                with col1:
+                    filtros['termo'] = st.text_input("Termo", key="exportacao_termo",
+                                                     placeholder="item ou descrição (vazio = todos)")
+                with col2:
+                    filtros['filtro_disponibilidade'] = st.selectbox("Status", ["Todos", "Disponíveis", "Vencidos"],
+                                                                     key="exportacao_status")
+                with col3:
+                    cep_exportacao = st.text_input("CEP de origem", key="exportacao_cep", placeholder="00000-000")
+                with col4:
+                    filtros['raio_km'] = st.selectbox("Distância", [None] + RAIOS_KM, key="exportacao_raio",
+                                                      format_func=lambda raio: "Qualquer" if raio is None else f"até {raio} km")
+                filtros['origem'] = localizar_cep(cep_exportacao) if cep_exportacao else None
+                if cep_exportacao and filtros['origem'] is None:
+                    st.warning("CEP não reconhecido; a exportação segue sem filtro de distância.")
+
+            def gerar_exportacao(conjunto=conjunto, formato=formato, filtros=filtros):
+                # Roda em outra thread quando o botão é clicado: sessão própria. O download_button
+                # não aceita o arquivo temporário e guarda o conteúdo inteiro na memória de qualquer jeito
+                with leitura() as session_exportacao, \
+                        exportar_temporario(session_exportacao, conjunto, formato, **filtros) as arquivo:
+                    return arquivo.read()
+
+            st.download_button(f"📤 Exportar {CONJUNTOS[conjunto][0].lower()} ({FORMATOS[formato][0]})",
+                               gerar_exportacao, file_name=f"{conjunto}_{datetime.now():%Y%m%d_%H%M}.{formato}",
+                               mime=FORMATOS[formato][1], key="exportacao_btn", on_click="ignore")
+
             st.subheader("Gerenciamento de Usuários")
-            usuarios = session.query(Usuario).all()
+            with leitura() as session:
+                usuarios = listar_usuarios_com_contagens(session)
             
-            for usuario in usuarios:
+            for usuario, total_doacoes, total_solicitacoes, total_pets_usuario in usuarios:
                 with st.expander(f"Usuário: {usuario.login} - Admin: {usuario.is_admin}", expanded=False):
                     col1, col2 = st.columns(2)
                     
@@ -1637,18 +1998,17 @@ else:
                         st.write(f"**Data de cadastro:** {usuario.data_cadastro.strftime('%d/%m/%Y %H:%M')}")
                     
                     with col2:
-                        st.write(f"**Doações cadastradas:** {len(usuario.doadores)}")
-                        st.write(f"**Solicitações cadastradas:** {len(usuario.receptores)}")
-                        st.write(f"**Pets cadastrados:** {len(usuario.pets)}")
+                        st.write(f"**Doações cadastradas:** {total_doacoes}")
+                        st.write(f"**Solicitações cadastradas:** {total_solicitacoes}")
+                        st.write(f"**Pets cadastrados:** {total_pets_usuario}")
                     
                     # Toggle para status de admin
                     if st.button(f"{'🔴 Remover Admin' if usuario.is_admin else '🟢 Tornar Admin'}", 
                                 key=f"admin_toggle_{usuario.id}", width='stretch'):
-                        usuario.is_admin = not usuario.is_admin
-                        session.commit()
+                        with transacao() as session:
+                            registro = session.get(Usuario, usuario.id)
+                            registro.is_admin = not registro.is_admin
                         st.success(f"Status de admin alterado para {usuario.login}")
                         st.rerun()
 
-    # Fechar sessão
-    session.close()
-
+finalizar_pagina()
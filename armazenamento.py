@@ -0,0 +1,281 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+from PIL import Image
+from sqlalchemy import inspect, select
+from imagens import gerar_rendicoes, abrir_imagem, hash_perceptual, ImagemInvalida
+from fila import tarefa, enfileirar, resultado_tarefa
+
+# Diretório padrão das fotos (pode ser trocado pela variável de ambiente FOTOS_DIR)
+FOTOS_DIR = os.environ.get("FOTOS_DIR", "fotos")
+# Arquivo sem referência só é apagado depois desse tempo sem ser gravado: o upload grava antes
+# de a linha existir (o formulário pode ficar aberto) e o mesmo conteúdo é reaproveitado
+FOTOS_CARENCIA_HORAS = float(os.environ.get("FOTOS_CARENCIA_HORAS", "24"))
+
+class ArmazenamentoFotos:
+    """Interface mínima para guardar fotos pelo hash do conteúdo"""
+
+    def salvar(self, dados):
+        """Guarda os bytes e retorna o digest (sha256 hex)"""
+        raise NotImplementedError
+
+    def abrir(self, digest):
+        """Retorna os bytes guardados para o digest ou None"""
+        raise NotImplementedError
+
+    def existe(self, digest):
+        raise NotImplementedError
+
+    def remover(self, digest):
+        raise NotImplementedError
+
+    def listar(self):
+        """(digest, momento da última gravação em segundos desde a época) de tudo que está guardado"""
+        raise NotImplementedError
+
+class ArmazenamentoLocal(ArmazenamentoFotos):
+    """Árvore de arquivos nomeados pelo hash: raiz/ab/cd/abcd..."""
+
+    def __init__(self, raiz=FOTOS_DIR):
+        self.raiz = raiz
+
+    def _caminho(self, digest):
+        return os.path.join(self.raiz, digest[:2], digest[2:4], digest)
+
+    def salvar(self, dados):
+        digest = hashlib.sha256(dados).hexdigest()
+        caminho = self._caminho(digest)
+        # Conteúdo igual = mesmo arquivo, então duplicatas são gravadas uma vez só
+        if os.path.exists(caminho):
+            # Reenvio conta como gravação nova: limpar_fotos_sem_uso respeita a carência a partir daqui
+            os.utime(caminho)
+        else:
+            pasta = os.path.dirname(caminho)
+            os.makedirs(pasta, exist_ok=True)
+            # Grava em arquivo temporário e renomeia para nunca deixar foto pela metade
+            fd, temporario = tempfile.mkstemp(dir=pasta)
+            try:
+                with os.fdopen(fd, "wb") as arquivo:
+                    arquivo.write(dados)
+                os.replace(temporario, caminho)
+            except Exception:
+                if os.path.exists(temporario):
+                    os.remove(temporario)
+                raise
+        return digest
+
+    def abrir(self, digest):
+        try:
+            with open(self._caminho(digest), "rb") as arquivo:
+                return arquivo.read()
+        except FileNotFoundError:
+            return None
+
+    def existe(self, digest):
+        return os.path.exists(self._caminho(digest))
+
+    def remover(self, digest):
+        try:
+            os.remove(self._caminho(digest))
+        except FileNotFoundError:
+            pass
+
+    def listar(self):
+        for pasta, _, arquivos in os.walk(self.raiz):
+            for nome in arquivos:
+                # Temporários do mkstemp ficam de fora (gravação em andamento)
+                if len(nome) == 64:
+                    try:
+                        yield nome, os.path.getmtime(os.path.join(pasta, nome))
+                    except FileNotFoundError:
+                        pass
+
+_armazenamento = None
+
+def get_armazenamento():
+    global _armazenamento
+    if _armazenamento is None:
+        _armazenamento = ArmazenamentoLocal()
+    return _armazenamento
+
+def guardar_foto(rendicoes):
+    """Guarda as versões da foto (ver imagens.gerar_rendicoes) e retorna os campos da linha do banco"""
+    if not rendicoes:
+        return {'foto_hash': None, 'foto_tamanho': None, 'foto_largura': None, 'foto_altura': None,
+                'miniatura_hash': None, 'foto_phash': None}
+    dados = rendicoes['foto']
+    armazenamento = get_armazenamento()
+    # Image.open só lê o cabeçalho, suficiente para as dimensões
+    largura, altura = Image.open(io.BytesIO(dados)).size
+    return {
+        'foto_hash': armazenamento.salvar(dados),
+        'foto_tamanho': len(dados),
+        'foto_largura': largura,
+        'foto_altura': altura,
+        'miniatura_hash': armazenamento.salvar(rendicoes['miniatura']),
+        'foto_phash': hash_perceptual(rendicoes['miniatura'])
+    }
+
+def tem_foto(registro):
+    """Indica se o registro tem foto sem ler os bytes"""
+    return registro.foto_hash is not None or bool(registro.tem_foto_legada)
+
+def foto_pendente(registro):
+    """Foto enviada cujas versões o worker ainda não gerou"""
+    return registro.foto_hash is None and registro.foto_original_hash is not None
+
+def carregar_foto(registro):
+    """Retorna os bytes da foto de um ItemDoacao/Pet (ou None)"""
+    if registro.foto_hash:
+        return get_armazenamento().abrir(registro.foto_hash)
+    # Linhas antigas ainda não migradas guardam os bytes na própria tabela
+    return _foto_legada(registro)
+
+def _foto_legada(registro):
+    """Bytes da coluna legada; objeto já fora da sessão (database.leitura) lê só essa coluna"""
+    estado = inspect(registro)
+    if estado.detached and 'foto' in estado.unloaded:
+        from database import leitura
+        modelo = type(registro)
+        with leitura() as session:
+            return session.query(modelo.foto).filter(modelo.id == registro.id).scalar()
+    return registro.foto
+
+def carregar_miniatura(registro):
+    """Retorna os bytes do preview de 150px, já codificado no upload"""
+    if registro.miniatura_hash:
+        return get_armazenamento().abrir(registro.miniatura_hash)
+    return carregar_foto(registro)
+
+def campos_foto(registro):
+    """Campos de foto de um registro já salvo; foto legada só é migrada ao salvar (converter_foto_legada)"""
+    if registro.foto_hash:
+        return {
+            'foto_hash': registro.foto_hash,
+            'foto_tamanho': registro.foto_tamanho,
+            'foto_largura': registro.foto_largura,
+            'foto_altura': registro.foto_altura,
+            'miniatura_hash': registro.miniatura_hash,
+            'foto_phash': registro.foto_phash
+        }
+    if registro.foto_original_hash:
+        return {**guardar_foto(None), 'foto_original_hash': registro.foto_original_hash}
+    if registro.tem_foto_legada:
+        # Abrir o formulário não grava nada: guarda o registro para ler os bytes na hora de salvar
+        return {**guardar_foto(None), 'foto_legada': registro}
+    return None
+
+def converter_foto_legada(campos):
+    """Campos para gravar: foto ainda na coluna legada vai para o armazenamento (e sai da coluna)"""
+    if not campos or 'foto_legada' not in campos:
+        return campos
+    foto = _foto_legada(campos['foto_legada'])
+    try:
+        rendicoes = gerar_rendicoes(io.BytesIO(foto)) if foto else None
+    except ImagemInvalida:
+        rendicoes = None
+    if rendicoes is None:
+        return None  # sem foto nos campos a linha fica como está
+    return {**guardar_foto(rendicoes), 'foto': None}
+
+# --- Versões geradas em segundo plano (fila.py) ---
+# O upload só grava o arquivo como veio (foto_original_hash) e agenda a tarefa; o worker
+# gera as versões e preenche as linhas que apontam para esse original.
+
+TAREFA_FOTO = "processar_foto"
+
+def guardar_original(dados):
+    """Guarda o arquivo enviado sem decodificar e agenda as versões; retorna os campos da linha
+    (com as versões já prontas se o mesmo arquivo já foi processado)"""
+    # Só o cabeçalho (nada é decodificado): o que não é imagem aceita, ou passa dos limites
+    # de tamanho, é recusado já no formulário com imagens.ImagemInvalida
+    abrir_imagem(io.BytesIO(dados))
+    original = get_armazenamento().salvar(dados)
+    campos = concluir_foto({**guardar_foto(None), 'foto_original_hash': original})
+    if campos['foto_original_hash'] is None:
+        get_armazenamento().remover(original)
+    else:
+        enfileirar(TAREFA_FOTO, {'original': original}, chave=original)
+    return campos
+
+def concluir_foto(campos):
+    """Campos para gravar: foto pendente cuja tarefa já terminou entra com as versões prontas"""
+    if not campos or campos['foto_hash'] or not campos.get('foto_original_hash'):
+        return campos
+    prontos = resultado_tarefa(TAREFA_FOTO, campos['foto_original_hash'])
+    return {**prontos, 'foto_original_hash': None} if prontos else campos
+
+def agendar_fotos(lista_campos):
+    """Depois do commit: garante uma tarefa pendente para cada foto gravada ainda sem versões
+    (a tarefa do upload pode ter rodado antes de a linha existir)"""
+    for campos in lista_campos:
+        if campos and not campos['foto_hash'] and campos.get('foto_original_hash'):
+            enfileirar(TAREFA_FOTO, {'original': campos['foto_original_hash']}, chave=campos['foto_original_hash'])
+
+@tarefa(TAREFA_FOTO)
+def processar_foto(dados):
+    """Gera as versões de um original e preenche as linhas que esperam por ele"""
+    from database import engine, notificar_alteracoes, ItemDoacao, Pet
+    original = dados['original']
+    armazenamento = get_armazenamento()
+    # Mesmo arquivo já processado (o original pode até já ter sido apagado): só aplica
+    campos = resultado_tarefa(TAREFA_FOTO, original)
+    if campos is None:
+        bruto = armazenamento.abrir(original)
+        if bruto is None:
+            raise FileNotFoundError(f"Original {original} não está no armazenamento")
+        campos = guardar_foto(gerar_rendicoes(io.BytesIO(bruto)))
+    alteracoes = {}
+    with engine.begin() as conn:
+        for modelo in (ItemDoacao, Pet):
+            tabela = modelo.__table__
+            ids = conn.execute(tabela.update()
+                               .where(tabela.c.foto_original_hash == original)
+                               .values(**campos, foto_original_hash=None)
+                               .returning(tabela.c.id)).scalars().all()
+            if ids:
+                alteracoes[tabela.name] = {"alterado": set(ids)}
+    if alteracoes:
+        notificar_alteracoes(alteracoes)
+    # As versões bastam para exibir: o original (com EXIF, localização etc.) não fica guardado
+    armazenamento.remover(original)
+    return campos
+
+# --- Limpeza ---
+# Fotos são compartilhadas por conteúdo (duas linhas com a mesma foto apontam para o mesmo
+# arquivo), então trocar ou apagar uma foto não apaga o arquivo na hora: limpar_fotos_sem_uso
+# (`python gerenciar.py limpar-fotos`) apaga depois os que nenhuma linha nem tarefa referencia.
+
+def fotos_referenciadas(conn):
+    """Digests em uso: versões e originais das linhas e o que as tarefas de foto ainda podem usar
+    (original a processar e versões prontas que concluir_foto reaproveita)"""
+    from database import ItemDoacao, Pet, Tarefa
+    referenciadas = set()
+    for modelo in (ItemDoacao, Pet):
+        for colunas in conn.execute(select(modelo.foto_hash, modelo.miniatura_hash, modelo.foto_original_hash)):
+            referenciadas.update(colunas)
+    for dados, resultado in conn.execute(select(Tarefa.dados, Tarefa.resultado).where(Tarefa.tipo == TAREFA_FOTO)):
+        referenciadas.add(json.loads(dados or "{}").get('original'))
+        if resultado:
+            campos = json.loads(resultado)
+            referenciadas.update((campos.get('foto_hash'), campos.get('miniatura_hash')))
+    referenciadas.discard(None)
+    return referenciadas
+
+def limpar_fotos_sem_uso(carencia_horas=FOTOS_CARENCIA_HORAS, simular=False):
+    """Apaga os arquivos sem referência gravados há mais de carencia_horas; retorna quantos"""
+    from database import engine
+    armazenamento = get_armazenamento()
+    limite = time.time() - carencia_horas * 3600
+    # Lista antes de ler as referências: arquivo gravado no meio é novo demais para entrar
+    candidatos = [digest for digest, gravado_em in armazenamento.listar() if gravado_em < limite]
+    with engine.connect() as conn:
+        referenciadas = fotos_referenciadas(conn)
+    sem_uso = [digest for digest in candidatos if digest not in referenciadas]
+    if not simular:
+        for digest in sem_uso:
+            armazenamento.remover(digest)
+    return len(sem_uso)
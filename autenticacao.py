@@ -0,0 +1,243 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as TempoEsgotado
+
+# Formato guardado em usuarios.senha_hash: "<algoritmo>$<custo>$<salt>$<hash hex>".
+# Linhas antigas têm só o hash hex (pbkdf2 com 100000 iterações, salt na coluna salt).
+# Hash antigo ou com parâmetros diferentes dos configurados é refeito depois do próximo login.
+ITERACOES_LEGADO = 100000
+
+# Custo por ambiente: SENHA_CUSTO é o número de iterações no pbkdf2_sha256 e o N no scrypt
+SENHA_ALGORITMO = os.environ.get("SENHA_ALGORITMO", "pbkdf2_sha256")
+CUSTO_PADRAO = {"pbkdf2_sha256": 100000, "scrypt": 16384}
+SENHA_CUSTO = int(os.environ.get("SENHA_CUSTO", CUSTO_PADRAO.get(SENHA_ALGORITMO, 0)))
+SCRYPT_R = 8
+SCRYPT_P = 1
+if SENHA_ALGORITMO == "scrypt" and (SENHA_CUSTO < 2 or SENHA_CUSTO & (SENHA_CUSTO - 1)):
+    raise ValueError(f"SENHA_CUSTO do scrypt deve ser potência de 2 maior que 1 (recebido {SENHA_CUSTO})")
+
+# Pool limitado para o hash: o pbkdf2_hmac e o scrypt do OpenSSL soltam o GIL, então threads
+# bastam e uma rajada de logins ocupa no máximo SENHA_WORKERS núcleos; o resto espera na fila.
+SENHA_WORKERS = int(os.environ.get("SENHA_WORKERS", "2"))
+SENHA_FILA_MAX = int(os.environ.get("SENHA_FILA_MAX", "32"))
+SENHA_TIMEOUT_S = float(os.environ.get("SENHA_TIMEOUT_S", "10"))
+
+# Tentativas: falhas por login e tentativas (login + cadastro) por IP, em janelas deslizantes
+LOGIN_MAX_FALHAS = int(os.environ.get("LOGIN_MAX_FALHAS", "5"))
+LOGIN_JANELA_S = int(os.environ.get("LOGIN_JANELA_S", "900"))
+IP_MAX_TENTATIVAS = int(os.environ.get("IP_MAX_TENTATIVAS", "30"))
+IP_JANELA_S = int(os.environ.get("IP_JANELA_S", "60"))
+# Chaves guardadas por limitador: quem troca de login/IP a cada tentativa não faz a memória crescer sem fim
+LIMITADOR_MAX_CHAVES = int(os.environ.get("LIMITADOR_MAX_CHAVES", "100000"))
+
+class SistemaOcupado(Exception):
+    """Fila de hash cheia ou espera maior que SENHA_TIMEOUT_S"""
+
+# --- formato ---
+
+def gerar_salt():
+    return secrets.token_hex(16)
+
+def _derivar(algoritmo, custo, senha, salt):
+    senha, salt = senha.encode('utf-8'), salt.encode('utf-8')
+    if algoritmo == "pbkdf2_sha256":
+        return hashlib.pbkdf2_hmac('sha256', senha, salt, custo).hex()
+    if algoritmo == "scrypt":
+        # 32 bytes de saída para caber em senha_hash (String(128)) junto com o cabeçalho
+        return hashlib.scrypt(senha, salt=salt, n=custo, r=SCRYPT_R, p=SCRYPT_P, dklen=32,
+                              maxmem=256 * custo * SCRYPT_R).hex()
+    raise ValueError(f"Algoritmo de senha desconhecido: {algoritmo}")
+
+def gerar_hash(senha, algoritmo=None, custo=None):
+    """Hash no formato com algoritmo, custo e salt (roda na thread atual)"""
+    algoritmo = algoritmo or SENHA_ALGORITMO
+    custo = custo or (SENHA_CUSTO if algoritmo == SENHA_ALGORITMO else CUSTO_PADRAO[algoritmo])
+    salt = gerar_salt()
+    return f"{algoritmo}${custo}${salt}${_derivar(algoritmo, custo, senha, salt)}"
+
+def conferir_hash(senha, senha_hash, salt_legado=None):
+    """Confere a senha com o hash guardado, no formato novo ou no antigo (roda na thread atual)"""
+    if not senha_hash:
+        return False
+    if "$" not in senha_hash:
+        if not salt_legado:
+            return False
+        calculado = _derivar("pbkdf2_sha256", ITERACOES_LEGADO, senha, salt_legado)
+        return hmac.compare_digest(calculado, senha_hash)
+    # Linha corrompida ou editada à mão (campos faltando, custo inválido) é login que falha, não erro
+    try:
+        algoritmo, custo, salt, esperado = senha_hash.split("$", 3)
+        if algoritmo not in CUSTO_PADRAO:
+            return False
+        return hmac.compare_digest(_derivar(algoritmo, int(custo), senha, salt), esperado)
+    except (ValueError, OverflowError):
+        return False
+
+def precisa_atualizar(senha_hash):
+    """True se o hash está no formato antigo ou com algoritmo/custo diferentes dos configurados"""
+    if not senha_hash or "$" not in senha_hash:
+        return True
+    try:
+        algoritmo, custo, _, _ = senha_hash.split("$", 3)
+        return algoritmo != SENHA_ALGORITMO or int(custo) != SENHA_CUSTO
+    except ValueError:
+        return True
+
+_hash_ficticio = None
+
+def hash_ficticio():
+    """Hash com os parâmetros atuais para conferir quando o login não existe (mesmo tempo de resposta)"""
+    global _hash_ficticio
+    if _hash_ficticio is None:
+        _hash_ficticio = gerar_hash(secrets.token_hex(16))
+    return _hash_ficticio
+
+# --- pool de hash ---
+
+_executor = ThreadPoolExecutor(max_workers=SENHA_WORKERS, thread_name_prefix="senhas")
+_metricas = {'enviados': 0, 'concluidos': 0, 'recusados': 0, 'esgotados': 0, 'na_fila': 0,
+             'fila_maxima': 0, 'espera_total_s': 0.0, 'execucao_total_s': 0.0}
+_lock_metricas = threading.Lock()
+
+def _medir(funcao, enviado_em, args):
+    inicio = time.perf_counter()
+    try:
+        return funcao(*args)
+    finally:
+        fim = time.perf_counter()
+        with _lock_metricas:
+            _metricas['na_fila'] -= 1
+            _metricas['concluidos'] += 1
+            _metricas['espera_total_s'] += inicio - enviado_em
+            _metricas['execucao_total_s'] += fim - inicio
+
+def _enviar(funcao, args):
+    """Coloca a tarefa na fila do pool, ou None se a fila estiver cheia"""
+    with _lock_metricas:
+        if _metricas['na_fila'] >= SENHA_FILA_MAX:
+            _metricas['recusados'] += 1
+            return None
+        _metricas['na_fila'] += 1
+        _metricas['enviados'] += 1
+        _metricas['fila_maxima'] = max(_metricas['fila_maxima'], _metricas['na_fila'])
+    return _executor.submit(_medir, funcao, time.perf_counter(), args)
+
+def executar_no_pool(funcao, *args):
+    """Roda funcao(*args) no pool de hash e espera o resultado; SistemaOcupado se a fila estiver cheia"""
+    futuro = _enviar(funcao, args)
+    if futuro is None:
+        raise SistemaOcupado("Muitos acessos ao mesmo tempo, tente novamente em instantes.")
+    try:
+        return futuro.result(timeout=SENHA_TIMEOUT_S)
+    except TempoEsgotado:
+        cancelado = futuro.cancel()
+        with _lock_metricas:
+            _metricas['esgotados'] += 1
+            if cancelado:
+                _metricas['na_fila'] -= 1
+        raise SistemaOcupado("O sistema está lento no momento, tente novamente em instantes.")
+
+def executar_em_segundo_plano(funcao, *args):
+    """Agenda funcao(*args) no pool sem esperar; False (nada agendado) se a fila estiver cheia"""
+    return _enviar(funcao, args) is not None
+
+def criar_senha(senha):
+    """Hash de uma senha nova, calculado no pool"""
+    return executar_no_pool(gerar_hash, senha)
+
+def verificar_senha(senha, senha_hash, salt_legado=None):
+    """Confere uma senha no pool"""
+    return executar_no_pool(conferir_hash, senha, senha_hash, salt_legado)
+
+def metricas_senhas():
+    """Contadores do pool: fila atual e máxima, recusas e tempos médios (ms)"""
+    with _lock_metricas:
+        metricas = dict(_metricas)
+    concluidos = max(metricas['concluidos'], 1)
+    metricas['espera_media_ms'] = metricas.pop('espera_total_s') * 1000 / concluidos
+    metricas['execucao_media_ms'] = metricas.pop('execucao_total_s') * 1000 / concluidos
+    metricas['workers'] = SENHA_WORKERS
+    metricas['algoritmo'] = f"{SENHA_ALGORITMO} ({SENHA_CUSTO})"
+    return metricas
+
+# --- limite de tentativas (antes de qualquer hash, então tentativa bloqueada não gasta CPU) ---
+
+class Limitador:
+    """No máximo `maximo` eventos por chave em `janela_s` segundos (janela deslizante, em memória)"""
+
+    def __init__(self, maximo, janela_s, max_chaves=LIMITADOR_MAX_CHAVES):
+        self.maximo = maximo
+        self.janela_s = janela_s
+        self.max_chaves = max_chaves
+        self.eventos = {}  # chave -> deque de instantes; ordem de inserção = chave mais antiga primeiro
+        self.varrido_em = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _recentes(self, chave, agora):
+        eventos = self.eventos.get(chave)
+        while eventos and eventos[0] <= agora - self.janela_s:
+            eventos.popleft()
+        if eventos is not None and not eventos:
+            del self.eventos[chave]
+            return None
+        return eventos
+
+    def espera(self, chave):
+        """Segundos até a chave poder tentar de novo (0 = liberada)"""
+        agora = time.monotonic()
+        with self.lock:
+            eventos = self._recentes(chave, agora)
+            if eventos is None or len(eventos) < self.maximo:
+                return 0
+            return int(eventos[0] + self.janela_s - agora) + 1
+
+    def _varrer(self, agora):
+        """Tira as chaves sem eventos na janela; se ainda passar do limite, descarta as mais antigas"""
+        for chave in list(self.eventos):
+            self._recentes(chave, agora)
+        self.varrido_em = agora
+        # Folga de 10% abaixo do limite: sob uma rajada de chaves novas não varre a cada registro
+        excesso = len(self.eventos) - self.max_chaves * 9 // 10
+        if excesso > 0:
+            for chave in list(islice(self.eventos, excesso)):
+                del self.eventos[chave]
+
+    def registrar(self, chave):
+        agora = time.monotonic()
+        with self.lock:
+            if len(self.eventos) >= self.max_chaves or agora - self.varrido_em >= self.janela_s:
+                self._varrer(agora)
+            self._recentes(chave, agora)
+            self.eventos.setdefault(chave, deque()).append(agora)
+
+    def limpar(self, chave):
+        with self.lock:
+            self.eventos.pop(chave, None)
+
+falhas_por_login = Limitador(LOGIN_MAX_FALHAS, LOGIN_JANELA_S)
+tentativas_por_ip = Limitador(IP_MAX_TENTATIVAS, IP_JANELA_S)
+
+def tentativa_bloqueada(login=None, ip=None):
+    """Mensagem de bloqueio se o login ou o IP passaram do limite, senão None; conta a tentativa do IP"""
+    if ip:
+        espera = tentativas_por_ip.espera(ip)
+        if espera:
+            return f"Muitas tentativas deste endereço. Aguarde {espera} segundo(s)."
+        tentativas_por_ip.registrar(ip)
+    if login:
+        espera = falhas_por_login.espera(login.lower())
+        if espera:
+            return f"Muitas tentativas para este usuário. Aguarde {espera // 60 + 1} minuto(s)."
+    return None
+
+def registrar_falha(login):
+    falhas_por_login.registrar(login.lower())
+
+def registrar_sucesso(login):
+    falhas_por_login.limpar(login.lower())
@@ -0,0 +1,80 @@
+"""Benchmark: pesquisa de itens com índice FTS5 x ilike
+
+Cria um banco temporário com N itens (nome + descrição) e mede o COUNT e a
+primeira página de "Pesquisar Doações" para alguns termos, nos dois caminhos.
+
+Uso:
+    python benchmarks/bench_busca_textual.py [--linhas 100000] [--repeticoes 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+NOMES = ["Colchão", "Arroz", "Feijão", "Roupas infantis", "Cobertor", "Fogão", "Geladeira",
+         "Cesta básica", "Água mineral", "Fraldas", "Sabonete", "Toalha", "Cadeira", "Mesa"]
+DETALHES = ["bom estado", "novo", "usado", "tamanho P", "tamanho G", "casal", "solteiro",
+            "pouco uso", "embalagem fechada", "lavado", "com capa"]
+TERMOS = ["colchao", "roupa", "cesta basica", "casal", "agua"]
+
+def popular(linhas):
+    from datetime import date
+    from database import engine, inicializar_banco, Doador, ItemDoacao
+    inicializar_banco()
+    aleatorio = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(Doador.__table__.insert(), [{'cpf': f'{i:011d}', 'nome': f'Doador {i}',
+                                                  'prazo_disponibilidade': date(2030, 1, 1)}
+                                                 for i in range(1, 1001)])
+        for inicio in range(0, linhas, 5000):
+            conn.execute(ItemDoacao.__table__.insert(), [
+                {'doador_id': aleatorio.randint(1, 1000),
+                 'item': f"{aleatorio.choice(NOMES)} {i}",
+                 'quantidade': 1,
+                 'descricao': " ".join(aleatorio.sample(DETALHES, 2))}
+                for i in range(inicio, min(inicio + 5000, linhas))
+            ])
+
+def medir(termo, repeticoes):
+    from database import get_session
+    from consultas import contar_itens, pagina_itens
+    tempos = []
+    for _ in range(repeticoes):
+        session = get_session()
+        inicio = time.perf_counter()
+        total = contar_itens(session, termo, "Disponíveis")
+        pagina_itens(session, termo, "Disponíveis", 25)
+        tempos.append(time.perf_counter() - inicio)
+        session.close()
+    return total, statistics.median(tempos) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=100000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    origem = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta)
+        sys.path.insert(0, RAIZ)
+        import busca_textual
+        print(f"Populando {args.linhas} itens...")
+        popular(args.linhas)
+
+        print(f"{'termo':>14} | {'ilike':>20} | {'FTS5':>20}")
+        for termo in TERMOS:
+            busca_textual.FTS_ATIVO = False
+            total_ilike, tempo_ilike = medir(termo, args.repeticoes)
+            busca_textual.FTS_ATIVO = True
+            total_fts, tempo_fts = medir(termo, args.repeticoes)
+            print(f"{termo:>14} | {total_ilike:6d} em {tempo_ilike:7.1f} ms | {total_fts:6d} em {tempo_fts:7.1f} ms")
+        os.chdir(origem)
+
+if __name__ == "__main__":
+    main()
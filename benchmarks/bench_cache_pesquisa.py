@@ -0,0 +1,90 @@
+"""Benchmark: rerun de "Pesquisar Doações" com e sem o cache da sessão
+
+Cria um banco temporário com N itens e mede o custo do COUNT + página (com e
+sem termo) a cada rerun: direto no banco (o que acontecia em todo clique) e
+pelo CachePesquisa com os mesmos filtros, além da primeira consulta depois de
+um commit (geração nova).
+
+Uso:
+    python benchmarks/bench_cache_pesquisa.py [--itens 100000] [--repeticoes 200]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ITENS = ["Arroz 5kg", "Feijão", "Cobertor", "Colchão de solteiro", "Roupas infantis", "Fraldas G", "Cadeira"]
+
+def popular(itens):
+    from datetime import date
+    from database import engine, inicializar_banco, Doador, ItemDoacao
+    inicializar_banco()
+    doadores = max(1, itens // 4)
+    with engine.begin() as conn:
+        conn.execute(Doador.__table__.insert(), [
+            {'cpf': f'{i:011d}', 'nome': f'Doador {i}', 'cidade': 'Cidade', 'estado': 'SP',
+             'prazo_disponibilidade': date(2030, 1, 1)} for i in range(1, doadores + 1)])
+        conn.execute(ItemDoacao.__table__.insert(), [
+            {'doador_id': i % doadores + 1, 'item': f'{ITENS[i % len(ITENS)]} {i}', 'quantidade': 1,
+             'descricao': 'Descrição do item doado'} for i in range(itens)])
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--itens", type=int, default=100000)
+    parser.add_argument("--repeticoes", type=int, default=200)
+    args = parser.parse_args()
+
+    origem = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta)
+        sys.path.insert(0, RAIZ)
+        print(f"Populando {args.itens} itens...")
+        popular(args.itens)
+        from database import get_session, ItemDoacao
+        from consultas import contar_itens, pagina_itens
+        from cache_pesquisa import CachePesquisa, resultado_leve
+
+        session = get_session()
+        print(f"{'pesquisa':>16} | {'sem cache':>12} | {'com cache':>10} | {'após commit':>12}")
+        for termo in ("", "cobertor"):
+            def direto():
+                contar_itens(session, termo, "Disponíveis")
+                resultados, _, _ = pagina_itens(session, termo, "Disponíveis", 25)
+                return [resultado_leve(item, doador) for item, doador in resultados]
+
+            cache = CachePesquisa()
+            def pelo_cache():
+                cache.contar_itens(session, termo, "Disponíveis")
+                cache.pagina_itens(session, termo, "Disponíveis", 25)
+
+            sem_cache = medir(direto, max(5, args.repeticoes // 20))
+            pelo_cache()
+            com_cache = medir(pelo_cache, args.repeticoes)
+
+            def depois_de_commit():
+                item = session.get(ItemDoacao, 1)
+                item.quantidade += 1
+                session.commit()
+                inicio = time.perf_counter()
+                pelo_cache()
+                return time.perf_counter() - inicio
+            apos_commit = statistics.median(depois_de_commit() for _ in range(5)) * 1e6
+            print(f"{termo or '(sem termo)':>16} | {sem_cache / 1000:9.2f} ms | {com_cache:7.1f} µs | "
+                  f"{apos_commit / 1000:9.2f} ms")
+        session.close()
+        os.chdir(origem)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Teste de carga: leituras e escritas concorrentes no SQLite, antes e depois do ajuste do engine
+
+Simula várias sessões do Streamlit (uma thread cada) listando doações enquanto
+outras cadastram itens, e mede operações por segundo e erros "database is locked".
+"antes" = create_engine puro (journal DELETE); "depois" = database.criar_engine (WAL + PRAGMAs).
+
+Uso:
+    python benchmarks/bench_concorrencia.py [--leitores 8] [--escritores 2] [--segundos 10]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def preparar(engine, itens):
+    from database import Base, Doador, ItemDoacao
+    from busca_textual import criar_indice_busca
+    Base.metadata.create_all(engine)
+    criar_indice_busca(engine)
+    with engine.begin() as conn:
+        conn.execute(Doador.__table__.insert(), [{'cpf': f'{i:011d}', 'nome': f'Doador {i}',
+                                                  'prazo_disponibilidade': date(2030, 1, 1)} for i in range(1, 101)])
+        conn.execute(ItemDoacao.__table__.insert(), [{'doador_id': i % 100 + 1, 'item': f'Item {i}', 'quantidade': 1}
+                                                     for i in range(itens)])
+
+def executar(engine, leitores, escritores, segundos):
+    from sqlalchemy.orm import sessionmaker
+    from database import ItemDoacao
+    from consultas import contar_itens, pagina_itens
+    Sessao = sessionmaker(bind=engine)
+    fim = time.monotonic() + segundos
+    resultado = {'leituras': 0, 'escritas': 0, 'erros': 0}
+    lock = threading.Lock()
+
+    def ler():
+        while time.monotonic() < fim:
+            session = Sessao()
+            try:
+                contar_itens(session, "", "Disponíveis")
+                pagina_itens(session, "", "Disponíveis", 25)
+                chave = 'leituras'
+            except Exception:
+                chave = 'erros'
+            finally:
+                session.close()
+            with lock:
+                resultado[chave] += 1
+
+    def escrever(numero):
+        contador = 0
+        while time.monotonic() < fim:
+            session = Sessao()
+            try:
+                contador += 1
+                session.add(ItemDoacao(doador_id=1, item=f'Novo {numero}-{contador}', quantidade=1))
+                session.commit()
+                chave = 'escritas'
+            except Exception:
+                session.rollback()
+                chave = 'erros'
+            finally:
+                session.close()
+            with lock:
+                resultado[chave] += 1
+
+    threads = [threading.Thread(target=ler) for _ in range(leitores)]
+    threads += [threading.Thread(target=escrever, args=(i,)) for i in range(escritores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--leitores", type=int, default=8)
+    parser.add_argument("--escritores", type=int, default=2)
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--itens", type=int, default=20000)
+    args = parser.parse_args()
+
+    origem = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta)
+        sys.path.insert(0, RAIZ)
+        from sqlalchemy import create_engine
+        from database import criar_engine
+
+        modos = {
+            "antes": lambda url: create_engine(url),
+            "depois": lambda url: criar_engine(url),
+        }
+        for nome, fabrica in modos.items():
+            engine = fabrica(f"sqlite:///{os.path.join(pasta, nome + '.db')}")
+            preparar(engine, args.itens)
+            r = executar(engine, args.leitores, args.escritores, args.segundos)
+            print(f"{nome:>6}: {r['leituras'] / args.segundos:8.1f} leituras/s | "
+                  f"{r['escritas'] / args.segundos:7.1f} escritas/s | {r['erros']} erro(s)")
+            engine.dispose()
+        os.chdir(origem)
+
+if __name__ == "__main__":
+    main()
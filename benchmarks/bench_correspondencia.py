@@ -0,0 +1,93 @@
+"""Benchmark: rodada completa de correspondência e atualização incremental
+
+Cria um banco temporário com N ofertas (itens de doação) e M solicitações
+espalhadas por cidades/bairros e mede: a carga + rodada completa, só a rodada
+completa, e a atualização depois de editar uma oferta e uma solicitação.
+
+Uso:
+    python benchmarks/bench_correspondencia.py [--ofertas 10000] [--pedidos 5000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ITENS = ["Arroz 5kg", "Feijão", "Cesta básica", "Água mineral", "Colchão de solteiro", "Cobertor",
+         "Roupas infantis", "Calça jeans", "Fraldas G", "Sabonete", "Detergente", "Geladeira",
+         "Fogão 4 bocas", "Cadeira", "Panelas", "Brinquedos", "Caderno", "Remédio para febre", "Bicicleta"]
+ESTADOS = ["SP", "RJ", "MG", "RS", "BA"]
+
+def local(aleatorio):
+    estado = aleatorio.choice(ESTADOS)
+    return {'estado': estado, 'cidade': f"Cidade {estado} {aleatorio.randint(1, 40)}",
+            'bairro': f"Bairro {aleatorio.randint(1, 10)}"}
+
+def popular(ofertas, pedidos):
+    from database import engine, inicializar_banco, Doador, ItemDoacao, Receptor
+    from correspondencia import CATEGORIAS
+    inicializar_banco()
+    aleatorio = random.Random(7)
+    hoje = date.today()
+    doadores = ofertas // 5
+    with engine.begin() as conn:
+        conn.execute(Doador.__table__.insert(), [
+            dict(local(aleatorio), cpf=f'{i:011d}', nome=f'Doador {i}', pode_entregar=aleatorio.random() < 0.5,
+                 prazo_disponibilidade=hoje + timedelta(days=aleatorio.randint(-10, 60)))
+            for i in range(1, doadores + 1)])
+        conn.execute(ItemDoacao.__table__.insert(), [
+            {'doador_id': i % doadores + 1, 'item': aleatorio.choice(ITENS), 'quantidade': aleatorio.randint(1, 10)}
+            for i in range(ofertas)])
+        conn.execute(Receptor.__table__.insert(), [
+            dict(local(aleatorio), cpf=f'{i:011d}', nome=f'Receptor {i}', qtde_pessoas=aleatorio.randint(1, 8),
+                 pode_retirar=aleatorio.random() < 0.5,
+                 necessidades=",".join(aleatorio.sample(list(CATEGORIAS), aleatorio.randint(0, 3))) or None)
+            for i in range(1, pedidos + 1)])
+
+def cronometrar(funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return resultado, (time.perf_counter() - inicio) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ofertas", type=int, default=10000)
+    parser.add_argument("--pedidos", type=int, default=5000)
+    args = parser.parse_args()
+
+    origem = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta)
+        sys.path.insert(0, RAIZ)
+        print(f"Populando {args.ofertas} ofertas e {args.pedidos} solicitações...")
+        popular(args.ofertas, args.pedidos)
+        from database import get_session, ItemDoacao, Receptor
+        from correspondencia import obter_motor
+
+        motor, tempo = cronometrar(obter_motor)
+        candidatos = sum(len(lista) for lista in motor.candidatos.values())
+        print(f"{'carga + rodada completa':>28}: {tempo:8.1f} ms ({candidatos} candidatos)")
+        _, tempo = cronometrar(motor.executar)
+        print(f"{'só a rodada completa':>28}: {tempo:8.1f} ms")
+
+        session = get_session()
+        item = session.get(ItemDoacao, 1)
+        item.quantidade += 5
+        session.commit()
+        _, tempo = cronometrar(obter_motor)
+        print(f"{'uma oferta alterada':>28}: {tempo:8.1f} ms")
+
+        receptor = session.get(Receptor, 1)
+        receptor.qtde_pessoas += 1
+        session.commit()
+        _, tempo = cronometrar(obter_motor)
+        print(f"{'uma solicitação alterada':>28}: {tempo:8.1f} ms")
+        session.close()
+        os.chdir(origem)
+
+if __name__ == "__main__":
+    main()
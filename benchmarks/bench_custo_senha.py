@@ -0,0 +1,58 @@
+"""Benchmark: latência de login para cada algoritmo/custo de senha
+
+Mede o tempo de conferir uma senha (o que um login gasta de CPU) para o formato
+antigo e para cada combinação de SENHA_ALGORITMO / SENHA_CUSTO listada, e a
+vazão com SENHA_WORKERS threads, para escolher o custo de cada ambiente.
+
+Uso:
+    python benchmarks/bench_custo_senha.py [--repeticoes 5] [--workers 2]
+"""
+import argparse
+import hashlib
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CUSTOS = [("pbkdf2_sha256", 100000), ("pbkdf2_sha256", 300000), ("pbkdf2_sha256", 600000),
+          ("scrypt", 8192), ("scrypt", 16384), ("scrypt", 32768)]
+
+def medir(conferir, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        assert conferir()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+def vazao(conferir, workers, total):
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda _: conferir(), range(total)))
+    return total / (time.perf_counter() - inicio)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    sys.path.insert(0, RAIZ)
+    from autenticacao import conferir_hash, gerar_hash, ITERACOES_LEGADO
+
+    print(f"{'algoritmo':>14} {'custo':>8} | {'login':>9} | {'logins/s':>8} ({args.workers} workers)")
+    salt = "ab" * 16
+    legado = hashlib.pbkdf2_hmac('sha256', b"senha", salt.encode(), ITERACOES_LEGADO).hex()
+    conferir = lambda: conferir_hash("senha", legado, salt)
+    print(f"{'antigo (hex)':>14} {ITERACOES_LEGADO:>8} | {medir(conferir, args.repeticoes):6.1f} ms | "
+          f"{vazao(conferir, args.workers, args.workers * 4):8.1f}")
+    for algoritmo, custo in CUSTOS:
+        senha_hash = gerar_hash("senha", algoritmo, custo)
+        conferir = lambda: conferir_hash("senha", senha_hash)
+        print(f"{algoritmo:>14} {custo:>8} | {medir(conferir, args.repeticoes):6.1f} ms | "
+              f"{vazao(conferir, args.workers, args.workers * 4):8.1f}  ({len(senha_hash)} caracteres)")
+
+if __name__ == "__main__":
+    main()
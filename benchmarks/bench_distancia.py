@@ -0,0 +1,80 @@
+"""Benchmark: pesquisa "perto de mim" com R*Tree x índice comum em latitude/longitude
+
+Cria um banco temporário com N doadores espalhados pelo país (em volta dos
+centroides de CEP) e mede o COUNT e a primeira página de "Pesquisar Doações"
+com filtro de raio e ordenação por distância, nos dois caminhos.
+
+Uso:
+    python benchmarks/bench_distancia.py [--doadores 50000] [--repeticoes 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ORIGENS = {"São Paulo": "01310-100", "Recife": "50030-230", "Porto Alegre": "90010-150", "Cuiabá": "78005-000"}
+
+def popular(doadores):
+    from datetime import date
+    from database import engine, inicializar_banco, Doador, ItemDoacao
+    from geografia import carregar_centroides
+    inicializar_banco()
+    aleatorio = random.Random(3)
+    centros = list(carregar_centroides().values())
+    linhas = []
+    for i in range(1, doadores + 1):
+        latitude, longitude = aleatorio.choice(centros)
+        linhas.append({'cpf': f'{i:011d}', 'nome': f'Doador {i}', 'prazo_disponibilidade': date(2030, 1, 1),
+                       'latitude': latitude + aleatorio.uniform(-0.2, 0.2),
+                       'longitude': longitude + aleatorio.uniform(-0.2, 0.2)})
+    with engine.begin() as conn:
+        conn.execute(Doador.__table__.insert(), linhas)
+        conn.execute(ItemDoacao.__table__.insert(), [{'doador_id': i // 2 + 1, 'item': f'Item {i}', 'quantidade': 1}
+                                                     for i in range(doadores * 2)])
+
+def medir(origem, raio_km, repeticoes):
+    from database import get_session
+    from consultas import contar_itens, pagina_itens
+    tempos = []
+    for _ in range(repeticoes):
+        session = get_session()
+        inicio = time.perf_counter()
+        total = contar_itens(session, "", "Disponíveis", origem, raio_km)
+        pagina_itens(session, "", "Disponíveis", 25, origem=origem, raio_km=raio_km, por_distancia=True)
+        tempos.append(time.perf_counter() - inicio)
+        session.close()
+    return total, statistics.median(tempos) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--doadores", type=int, default=50000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    origem_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta)
+        sys.path.insert(0, RAIZ)
+        import geografia
+        print(f"Populando {args.doadores} doadores...")
+        popular(args.doadores)
+
+        print(f"{'origem':>14} {'raio':>7} | {'lat/lon (B-tree)':>22} | {'R*Tree':>22}")
+        for nome, cep in ORIGENS.items():
+            origem = geografia.localizar_cep(cep)
+            for raio_km in (10, 50):
+                geografia.GEO_ATIVO = False
+                total_btree, tempo_btree = medir(origem, raio_km, args.repeticoes)
+                geografia.GEO_ATIVO = True
+                total_rtree, tempo_rtree = medir(origem, raio_km, args.repeticoes)
+                print(f"{nome:>14} {raio_km:>4} km | {total_btree:6d} em {tempo_btree:7.1f} ms | "
+                      f"{total_rtree:6d} em {tempo_rtree:7.1f} ms")
+        os.chdir(origem_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark: editar uma doação de 50 itens com foto, apagando e recriando x atualizando por id
+
+Cria um banco temporário com um doador e N itens com foto e simula o "ATUALIZAR
+DOAÇÃO" alterando a quantidade de um item. "antes" = apaga todos os itens e
+insere de novo (caminho antigo); "depois" = database.sincronizar_itens.
+Mostra tempo, comandos SQL e se os ids dos itens sobreviveram.
+
+Uso:
+    python benchmarks/bench_edicao_itens.py [--itens 50] [--repeticoes 5]
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def popular(itens):
+    from PIL import Image
+    from database import get_session, inicializar_banco, Doador, ItemDoacao
+    from armazenamento import guardar_foto
+    from imagens import gerar_rendicoes
+    inicializar_banco()
+    session = get_session()
+    doador = Doador(cpf='00000000191', nome='Doador', prazo_disponibilidade=date(2030, 1, 1))
+    for i in range(itens):
+        imagem = io.BytesIO()
+        Image.new("RGB", (1600, 1200), ((i * 5) % 256, 90, 160)).save(imagem, "JPEG")
+        imagem.seek(0)
+        doador.itens.append(ItemDoacao(item=f'Item {i}', quantidade=1, descricao='com foto',
+                                       **guardar_foto(gerar_rendicoes(imagem))))
+    session.add(doador)
+    session.commit()
+    doador_id = doador.id
+    session.close()
+    return doador_id
+
+def formulario(doador):
+    """O que a página guarda em st.session_state.itens_doacao ao abrir a edição"""
+    from armazenamento import campos_foto
+    return [{'id': item.id, 'item': item.item, 'quantidade': item.quantidade,
+             'descricao': item.descricao or '', 'foto': campos_foto(item)} for item in doador.itens]
+
+def recriar(session, doador, itens):
+    from database import ItemDoacao
+    from armazenamento import guardar_foto
+    for item in doador.itens:
+        session.delete(item)
+    for dados in itens:
+        session.add(ItemDoacao(doador_id=doador.id, item=dados['item'], quantidade=dados['quantidade'],
+                               descricao=dados['descricao'].strip() or None,
+                               **(dados['foto'] or guardar_foto(None))))
+
+def sincronizar(session, doador, itens):
+    from database import sincronizar_itens
+    sincronizar_itens(session, doador, itens)
+
+def medir(doador_id, salvar, repeticoes):
+    from database import engine, get_session, Doador
+    from instrumentacao import contar_consultas
+    tempos = []
+    for rodada in range(repeticoes):
+        session = get_session()
+        doador = session.get(Doador, doador_id)
+        itens = formulario(doador)
+        ids_antes = {dados['id'] for dados in itens}
+        itens[0]['quantidade'] += 1
+        inicio = time.perf_counter()
+        with contar_consultas(engine) as contador:
+            salvar(session, doador, itens)
+            session.commit()
+        tempos.append(time.perf_counter() - inicio)
+        ids_depois = {item.id for item in session.get(Doador, doador_id).itens}
+        session.close()
+    return statistics.median(tempos) * 1000, contador.total, ids_antes == ids_depois
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--itens", type=int, default=50)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    origem = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta)
+        os.environ["FOTOS_DIR"] = os.path.join(pasta, "fotos")
+        sys.path.insert(0, RAIZ)
+        print(f"Criando doação com {args.itens} itens com foto...")
+        doador_id = popular(args.itens)
+        for nome, salvar in (("antes", recriar), ("depois", sincronizar)):
+            tempo, comandos, ids_mantidos = medir(doador_id, salvar, args.repeticoes)
+            print(f"{nome:>6}: {tempo:7.1f} ms | {comandos:3d} comando(s) SQL | "
+                  f"ids {'mantidos' if ids_mantidos else 'trocados'}")
+        os.chdir(origem)
+
+if __name__ == "__main__":
+    main()
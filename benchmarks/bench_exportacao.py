@@ -0,0 +1,108 @@
+"""Benchmark: exportação em blocos (yield_per) x carregar a tabela inteira no pandas
+
+Para cada tamanho cria um banco temporário com N itens de doação (com bytes de
+foto legada na linha, como nos bancos antigos) e mede tempo e pico de memória
+(RSS do processo) de exportar os itens em CSV, Parquet e Excel, e do caminho
+ingênuo: query(ItemDoacao).all() + DataFrame + to_csv. Cada caso roda num
+processo novo, então o pico de um não contamina o outro.
+
+Uso:
+    python benchmarks/bench_exportacao.py [--tamanhos 25000,100000] [--sem-excel]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def popular(itens):
+    from datetime import date
+    from database import engine, inicializar_banco, Doador, ItemDoacao
+    inicializar_banco()
+    doadores = max(1, itens // 4)
+    with engine.begin() as conn:
+        conn.execute(Doador.__table__.insert(), [
+            {'cpf': f'{i:011d}', 'nome': f'Doador {i}', 'cidade': 'Cidade', 'estado': 'SP', 'cep': '01310-100',
+             'prazo_disponibilidade': date(2030, 1, 1)} for i in range(1, doadores + 1)])
+        for inicio in range(0, itens, 10000):
+            conn.execute(ItemDoacao.__table__.insert(), [
+                {'doador_id': i % doadores + 1, 'item': f'Item {i}', 'quantidade': 1,
+                 'descricao': 'Descrição do item doado', 'foto': os.urandom(512)}
+                for i in range(inicio, min(itens, inicio + 10000))])
+
+def ingenuo():
+    import pandas as pd
+    from sqlalchemy.orm import joinedload, undefer
+    from database import get_session, ItemDoacao
+    session = get_session()
+    itens = session.query(ItemDoacao).options(joinedload(ItemDoacao.doador), undefer(ItemDoacao.foto)).all()
+    tabela = pd.DataFrame([{'item_id': item.id, 'item': item.item, 'quantidade': item.quantidade,
+                            'descricao': item.descricao, 'tem_foto': item.foto is not None,
+                            'doador': item.doador.nome, 'cidade': item.doador.cidade} for item in itens])
+    with open(os.devnull, "w") as saida:
+        tabela.to_csv(saida, index=False)
+    session.close()
+    return len(tabela)
+
+def em_blocos(formato):
+    from database import get_session
+    from exportacao import exportar
+    session = get_session()
+    with tempfile.TemporaryFile() as saida:
+        total = exportar(session, "itens", formato, saida)
+    session.close()
+    return total
+
+def caso(nome):
+    sys.path.insert(0, RAIZ)
+    import pandas, pyarrow, openpyxl  # importados antes de medir: o pico é da exportação, não dos módulos
+    from database import inicializar_banco
+    inicializar_banco()
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    inicio = time.perf_counter()
+    linhas = ingenuo() if nome == "ingenuo" else em_blocos(nome)
+    tempo = time.perf_counter() - inicio
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base
+    print(f"{linhas}|{tempo}|{pico / 1024}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", default="25000,100000")
+    parser.add_argument("--sem-excel", action="store_true")
+    parser.add_argument("--popular", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--caso", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.popular:
+        sys.path.insert(0, RAIZ)
+        popular(args.popular)
+        return
+    if args.caso:
+        caso(args.caso)
+        return
+
+    casos = [("csv", "yield_per -> csv"), ("parquet", "yield_per -> parquet")]
+    if not args.sem_excel:
+        casos.append(("xlsx", "yield_per -> xlsx"))
+    casos.append(("ingenuo", "all() + DataFrame -> csv"))
+    script = os.path.abspath(__file__)
+    for tamanho in map(int, args.tamanhos.split(",")):
+        with tempfile.TemporaryDirectory() as pasta:
+            subprocess.run([sys.executable, script, "--popular", str(tamanho)], cwd=pasta, check=True,
+                           capture_output=True)
+            for chave, nome in casos:
+                saida = subprocess.run([sys.executable, script, "--caso", chave], cwd=pasta,
+                                       capture_output=True, text=True)
+                if saida.returncode:
+                    print(saida.stderr)
+                    continue
+                linhas, tempo, pico = saida.stdout.strip().splitlines()[-1].split("|")
+                print(f"{tamanho:>8} | {nome:>26} | {int(linhas):>8} linhas | {float(tempo):6.2f} s | "
+                      f"+{float(pico):6.1f} MB de pico", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Benchmark: foto processada no formulário x guardada e processada pela fila
+
+1. Formulário: tempo por foto de gerar as versões na hora (como antes) e de só
+   guardar o original e enfileirar (guardar_original).
+2. Worker: N itens esperando foto, W processos de worker executando a fila ao
+   mesmo tempo; mede a vazão e confere que cada tarefa rodou uma vez só e que
+   todos os itens ficaram com as versões.
+
+Uso:
+    python benchmarks/bench_fila.py [--fotos 40] [--workers 1 2 4] [--postgres-url URL]
+"""
+import argparse
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def foto_de_celular(semente, largura=4000, altura=3000):
+    """JPEG de 12 MP com textura (ruído), do tamanho de uma foto de celular"""
+    from PIL import Image
+    ruido = Image.effect_noise((largura // 4, altura // 4), 40 + semente % 20).resize((largura, altura))
+    imagem = Image.merge("RGB", (ruido, ruido.rotate(90, expand=False), ruido.transpose(Image.FLIP_LEFT_RIGHT)))
+    saida = io.BytesIO()
+    imagem.save(saida, format="JPEG", quality=90)
+    return saida.getvalue()
+
+def preparar(pasta, fotos):
+    """Mede o formulário e deixa `fotos` itens esperando o worker; grava as fotos em disco"""
+    os.chdir(pasta)
+    sys.path.insert(0, RAIZ)
+    from database import inicializar_banco, transacao, Doador, ItemDoacao
+    from imagens import gerar_rendicoes
+    from armazenamento import guardar_foto, guardar_original, agendar_fotos
+    import fila
+    inicializar_banco()
+
+    arquivos = [foto_de_celular(numero) for numero in range(fotos)]
+    print(f"📷 {fotos} foto(s) de ~{statistics.mean(map(len, arquivos)) / 1024 / 1024:.1f} MB")
+    amostra = arquivos[:min(5, fotos)]
+    antes = []
+    for dados in amostra:
+        inicio = time.perf_counter()
+        guardar_foto(gerar_rendicoes(io.BytesIO(dados)))
+        antes.append(time.perf_counter() - inicio)
+    depois, campos = [], []
+    for dados in arquivos:
+        inicio = time.perf_counter()
+        campos.append(guardar_original(dados))
+        depois.append(time.perf_counter() - inicio)
+    print(f"formulário, por foto: na hora {statistics.median(antes) * 1000:7.1f} ms | "
+          f"fila {statistics.median(depois) * 1000:6.1f} ms")
+
+    with transacao() as session:
+        doador = Doador(cpf="00000000191", nome="Doador")
+        session.add(doador)
+        session.flush()
+        for numero, campos_foto in enumerate(campos):
+            session.add(ItemDoacao(doador_id=doador.id, item=f"Item {numero}", quantidade=1, **campos_foto))
+    agendar_fotos(campos)
+    with fila.engine.connect() as conn:
+        pendentes = conn.execute(fila.select(fila.func.count()).where(fila._tabela.c.estado == fila.PENDENTE)).scalar()
+    print(f"📥 {pendentes} tarefa(s) pendente(s)")
+
+def trabalhar(pasta):
+    os.chdir(pasta)
+    sys.path.insert(0, RAIZ)
+    import armazenamento  # registra a tarefa de foto
+    from fila import executar_worker
+    print(executar_worker(uma_vez=True))
+
+def conferir(pasta):
+    """Tarefas concluídas e itens ainda sem versões"""
+    os.chdir(pasta)
+    sys.path.insert(0, RAIZ)
+    from sqlalchemy import select, func
+    from database import engine, ItemDoacao, Tarefa
+    with engine.connect() as conn:
+        estados = dict(conn.execute(select(Tarefa.estado, func.count()).group_by(Tarefa.estado)).all())
+        sem_versao = conn.execute(select(func.count()).where(ItemDoacao.foto_hash.is_(None))).scalar()
+    print(estados.get("concluida", 0), sem_versao, sum(estados.values()))
+
+def rodar(pasta, ambiente, *argumentos):
+    resultado = subprocess.run([sys.executable, os.path.abspath(__file__), "--pasta", pasta, *argumentos],
+                               env=ambiente, check=True, capture_output=True, text=True)
+    return resultado.stdout.strip().splitlines()
+
+def resetar_postgres(url):
+    sys.path.insert(0, RAIZ)
+    from sqlalchemy import create_engine
+    engine = create_engine(url.replace("postgresql://", "postgresql+psycopg2://", 1))
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP SCHEMA public CASCADE")
+        conn.exec_driver_sql("CREATE SCHEMA public")
+    engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fotos", type=int, default=40)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--postgres-url", help="PostgreSQL descartável (o esquema public é recriado)")
+    parser.add_argument("--pasta", help=argparse.SUPPRESS)
+    parser.add_argument("--etapa", choices=["preparar", "trabalhar", "conferir"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.etapa == "preparar":
+        preparar(args.pasta, args.fotos)
+        return
+    if args.etapa == "trabalhar":
+        trabalhar(args.pasta)
+        return
+    if args.etapa == "conferir":
+        conferir(args.pasta)
+        return
+
+    falhou = False
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as pasta:
+            url = args.postgres_url or f"sqlite:///{os.path.join(pasta, 'fila.db')}"
+            if args.postgres_url:
+                resetar_postgres(url)
+            # Só os processos de worker executam: nada de thread do app aqui
+            ambiente = dict(os.environ, DATABASE_URL=url, FOTOS_DIR=os.path.join(pasta, "fotos"), TAREFAS_NO_APP="0")
+            print(f"\n=== {url.split(':')[0]}, {workers} worker(s) ===")
+            for linha in rodar(pasta, ambiente, "--etapa", "preparar", "--fotos", str(args.fotos)):
+                if not linha.startswith(("🗄️", "🔎", "📍", "✅ Admin", "🚀")):
+                    print(linha)
+            inicio = time.perf_counter()
+            processos = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--pasta", pasta,
+                                           "--etapa", "trabalhar"], env=ambiente, stdout=subprocess.PIPE, text=True)
+                         for _ in range(workers)]
+            executadas = [int(processo.communicate()[0].strip().splitlines()[-1]) for processo in processos]
+            segundos = time.perf_counter() - inicio
+            concluidas, sem_versao, total = map(int, rodar(pasta, ambiente, "--etapa", "conferir")[-1].split())
+            ok = sum(executadas) == total == concluidas and sem_versao == 0
+            falhou = falhou or not ok
+            print(f"{'✅' if ok else '❌'} {sum(executadas)} tarefa(s) em {segundos:.2f} s "
+                  f"({sum(executadas) / segundos:.1f}/s; por worker: {executadas}); "
+                  f"concluídas {concluidas} de {total}, itens sem versões: {sem_versao}")
+    sys.exit(1 if falhou else 0)
+
+if __name__ == "__main__":
+    main()
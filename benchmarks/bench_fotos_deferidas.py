@@ -0,0 +1,80 @@
+"""Benchmark: listagem de itens com a coluna foto adiada (deferred) x carregada junto
+
+Cria um banco temporário com N itens que ainda guardam a foto na própria linha
+(formato antigo) e mede, em processos separados, o tempo de
+session.query(ItemDoacao).all() e o pico de memória residente de cada modo.
+
+Uso:
+    python benchmarks/bench_fotos_deferidas.py [--linhas 10000] [--tamanho-foto 60000]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def popular(pasta, linhas, tamanho_foto):
+    os.chdir(pasta)
+    sys.path.insert(0, RAIZ)
+    from datetime import date
+    from database import engine, Doador, ItemDoacao, criar_tabelas
+    criar_tabelas()
+    with engine.begin() as conn:
+        conn.execute(Doador.__table__.insert(), [{'cpf': '00000000191', 'nome': 'Doador',
+                                                  'prazo_disponibilidade': date(2030, 1, 1)}])
+        foto = os.urandom(tamanho_foto)
+        for inicio in range(0, linhas, 1000):
+            conn.execute(ItemDoacao.__table__.insert(), [
+                {'doador_id': 1, 'item': f'Item {i}', 'quantidade': 1, 'descricao': 'teste', 'foto': foto}
+                for i in range(inicio, min(inicio + 1000, linhas))
+            ])
+
+def medir(pasta, modo):
+    os.chdir(pasta)
+    sys.path.insert(0, RAIZ)
+    from sqlalchemy.orm import undefer
+    from database import get_session, ItemDoacao
+
+    session = get_session()
+    query = session.query(ItemDoacao)
+    if modo == "ansioso":
+        query = query.options(undefer(ItemDoacao.foto))
+    memoria_antes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    inicio = time.perf_counter()
+    itens = query.all()
+    titulos = [item.item for item in itens]
+    tempo = time.perf_counter() - inicio
+    memoria_depois = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    session.close()
+    print(f"{modo:>9}: {len(titulos)} linhas em {tempo * 1000:8.1f} ms | "
+          f"pico RSS {memoria_depois / 1024:7.1f} MB (+{(memoria_depois - memoria_antes) / 1024:.1f} MB na consulta)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=10000)
+    parser.add_argument("--tamanho-foto", type=int, default=60000, help="Bytes por foto")
+    parser.add_argument("--medir", choices=["deferido", "ansioso"], help=argparse.SUPPRESS)
+    parser.add_argument("--pasta", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        medir(args.pasta, args.medir)
+        return
+
+    origem = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        print(f"Populando {args.linhas} itens com fotos de {args.tamanho_foto} bytes...")
+        popular(pasta, args.linhas, args.tamanho_foto)
+        tamanho_banco = os.path.getsize(os.path.join(pasta, "doacoes.db"))
+        print(f"Banco com {tamanho_banco / 1024 / 1024:.1f} MB")
+        # Um processo por modo para o pico de memória de um não contaminar o outro
+        for modo in ("ansioso", "deferido"):
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--pasta", pasta, "--medir", modo], check=True)
+        os.chdir(origem)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark: custo de importar os módulos do app x custo da inicialização do banco
+
+Cada medida roda em um processo Python novo (imports frios). "import" é o que
+todo processo paga ao carregar database/consultas/estatisticas; "inicializar"
+é o inicializar_banco() em banco novo (cria tabelas + hash da senha do admin)
+e em banco já existente. Antes, o import pagava tudo isso junto.
+
+Uso:
+    python benchmarks/bench_importacao.py [--repeticoes 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEDIR = """
+import sys, time, os
+sys.path.insert(0, {raiz!r})
+inicio = time.perf_counter()
+import database, consultas, estatisticas, armazenamento
+importar = time.perf_counter() - inicio
+tocou_banco = os.path.exists("doacoes.db")
+inicio = time.perf_counter()
+database.inicializar_banco()
+inicializar = time.perf_counter() - inicio
+print(importar, inicializar, tocou_banco)
+"""
+
+def medir(pasta):
+    ambiente = dict(os.environ, DATABASE_URL="sqlite:///doacoes.db", FOTOS_DIR=os.path.join(pasta, "fotos"))
+    saida = subprocess.run([sys.executable, "-c", MEDIR.format(raiz=RAIZ)], cwd=pasta, env=ambiente,
+                           capture_output=True, text=True, check=True).stdout
+    importar, inicializar, tocou_banco = saida.strip().splitlines()[-1].split()
+    return float(importar), float(inicializar), tocou_banco == "True"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    tempos = {'import': [], 'inicializar (banco novo)': [], 'inicializar (banco existente)': []}
+    tocou = False
+    for _ in range(args.repeticoes):
+        with tempfile.TemporaryDirectory() as pasta:
+            importar, novo, tocou_banco = medir(pasta)
+            _, existente, _ = medir(pasta)
+            tempos['import'].append(importar)
+            tempos['inicializar (banco novo)'].append(novo)
+            tempos['inicializar (banco existente)'].append(existente)
+            tocou = tocou or tocou_banco
+
+    for nome, valores in tempos.items():
+        print(f"{nome:>30}: {statistics.median(valores) * 1000:8.1f} ms (mediana de {len(valores)})")
+    print("⚠️ o import acessou o banco" if tocou else "✅ o import não acessou o banco")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Benchmark: memória e tempo para gerar as versões de fotos de 12 MP
+
+Compara o pipeline antigo (decodifica o arquivo inteiro e salva em JPEG) com o de
+imagens.gerar_rendicoes (JPEG decodificado já reduzido, EXIF aplicado, alfa em WebP).
+Cada medição roda num processo novo: o pico de memória residente (VmHWM) é zerado
+depois dos imports e da leitura do arquivo, e o pico informado é o quanto ele subiu
+acima da memória daquele momento (Linux).
+
+Uso:
+    python benchmarks/bench_ingestao.py [--repeticoes 5]
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def gerar_rendicoes_antigo(arquivo):
+    """Pipeline anterior, copiado para comparação"""
+    from PIL import Image
+    image = Image.open(arquivo)
+    rendicoes = {}
+    for nome, tamanho in (('foto', (800, 800)), ('miniatura', (150, 150))):
+        image = image.copy()
+        image.thumbnail(tamanho)
+        buf = io.BytesIO()
+        image.save(buf, format='JPEG')
+        rendicoes[nome] = buf.getvalue()
+    return rendicoes
+
+def criar_amostras(pasta, largura=4000, altura=3000):
+    """Foto de celular deitada com EXIF de rotação e um PNG com transparência, ambos de 12 MP"""
+    from PIL import Image
+    ruido = Image.effect_noise((largura // 4, altura // 4), 50).resize((largura, altura))
+    foto = Image.merge("RGB", (ruido, ruido.rotate(90), ruido.transpose(Image.FLIP_LEFT_RIGHT)))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # girar 90° na exibição
+    amostras = {"jpeg_exif": os.path.join(pasta, "foto.jpg"), "png_alfa": os.path.join(pasta, "alfa.png")}
+    foto.save(amostras["jpeg_exif"], format="JPEG", quality=90, exif=exif.tobytes())
+    alfa = Image.radial_gradient("L").resize((largura, altura))
+    foto.putalpha(alfa)
+    foto.save(amostras["png_alfa"], format="PNG", compress_level=1)
+    return amostras
+
+def memoria_kb(campo):
+    """VmRSS (atual) ou VmHWM (pico) do processo"""
+    with open("/proc/self/status") as status:
+        for linha in status:
+            if linha.startswith(campo + ":"):
+                return int(linha.split()[1])
+
+def zerar_pico():
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5")
+
+def medir(caminho, pipeline, repeticoes):
+    """Roda no processo filho: imprime JSON com tempos, pico de memória e as versões geradas"""
+    sys.path.insert(0, RAIZ)
+    from PIL import Image
+    from imagens import gerar_rendicoes
+    funcao = gerar_rendicoes if pipeline == "novo" else gerar_rendicoes_antigo
+    with open(caminho, "rb") as entrada:
+        dados = entrada.read()
+    zerar_pico()
+    antes = memoria_kb("VmRSS")
+    tempos = []
+    try:
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            rendicoes = funcao(io.BytesIO(dados))
+            tempos.append(time.perf_counter() - inicio)
+    except OSError as erro:
+        print(json.dumps({"erro": str(erro)}))
+        return
+    pico_kb = memoria_kb("VmHWM") - antes
+    foto = Image.open(io.BytesIO(rendicoes["foto"]))
+    print(json.dumps({"ms": statistics.median(tempos) * 1000, "pico_mb": pico_kb / 1024,
+                      "formato": foto.format, "tamanho": foto.size,
+                      "kb": {nome: len(valor) / 1024 for nome, valor in rendicoes.items()}}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--arquivo", help=argparse.SUPPRESS)
+    parser.add_argument("--pipeline", choices=["antigo", "novo"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.arquivo:
+        medir(args.arquivo, args.pipeline, args.repeticoes)
+        return
+
+    falhou = False
+    with tempfile.TemporaryDirectory() as pasta:
+        for nome, caminho in criar_amostras(pasta).items():
+            print(f"\n=== {nome} ({os.path.getsize(caminho) / 1024 / 1024:.1f} MB) ===")
+            for pipeline in ("antigo", "novo"):
+                saida = subprocess.run([sys.executable, os.path.abspath(__file__), "--arquivo", caminho,
+                                        "--pipeline", pipeline, "--repeticoes", str(args.repeticoes)],
+                                       check=True, capture_output=True, text=True).stdout
+                resultado = json.loads(saida.strip().splitlines()[-1])
+                if "erro" in resultado:
+                    print(f"{pipeline:6} ❌ {resultado['erro']}")
+                    falhou = falhou or pipeline == "novo"
+                    continue
+                largura, altura = resultado["tamanho"]
+                print(f"{pipeline:6} {resultado['ms']:7.1f} ms | pico {resultado['pico_mb']:6.1f} MB | "
+                      f"{resultado['formato']} {largura}x{altura} | "
+                      + " ".join(f"{versao} {kb:.0f} KB" for versao, kb in resultado["kb"].items()))
+    sys.exit(1 if falhou else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Benchmark: custo da instrumentação (eventos de SQL e @medir)
+
+Cria um banco temporário e mede, no mesmo arquivo, um engine sem os eventos e
+outro com instrumentar_engine: um SELECT simples por id (onde o custo fixo por
+comando mais aparece) e a listagem de doadores de "Visualizar Cadastros". Mede
+também uma chamada vazia com e sem @medir.
+
+Uso:
+    python benchmarks/bench_instrumentacao.py [--repeticoes 20000] [--doadores 500]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def medir_tempo(funcoes, repeticoes):
+    """Mediana de 7 rodadas alternando as funções, em µs por chamada de cada uma"""
+    rodadas = [[] for _ in funcoes]
+    for _ in range(7):
+        for funcao, tempos in zip(funcoes, rodadas):
+            inicio = time.perf_counter()
+            for _ in range(repeticoes):
+                funcao()
+            tempos.append((time.perf_counter() - inicio) / repeticoes)
+    return [statistics.median(tempos) * 1e6 for tempos in rodadas]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticoes", type=int, default=20000)
+    parser.add_argument("--doadores", type=int, default=500)
+    args = parser.parse_args()
+
+    origem = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta)
+        sys.path.insert(0, RAIZ)
+        from datetime import date
+        from sqlalchemy.orm import sessionmaker
+        from database import criar_engine, inicializar_banco, engine, Doador, ItemDoacao, DATABASE_URL
+        from consultas import listar_doadores
+        from instrumentacao import instrumentar_engine, iniciar_pagina, finalizar_pagina, medir, resumo
+        inicializar_banco()
+        with engine.begin() as conn:
+            conn.execute(Doador.__table__.insert(), [
+                {'cpf': f'{i:011d}', 'nome': f'Doador {i}', 'cidade': 'Cidade', 'estado': 'SP', 'usuario_id': 1,
+                 'prazo_disponibilidade': date(2030, 1, 1)} for i in range(1, args.doadores + 1)])
+            conn.execute(ItemDoacao.__table__.insert(), [
+                {'doador_id': i % args.doadores + 1, 'item': f'Item {i}', 'quantidade': 1}
+                for i in range(args.doadores * 2)])
+
+        puro = criar_engine(DATABASE_URL)
+        medido = criar_engine(DATABASE_URL)
+        instrumentar_engine(medido)
+
+        print(f"{'caso':>28} | {'sem':>10} | {'com':>10} | {'custo':>9}")
+        iniciar_pagina("bench")
+        for nome, repeticoes, fazer in (
+            ("SELECT por id", args.repeticoes,
+             lambda conn: conn.exec_driver_sql("SELECT nome FROM doadores WHERE id = 1").scalar()),
+            (f"listar_doadores ({args.doadores})", 20,
+             lambda conn: listar_doadores(sessionmaker(bind=conn)())),
+        ):
+            with puro.connect() as conn_puro, medido.connect() as conn_medido:
+                sem, com = medir_tempo([lambda: fazer(conn_puro), lambda: fazer(conn_medido)], repeticoes)
+            print(f"{nome:>28} | {sem:7.1f} µs | {com:7.1f} µs | {com - sem:+6.2f} µs")
+
+        def vazia():
+            return None
+        sem, com = medir_tempo([vazia, medir("vazia")(vazia)], args.repeticoes)
+        print(f"{'chamada com @medir':>28} | {sem:7.2f} µs | {com:7.2f} µs | {com - sem:+6.2f} µs")
+        finalizar_pagina()
+        paginas, _ = resumo()
+        bench = next(linha for linha in paginas if linha['pagina'] == "bench")
+        print(f"\n{bench['comandos_total']} comandos registrados; p50/p95/p99 por comando calculados das "
+              f"últimas amostras (p99 {bench['consulta_p99_ms']:.3f} ms)")
+        puro.dispose()
+        medido.dispose()
+        os.chdir(origem)
+
+if __name__ == "__main__":
+    main()
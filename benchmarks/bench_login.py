@@ -0,0 +1,90 @@
+"""Benchmark: rajada de logins com o hash na thread da requisição x no pool limitado
+
+Dispara N logins simultâneos (uma thread por requisição, como no Streamlit) e
+mede, nos dois modos, o tempo total, a latência dos logins e a latência de uma
+"página" leve renderizada ao mesmo tempo por outra sessão. Por fim mede o custo
+de uma tentativa recusada pelo limite de tentativas (sem calcular hash).
+
+Uso:
+    python benchmarks/bench_login.py [--logins 64] [--workers 2]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))] * 1000
+
+def pagina_leve():
+    # Trabalho típico de um rerun de página: montar alguns dicionários em Python puro
+    return sum(len(str({'item': i, 'quantidade': i % 7})) for i in range(2000))
+
+def rajada(conferir, senha_hash, logins):
+    latencias = []
+    paginas = []
+    fim = threading.Event()
+
+    def login():
+        inicio = time.perf_counter()
+        conferir("senha-errada", senha_hash)
+        latencias.append(time.perf_counter() - inicio)
+
+    def outra_sessao():
+        while not fim.is_set():
+            inicio = time.perf_counter()
+            pagina_leve()
+            paginas.append(time.perf_counter() - inicio)
+
+    observador = threading.Thread(target=outra_sessao)
+    observador.start()
+    threads = [threading.Thread(target=login) for _ in range(logins)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - inicio
+    fim.set()
+    observador.join()
+    return total, latencias, paginas
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    os.environ["SENHA_WORKERS"] = str(args.workers)
+    os.environ["SENHA_FILA_MAX"] = str(args.logins)
+    os.environ["SENHA_TIMEOUT_S"] = "600"
+    sys.path.insert(0, RAIZ)
+    import autenticacao
+
+    senha_hash = autenticacao.gerar_hash("senha-certa")
+    print(f"{args.logins} logins simultâneos, pool com {args.workers} worker(s), {os.cpu_count()} CPU(s)")
+    print(f"{'modo':>18} | {'total':>8} | {'login p50':>9} | {'login p95':>9} | {'página p50':>10} | {'página p95':>10}")
+    for nome, conferir in (("thread da sessão", autenticacao.conferir_hash),
+                           ("pool limitado", autenticacao.verificar_senha)):
+        total, latencias, paginas = rajada(conferir, senha_hash, args.logins)
+        print(f"{nome:>18} | {total * 1000:6.0f} ms | {percentil(latencias, 0.5):6.0f} ms | "
+              f"{percentil(latencias, 0.95):6.0f} ms | {percentil(paginas, 0.5):7.1f} ms | "
+              f"{percentil(paginas, 0.95):7.1f} ms")
+    print("métricas do pool:", autenticacao.metricas_senhas())
+
+    for _ in range(autenticacao.LOGIN_MAX_FALHAS):
+        autenticacao.registrar_falha("alvo")
+    tempos = []
+    for _ in range(1000):
+        inicio = time.perf_counter()
+        bloqueio = autenticacao.tentativa_bloqueada("alvo")
+        tempos.append(time.perf_counter() - inicio)
+    print(f"tentativa bloqueada: {statistics.median(tempos) * 1e6:.1f} µs ({bloqueio})")
+
+if __name__ == "__main__":
+    main()
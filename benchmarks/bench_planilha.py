@@ -0,0 +1,104 @@
+"""Benchmark: importação de planilha em lotes x cadastro um a um pelo ORM
+
+Gera um CSV de doações com N linhas (alguns CPFs inválidos, repetidos e já
+cadastrados, para exercitar o relatório de erros), importa com
+importacao.importar e compara com o caminho dos formulários (um Doador por
+vez pelo ORM, com commit), medido numa amostra e extrapolado.
+
+Uso:
+    python benchmarks/bench_planilha.py [--linhas 50000] [--amostra 500]
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CEPS = ["01310-100", "20040-002", "30130-010", "40020-000", "50030-230", "69005-010", "80010-000", "90010-150"]
+
+def gerar_cpf(numero):
+    base = f"{numero:09d}"
+    for posicao in (9, 10):
+        soma = sum(int(base[i]) * (posicao + 1 - i) for i in range(posicao))
+        base += str(soma * 10 % 11 % 10)
+    return base
+
+def gerar_csv(linhas):
+    aleatorio = random.Random(5)
+    saida = io.StringIO()
+    escritor = csv.writer(saida, delimiter=";")
+    escritor.writerow(["CPF", "Nome", "Celular", "CEP", "Bairro", "Cidade", "UF", "Entrega", "Prazo",
+                       "Produto", "Qtd", "Obs"])
+    doador = 1000
+    for linha in range(linhas):
+        # ~2 itens por doador
+        if aleatorio.random() < 0.5:
+            doador += 1
+        cpf = gerar_cpf(doador)
+        if linha % 997 == 0:
+            cpf = cpf[:10] + str((int(cpf[10]) + 1) % 10)  # dígito verificador errado
+        escritor.writerow([cpf, f"Doador {doador}", "11999990000", aleatorio.choice(CEPS), "Centro",
+                           "Cidade", "SP", aleatorio.choice(["Sim", "Não"]), "31/12/2030",
+                           aleatorio.choice(["Arroz 5kg", "Cobertor", "Fraldas G", "Cadeira"]),
+                           str(aleatorio.randint(1, 9)), ""])
+    return saida.getvalue()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=50000)
+    parser.add_argument("--amostra", type=int, default=500)
+    args = parser.parse_args()
+
+    origem = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta)
+        sys.path.insert(0, RAIZ)
+        from database import inicializar_banco, get_session, Doador, ItemDoacao
+        from importacao import ler_planilha, importar
+        inicializar_banco()
+
+        # Alguns doadores da planilha já existem no banco
+        session = get_session()
+        for numero in range(1001, 1011):
+            session.add(Doador(cpf=gerar_cpf(numero), nome="Já cadastrado", prazo_disponibilidade=date(2030, 1, 1)))
+        session.commit()
+        session.close()
+
+        conteudo = gerar_csv(args.linhas)
+        inicio = time.perf_counter()
+        tabela = ler_planilha(io.BytesIO(conteudo.encode("utf-8")), "doacoes.csv")
+        leitura = time.perf_counter() - inicio
+        resultado = importar(tabela, "doacoes")
+        total = time.perf_counter() - inicio
+        print(f"{args.linhas} linhas: {resultado['cadastrados']} doadores e {resultado['itens']} itens "
+              f"em {total:.2f} s (leitura {leitura:.2f} s), {len(resultado['erros'])} linha(s) com erro")
+        motivos = {}
+        for erro in resultado['erros']:
+            motivo = erro['erro'].split("'")[0].split("(")[0].strip()
+            motivos[motivo] = motivos.get(motivo, 0) + 1
+        for motivo, quantidade in motivos.items():
+            print(f"   {quantidade:6d} x {motivo}")
+
+        session = get_session()
+        inicio = time.perf_counter()
+        for numero in range(args.amostra):
+            doador = Doador(cpf=f"9{numero:010d}", nome="Formulário", cep="01310-100", cidade="Cidade",
+                            estado="SP", prazo_disponibilidade=date(2030, 1, 1))
+            doador.itens = [ItemDoacao(item="Arroz 5kg", quantidade=1), ItemDoacao(item="Cobertor", quantidade=1)]
+            session.add(doador)
+            session.commit()
+        por_doador = (time.perf_counter() - inicio) / args.amostra
+        session.close()
+        estimado = por_doador * resultado['cadastrados']
+        print(f"um a um pelo ORM: {por_doador * 1000:.1f} ms por doador -> ~{estimado:.0f} s para os mesmos "
+              f"{resultado['cadastrados']} doadores ({estimado / total:.0f}x)")
+        os.chdir(origem)
+
+if __name__ == "__main__":
+    main()
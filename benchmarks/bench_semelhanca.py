@@ -0,0 +1,114 @@
+"""Benchmark: busca de fotos parecidas (distância de Hamming) com 100 mil hashes
+
+Monta o semelhanca.IndiceHamming com N hashes de 64 bits e mede a busca de todos
+a até --distancia bits, comparando com a varredura de todos os hashes (e conferindo
+que as duas acham o mesmo). Dois conjuntos: bits uniformes e bits enviesados (cada
+bit com a sua probabilidade, sorteada de uma Beta(--vies, --vies); fotos reais não
+se espalham por igual, e quanto menor o --vies mais cheios ficam os baldes do índice). Cada conjunto tem 1% de cópias levemente alteradas
+de outros hashes, para a busca ter o que achar. Por fim mede a carga do índice a
+partir de um banco SQLite com as N linhas.
+
+Uso:
+    python benchmarks/bench_semelhanca.py [--hashes 100000] [--distancia 7] [--buscas 2000] [--vies 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def gerar_hashes(quantidade, vies=None, semente=42):
+    aleatorio = random.Random(semente)
+    if vies:
+        probabilidades = [aleatorio.betavariate(vies, vies) for _ in range(64)]
+        def novo():
+            return sum(1 << bit for bit, p in enumerate(probabilidades) if aleatorio.random() < p)
+    else:
+        def novo():
+            return aleatorio.getrandbits(64)
+    hashes = [novo() for _ in range(quantidade - quantidade // 100)]
+    # Quase cópias: a mesma foto reenviada (recortada, recomprimida) muda poucos bits
+    for _ in range(quantidade // 100):
+        valor = aleatorio.choice(hashes)
+        for bit in aleatorio.sample(range(64), aleatorio.randint(0, 6)):
+            valor ^= 1 << bit
+        hashes.append(valor)
+    return hashes
+
+def percentis(tempos):
+    tempos = sorted(tempos)
+    return {nome: tempos[int(len(tempos) * fracao) - 1] * 1e6
+            for nome, fracao in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+
+def medir_busca(nome, hashes, distancia, buscas):
+    from semelhanca import IndiceHamming, distancia as bits_diferentes
+    inicio = time.perf_counter()
+    indice = IndiceHamming()
+    for registro_id, valor in enumerate(hashes):
+        indice.incluir(registro_id, valor)
+    montagem = time.perf_counter() - inicio
+
+    aleatorio = random.Random(7)
+    consultas = [aleatorio.choice(hashes) ^ (1 << aleatorio.randrange(64)) for _ in range(buscas)]
+    tempos, achados = [], 0
+    for valor in consultas:
+        inicio = time.perf_counter()
+        resultado = indice.buscar(valor, distancia)
+        tempos.append(time.perf_counter() - inicio)
+        achados += len(resultado)
+
+    # Varredura de tudo, numa amostra: referência de tempo e de resultado
+    errados, tempos_varredura = 0, []
+    for valor in consultas[:20]:
+        inicio = time.perf_counter()
+        esperado = sorted((bits, registro_id) for registro_id, outro in enumerate(hashes)
+                          if (bits := bits_diferentes(valor, outro)) <= distancia)
+        tempos_varredura.append(time.perf_counter() - inicio)
+        errados += esperado != indice.buscar(valor, distancia)
+
+    p = percentis(tempos)
+    print(f"{nome:10} montagem {montagem:5.2f} s | busca p50 {p['p50']:6.0f} µs p95 {p['p95']:6.0f} µs "
+          f"p99 {p['p99']:6.0f} µs | {achados / buscas:.1f} achado(s)/busca | "
+          f"varredura {statistics.median(tempos_varredura) * 1000:.0f} ms | "
+          f"{'✅' if errados == 0 else '❌'} {20 - errados}/20 iguais à varredura")
+    return errados == 0 and p["p95"] < 1000
+
+def medir_carga(hashes):
+    """Carga do índice a partir do banco (primeiro uso no processo do app)"""
+    from database import engine, inicializar_banco, Pet
+    import semelhanca
+    inicializar_banco()
+    with engine.begin() as conn:
+        conn.execute(Pet.__table__.insert(), [{'especie': 'Gato', 'situacao': 'Perdido',
+                                               'foto_phash': valor - (1 << 64) if valor >= 1 << 63 else valor}
+                                              for valor in hashes])
+    inicio = time.perf_counter()
+    indice = semelhanca.obter_indice(Pet)
+    print(f"carga do banco: {len(indice)} hash(es) em {time.perf_counter() - inicio:.2f} s")
+    engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hashes", type=int, default=100_000)
+    parser.add_argument("--distancia", type=int, default=7)
+    parser.add_argument("--buscas", type=int, default=2000)
+    parser.add_argument("--vies", type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        # Antes de importar database: o engine é criado no import
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(pasta, 'semelhanca.db')}"
+        os.chdir(pasta)
+        sys.path.insert(0, RAIZ)
+        ok = True
+        for nome, vies in (("uniforme", None), ("enviesado", args.vies)):
+            ok = medir_busca(nome, gerar_hashes(args.hashes, vies), args.distancia, args.buscas) and ok
+        medir_carga(gerar_hashes(args.hashes))
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
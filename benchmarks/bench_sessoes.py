@@ -0,0 +1,109 @@
+"""Benchmark: uma sessão por rerun x sessões curtas (database.leitura) com muitos usuários
+
+Simula N sessões do Streamlit rodando reruns ao mesmo tempo. Cada rerun faz a
+listagem de doadores e "desenha" a página (sleep de --render ms, o tempo dos
+widgets). No modelo antigo a sessão abria no topo do script e fechava no fim,
+então a conexão ficava presa durante o desenho; com leitura() ela volta ao
+pool assim que a consulta termina. Entre um rerun e outro cada usuário "pensa"
+um tempo aleatório. Mede p50/p95 do rerun, quanto tempo cada rerun segura uma
+conexão e o pico de conexões em uso (pool de DB_POOL_SIZE + DB_MAX_OVERFLOW).
+
+Uso:
+    python benchmarks/bench_sessoes.py [--usuarios 40] [--reruns 10] [--render 100] [--doadores 25]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def popular(doadores):
+    from datetime import date
+    from database import engine, inicializar_banco, Doador, ItemDoacao
+    inicializar_banco()
+    with engine.begin() as conn:
+        conn.execute(Doador.__table__.insert(), [
+            {'cpf': f'{i:011d}', 'nome': f'Doador {i}', 'cidade': 'Cidade', 'estado': 'SP', 'usuario_id': 1,
+             'prazo_disponibilidade': date(2030, 1, 1)} for i in range(1, doadores + 1)])
+        conn.execute(ItemDoacao.__table__.insert(), [
+            {'doador_id': i % doadores + 1, 'item': f'Item {i}', 'quantidade': 1} for i in range(doadores * 2)])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--usuarios", type=int, default=40)
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--render", type=float, default=100, help="ms desenhando a página por rerun")
+    parser.add_argument("--doadores", type=int, default=25)
+    args = parser.parse_args()
+
+    origem = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta)
+        sys.path.insert(0, RAIZ)
+        from sqlalchemy import event
+        from database import engine, get_session, leitura
+        from consultas import listar_doadores
+        popular(args.doadores)
+
+        em_uso = {'atual': 0, 'pico': 0, 'presa': []}
+        lock = threading.Lock()
+
+        @event.listens_for(engine, "checkout")
+        def _retirada(conexao, registro, proxy):
+            registro.info['retirada'] = time.perf_counter()
+            with lock:
+                em_uso['atual'] += 1
+                em_uso['pico'] = max(em_uso['pico'], em_uso['atual'])
+
+        @event.listens_for(engine, "checkin")
+        def _devolvida(conexao, registro):
+            with lock:
+                em_uso['atual'] -= 1
+                em_uso['presa'].append(time.perf_counter() - registro.info.pop('retirada'))
+
+        def rerun_antigo():
+            session = get_session()
+            doadores = listar_doadores(session)
+            time.sleep(args.render / 1000)
+            nomes = [doador.nome for doador in doadores]
+            session.close()
+            return nomes
+
+        def rerun_curto():
+            with leitura() as session:
+                doadores = listar_doadores(session)
+            time.sleep(args.render / 1000)
+            return [doador.nome for doador in doadores]
+
+        def usuario(rerun):
+            aleatorio = random.Random(threading.get_ident())
+            tempos = []
+            for _ in range(args.reruns):
+                time.sleep(aleatorio.uniform(0, 4 * args.render) / 1000)
+                inicio = time.perf_counter()
+                rerun()
+                tempos.append(time.perf_counter() - inicio)
+            return tempos
+
+        print(f"{args.usuarios} usuários x {args.reruns} reruns, {args.render:.0f} ms desenhando cada página, "
+              f"pool de {engine.pool.size()} + overflow")
+        print(f"{'modelo':>18} | {'p50':>8} | {'p95':>9} | {'conexão presa':>13} | {'pico conexões':>13}")
+        for nome, rerun in (("sessão por rerun", rerun_antigo), ("leitura() curta", rerun_curto)):
+            em_uso['pico'] = 0
+            em_uso['presa'] = []
+            with ThreadPoolExecutor(args.usuarios) as executor:
+                tempos = sorted(t for lista in executor.map(usuario, [rerun] * args.usuarios) for t in lista)
+            p50 = statistics.median(tempos) * 1000
+            p95 = tempos[int(len(tempos) * 0.95) - 1] * 1000
+            presa = statistics.mean(em_uso['presa']) * 1000
+            print(f"{nome:>18} | {p50:5.1f} ms | {p95:6.1f} ms | {presa:10.1f} ms | {em_uso['pico']:>13}")
+        os.chdir(origem)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Verificação do backend de banco: roda o mesmo roteiro no SQLite e no PostgreSQL
+
+Sem opções usa um SQLite temporário. Com --postgres-url usa um PostgreSQL já
+existente (ex.: serviço do CI) e com --postgres-local sobe um PostgreSQL
+temporário com initdb/pg_ctl (do PATH ou de PG_BIN; precisa rodar sem ser root).
+
+Uso:
+    python benchmarks/verificar_backend.py [--sqlite] [--postgres-local] [--postgres-url URL]
+"""
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def verificar_migracoes():
+    """Banco na última revisão e modelos iguais ao que as migrações criam"""
+    from alembic import command
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+    from database import engine, ALEMBIC_INI, ultima_revisao, revisao_atual
+    config = Config(ALEMBIC_INI)
+    ultima = ScriptDirectory.from_config(config).get_current_head()
+    assert ultima_revisao() == ultima, f"ultima_revisao() = {ultima_revisao()}, Alembic: {ultima}"
+    with engine.connect() as conn:
+        assert revisao_atual(conn) == ultima
+    # Levanta AutogenerateDiffsDetected se um modelo mudou sem revisão nova
+    command.check(config)
+    print(f"✅ migrações em dia ({ultima})")
+
+def verificar_limitador():
+    """Logins/IPs diferentes a cada tentativa não fazem o limitador crescer sem fim"""
+    from autenticacao import Limitador
+    limitador = Limitador(maximo=5, janela_s=900, max_chaves=1000)
+    for numero in range(20000):
+        limitador.registrar(f"login{numero}")
+        assert len(limitador.eventos) <= 1000, f"{len(limitador.eventos)} chaves guardadas (máximo 1000)"
+    limitador.registrar("vitima")
+    assert limitador.espera("vitima") == 0 and "vitima" in limitador.eventos
+    print("✅ limitador de tentativas limitado")
+
+def roteiro():
+    """Exercita o que o app usa do banco; levanta AssertionError na primeira divergência"""
+    sys.path.insert(0, RAIZ)
+    from database import engine, get_session, inicializar_banco, inserir_em_massa, sincronizar_itens, ao_confirmar
+    from database import Doador, ItemDoacao, Receptor
+    from consultas import contar_itens, pagina_itens, listar_doadores, listar_usuarios_com_contagens
+    from estatisticas import obter_estatisticas
+    from geografia import localizar_cep
+
+    print(f"🔌 {engine.dialect.name}")
+    assert inicializar_banco()
+    assert not inicializar_banco(), "a segunda chamada no mesmo processo não deve refazer nada"
+    inicializar_banco(forcar=True)  # idempotente: segunda passada no mesmo banco não pode falhar
+    verificar_migracoes()
+    verificar_limitador()
+
+    session = get_session()
+    try:
+        doador = Doador(cpf="52998224725", nome="Doadora Teste", cep="01310-100", cidade="São Paulo", estado="SP",
+                        pode_entregar=True, prazo_disponibilidade=date(2099, 1, 1))
+        session.add(doador)
+        session.flush()
+        session.add(ItemDoacao(doador_id=doador.id, item="Colchão de solteiro", quantidade=1, descricao="novo"))
+        session.add(Receptor(cpf="11144477735", nome="Receptor Teste", qtde_pessoas=3, pode_retirar=True))
+        session.commit()
+        doador_id = doador.id
+
+        with engine.begin() as conn:
+            inserir_em_massa(conn, ItemDoacao.__table__, [
+                {'doador_id': doador_id, 'item': f"Cobertor {i:04d}", 'quantidade': i % 5 + 1,
+                 'descricao': '' if i % 2 else None}
+                for i in range(1000)
+            ])
+        assert session.query(ItemDoacao).filter(ItemDoacao.item.like("Cobertor%")).count() == 1000
+        assert session.query(ItemDoacao).filter(ItemDoacao.data_cadastro.is_(None)).count() == 0, \
+            "inserir_em_massa deve preencher data_cadastro"
+        assert session.query(ItemDoacao).filter(ItemDoacao.descricao == '').count() == 500, \
+            "texto vazio e NULL devem continuar distintos"
+
+        assert contar_itens(session, "cobertor", "Disponíveis") == 1000
+        assert contar_itens(session, "colch", "Todos") >= 1
+
+        # Coordenadas vêm do CEP ao gravar; raio e ordenação por distância
+        assert doador.latitude is not None, "doador deve ser localizado pelo CEP"
+        perto = localizar_cep("01311-000")
+        assert contar_itens(session, "colch", "Todos", perto, 10) == 1
+        assert contar_itens(session, "colch", "Todos", localizar_cep("90010-150"), 10) == 0
+        mais_perto, _, _ = pagina_itens(session, "", "Todos", 5, origem=perto, raio_km=50, por_distancia=True)
+        assert len(mais_perto) == 5
+
+        pagina, _, proximo = pagina_itens(session, "cobertor", "Todos", 25)
+        assert len(pagina) == 25 and proximo is not None
+        segunda, anterior, _ = pagina_itens(session, "cobertor", "Todos", 25, depois=proximo)
+        assert {i.id for i, _ in pagina}.isdisjoint({i.id for i, _ in segunda})
+        volta, _, _ = pagina_itens(session, "cobertor", "Todos", 25, antes=anterior)
+        assert [i.id for i, _ in volta] == [i.id for i, _ in pagina]
+
+        assert any(d.id == doador_id and len(d.itens) == 1001 for d in listar_doadores(session))
+        listar_usuarios_com_contagens(session)
+        assert obter_estatisticas()['itens'] >= 1001
+
+        # Item tirado no formulário de edição: delete-orphan apaga a linha e o aviso é "removido"
+        avisos = []
+        ao_confirmar(avisos.append)
+        antes = obter_estatisticas()['itens']
+        session.expire_all()
+        doador = session.get(Doador, doador_id)
+        manter = [{'id': item.id, 'item': item.item, 'quantidade': item.quantidade,
+                   'descricao': item.descricao or '', 'foto': None}
+                  for item in doador.itens if item.item != "Colchão de solteiro"]
+        assert sincronizar_itens(session, doador, manter)[2] == 1
+        session.commit()
+        removidos = [aviso['itens_doacao'].get('removido') for aviso in avisos if 'itens_doacao' in aviso]
+        assert removidos and all(ids for ids in removidos), "remoção por delete-orphan avisada como alteração"
+        assert obter_estatisticas()['itens'] == antes - 1, "estatísticas não foram invalidadas"
+    finally:
+        session.close()
+    print("✅ roteiro ok")
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def executar(url, pasta):
+    """Roda o roteiro em outro processo, com DATABASE_URL apontando para o banco"""
+    ambiente = dict(os.environ, DATABASE_URL=url, FOTOS_DIR=os.path.join(pasta, "fotos"))
+    return subprocess.run([sys.executable, os.path.abspath(__file__), "--roteiro"], cwd=pasta, env=ambiente).returncode
+
+def postgres_local(pasta):
+    """Sobe um PostgreSQL descartável em `pasta`; retorna (url, função para parar)"""
+    binarios = os.environ.get("PG_BIN")
+    initdb = os.path.join(binarios, "initdb") if binarios else shutil.which("initdb")
+    pg_ctl = os.path.join(binarios, "pg_ctl") if binarios else shutil.which("pg_ctl")
+    if not initdb or not os.path.exists(initdb):
+        raise SystemExit("initdb não encontrado: instale o PostgreSQL ou defina PG_BIN")
+
+    dados = os.path.join(pasta, "pgdata")
+    porta = porta_livre()
+    subprocess.run([initdb, "-D", dados, "-U", "postgres", "--auth=trust", "-E", "UTF8"],
+                   check=True, stdout=subprocess.DEVNULL)
+    subprocess.run([pg_ctl, "-D", dados, "-l", os.path.join(pasta, "pg.log"), "-w",
+                    "-o", f"-p {porta} -k {pasta} -c listen_addresses=127.0.0.1", "start"],
+                   check=True, stdout=subprocess.DEVNULL)
+    time.sleep(0.5)
+
+    def parar():
+        subprocess.run([pg_ctl, "-D", dados, "-m", "fast", "stop"], stdout=subprocess.DEVNULL)
+
+    return f"postgresql://postgres@127.0.0.1:{porta}/postgres", parar
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sqlite", action="store_true", help="SQLite temporário (padrão)")
+    parser.add_argument("--postgres-local", action="store_true", help="PostgreSQL temporário via initdb/pg_ctl")
+    parser.add_argument("--postgres-url", help="PostgreSQL existente (banco vazio)")
+    parser.add_argument("--roteiro", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.roteiro:
+        roteiro()
+        return
+
+    falhas = 0
+    with tempfile.TemporaryDirectory() as pasta:
+        if args.sqlite or not (args.postgres_local or args.postgres_url):
+            falhas += executar(f"sqlite:///{os.path.join(pasta, 'verificacao.db')}", pasta) != 0
+        if args.postgres_url:
+            falhas += executar(args.postgres_url, pasta) != 0
+        if args.postgres_local:
+            url, parar = postgres_local(pasta)
+            try:
+                falhas += executar(url, pasta) != 0
+            finally:
+                parar()
+    sys.exit(1 if falhas else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Verificação: as páginas emitem um número constante de consultas (sem N+1)
+
+Popula bancos temporários de tamanhos diferentes, repete o que cada página lê
+(inclusive os relacionamentos usados na tela) e falha se alguma passar do limite.
+
+Uso:
+    python benchmarks/verificar_consultas.py [--doadores 5 200]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Página -> máximo de comandos SQL, independente da quantidade de linhas
+LIMITES = {
+    "Visualizar Cadastros - Doações": 2,
+    "Visualizar Cadastros - Solicitações": 1,
+    "Visualizar Cadastros - Pets": 1,
+    "Pesquisar Doações": 2,
+    "Pesquisar Pets": 1,
+    # pets + atualização do índice de fotos parecidas + os candidatos de todos os pets juntos
+    "Area dos Pets - possíveis correspondências": 3,
+    "Administração - usuários": 1,
+}
+
+def popular(doadores):
+    from datetime import date
+    from database import engine, inicializar_banco, Usuario, Doador, ItemDoacao, Receptor, Pet
+    inicializar_banco()
+    with engine.begin() as conn:
+        conn.execute(Usuario.__table__.insert(), [{'login': f'usuario{i}', 'cpf': f'{i:011d}'}
+                                                  for i in range(2, doadores + 2)])
+        conn.execute(Doador.__table__.insert(), [{'usuario_id': i + 2, 'cpf': f'{i:011d}', 'nome': f'Doador {i}',
+                                                  'prazo_disponibilidade': date(2030, 1, 1)}
+                                                 for i in range(doadores)])
+        conn.execute(ItemDoacao.__table__.insert(), [{'doador_id': i // 3 + 1, 'item': f'Item {i}', 'quantidade': 1}
+                                                     for i in range(doadores * 3)])
+        conn.execute(Receptor.__table__.insert(), [{'usuario_id': i + 2, 'cpf': f'{i:011d}', 'nome': f'Receptor {i}'}
+                                                   for i in range(doadores)])
+        # Pares perdido/encontrado com a mesma foto: todo pet tem uma correspondência
+        conn.execute(Pet.__table__.insert(), [{'usuario_id': i + 2, 'especie': 'Gato',
+                                               'situacao': 'Perdido' if i % 2 else 'Encontrado',
+                                               'foto_phash': (i // 2) * 0x0101010101010101}
+                                              for i in range(doadores)])
+
+def paginas():
+    """O que cada página lê do banco, incluindo os atributos exibidos"""
+    from armazenamento import tem_foto
+    from semelhanca import possiveis_correspondencias
+    from consultas import (listar_doadores, listar_receptores, listar_pets, filtrar_pets,
+                           listar_usuarios_com_contagens, contar_itens, pagina_itens)
+
+    def doacoes(session):
+        for doador in listar_doadores(session):
+            doador.usuario.login
+            for item in doador.itens:
+                tem_foto(item)
+
+    def solicitacoes(session):
+        for receptor in listar_receptores(session):
+            receptor.usuario.login
+
+    def pets(session):
+        for pet in listar_pets(session):
+            pet.usuario.login
+            tem_foto(pet)
+
+    def pesquisar_doacoes(session):
+        contar_itens(session, "", "Todos")
+        resultados, _, _ = pagina_itens(session, "", "Todos", 100)
+        for item, doador in resultados:
+            tem_foto(item)
+            doador.nome
+
+    def pesquisar_pets(session):
+        for pet in filtrar_pets(session, "Todas", "Todas", ""):
+            tem_foto(pet)
+
+    def correspondencias_pets(session):
+        pets = listar_pets(session)
+        for sugestoes in possiveis_correspondencias(session, pets).values():
+            for _, outro in sugestoes:
+                outro.nome, outro.situacao, outro.local_encontro, outro.contato, outro.miniatura_hash
+
+    def administracao(session):
+        listar_usuarios_com_contagens(session)
+
+    return {
+        "Visualizar Cadastros - Doações": doacoes,
+        "Visualizar Cadastros - Solicitações": solicitacoes,
+        "Visualizar Cadastros - Pets": pets,
+        "Pesquisar Doações": pesquisar_doacoes,
+        "Pesquisar Pets": pesquisar_pets,
+        "Area dos Pets - possíveis correspondências": correspondencias_pets,
+        "Administração - usuários": administracao,
+    }
+
+def verificar(pasta, doadores):
+    os.chdir(pasta)
+    sys.path.insert(0, RAIZ)
+    from database import engine, get_session
+    from instrumentacao import limitar_consultas
+    popular(doadores)
+
+    falhas = 0
+    for nome, pagina in paginas().items():
+        session = get_session()
+        try:
+            with limitar_consultas(engine, LIMITES[nome], nome) as contador:
+                pagina(session)
+            print(f"✅ {nome}: {contador.total} consulta(s)")
+        except AssertionError as e:
+            falhas += 1
+            print(f"❌ {e}")
+        finally:
+            session.close()
+    return falhas
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--doadores", type=int, nargs="+", default=[5, 200])
+    parser.add_argument("--pasta", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.pasta:
+        sys.exit(1 if verificar(args.pasta, args.doadores[0]) else 0)
+
+    falhou = False
+    for doadores in args.doadores:
+        print(f"--- {doadores} doadores ---")
+        # Processo separado por tamanho: cada um com seu banco e seu engine
+        with tempfile.TemporaryDirectory() as pasta:
+            resultado = subprocess.run([sys.executable, os.path.abspath(__file__),
+                                        "--pasta", pasta, "--doadores", str(doadores)])
+            falhou = falhou or resultado.returncode != 0
+    sys.exit(1 if falhou else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Verificação: as consultas das páginas usam índices (EXPLAIN sem varredura completa)
+
+Popula um banco temporário com distribuições parecidas com as reais (prazos
+vencidos e futuros, espécies e situações variadas), roda ANALYZE e repete o que
+cada página lê. Cada SELECT emitido passa por EXPLAIN com os mesmos parâmetros:
+
+- SQLite: EXPLAIN QUERY PLAN; falha em "SCAN <tabela>" sem índice e, nas páginas
+  com keyset, em "USE TEMP B-TREE FOR ORDER BY" (a página tem que sair do índice).
+- PostgreSQL (--postgres-url): EXPLAIN (FORMAT JSON) com enable_seqscan = off,
+  para que um "Seq Scan" só apareça quando nenhum índice serve; nas páginas com
+  keyset falha em "Sort".
+
+As varreduras inerentes à consulta (listagens completas, ilike com curinga no
+começo) ficam em PERMITIDAS com o motivo.
+
+Uso:
+    python benchmarks/verificar_planos.py [--doadores 3000] [--postgres-url URL]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Caso -> {tabela: motivo} das varreduras completas esperadas
+PERMITIDAS = {
+    "Visualizar Cadastros - Doações": {'doadores': "lista todos os doadores"},
+    "Visualizar Cadastros - Solicitações": {'receptores': "lista todos os receptores"},
+    "Visualizar Cadastros - Pets": {'pets': "lista todos os pets"},
+    "Pesquisar Pets - todas": {'pets': "sem filtro: lista todos os pets"},
+    "Pesquisar Pets - nome": {'pets': "ilike '%nome%' não usa índice b-tree"},
+    "Administração - usuários": {'usuarios': "lista todos os usuários"},
+}
+# Sem FTS5 (PostgreSQL) o termo vira ilike '%termo%'
+PERMITIDAS_SEM_FTS = {'itens_doacao': "ilike '%termo%' não usa índice b-tree"}
+
+# Casos paginados por keyset: a ordem tem que vir do índice
+ORDENADOS = {"Pesquisar Doações - página", "Pesquisar Doações - próxima página",
+             "Pesquisar Doações - página anterior"}
+
+ESPECIES = ["Cachorro", "Gato", "Ave", "Outro"]
+SITUACOES = ["Perdido", "Encontrado", "Para Adoção"]
+ITENS = ["Arroz 5kg", "feijão", "Cobertor", "colchão de solteiro", "Roupas infantis", "Fraldas G", "cadeira"]
+
+def popular(doadores):
+    import random
+    from datetime import date, datetime, timedelta
+    from database import engine, inicializar_banco, Usuario, Doador, ItemDoacao, Receptor, Pet
+    inicializar_banco()
+    aleatorio = random.Random(21)
+    usuarios = max(2, doadores // 10)
+    hoje = date.today()
+    with engine.begin() as conn:
+        conn.execute(Usuario.__table__.insert(), [{'login': f'usuario{i}', 'cpf': f'{i:011d}'}
+                                                  for i in range(2, usuarios + 2)])
+        conn.execute(Doador.__table__.insert(), [
+            {'usuario_id': aleatorio.randint(2, usuarios + 1), 'cpf': f'{i:011d}', 'nome': f'Doador {i}',
+             'prazo_disponibilidade': hoje + timedelta(days=aleatorio.randint(-400, 60))}
+            for i in range(doadores)])
+        conn.execute(ItemDoacao.__table__.insert(), [
+            {'doador_id': aleatorio.randint(1, doadores), 'item': f'{aleatorio.choice(ITENS)} {i}', 'quantidade': 1}
+            for i in range(doadores * 4)])
+        conn.execute(Receptor.__table__.insert(), [
+            {'usuario_id': aleatorio.randint(2, usuarios + 1), 'cpf': f'{i:011d}', 'nome': f'Receptor {i}'}
+            for i in range(doadores // 2)])
+        conn.execute(Pet.__table__.insert(), [
+            {'usuario_id': aleatorio.randint(2, usuarios + 1), 'nome': f'Pet {i}',
+             'especie': aleatorio.choice(ESPECIES), 'situacao': aleatorio.choice(SITUACOES),
+             'data_cadastro': datetime(2024, 1, 1) + timedelta(hours=i)}
+            for i in range(doadores)])
+        conn.execute(ItemDoacao.__table__.update().where(ItemDoacao.id % 50 == 0).values(item="Cobertor"))
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+def casos():
+    """Caso -> função que faz as leituras da página"""
+    from database import Usuario, Doador
+    from consultas import (listar_doadores, listar_receptores, listar_pets, filtrar_pets,
+                           listar_usuarios_com_contagens, contar_itens, pagina_itens)
+
+    def cursores(session):
+        _, _, proximo = pagina_itens(session, "", "Disponíveis", 25)
+        return proximo
+
+    return {
+        "Login": lambda session: session.query(Usuario).filter(Usuario.login == "usuario5").first(),
+        "CPF já cadastrado": lambda session: session.query(Doador.id).filter(Doador.cpf == "00000000042").first(),
+        "Editar doação": lambda session: session.get(Doador, 42),
+        "Visualizar Cadastros - Doações": lambda session: [d.itens for d in listar_doadores(session)],
+        "Visualizar Cadastros - Solicitações": listar_receptores,
+        "Visualizar Cadastros - Pets": listar_pets,
+        "Pesquisar Doações - total disponíveis": lambda session: contar_itens(session, "", "Disponíveis"),
+        "Pesquisar Doações - total vencidos": lambda session: contar_itens(session, "", "Vencidos"),
+        "Pesquisar Doações - página": lambda session: pagina_itens(session, "", "Todos", 25),
+        "Pesquisar Doações - próxima página":
+            lambda session: pagina_itens(session, "", "Disponíveis", 25, depois=cursores(session)),
+        "Pesquisar Doações - página anterior":
+            lambda session: pagina_itens(session, "", "Vencidos", 25, antes=("cobertor", 1000)),
+        "Pesquisar Doações - termo": lambda session: pagina_itens(session, "cobertor", "Disponíveis", 25),
+        "Pesquisar Pets - espécie e situação": lambda session: filtrar_pets(session, "Gato", "Perdido", ""),
+        "Pesquisar Pets - espécie": lambda session: filtrar_pets(session, "Ave", "Todas", ""),
+        "Pesquisar Pets - todas": lambda session: filtrar_pets(session, "Todas", "Todas", ""),
+        "Pesquisar Pets - nome": lambda session: filtrar_pets(session, "Todas", "Todas", "rex"),
+        "Administração - usuários": listar_usuarios_com_contagens,
+    }
+
+def problemas_sqlite(conn, statement, parametros, tabelas, ordenado):
+    """(tabelas varridas sem índice, ordenou em memória?) pelo EXPLAIN QUERY PLAN"""
+    linhas = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parametros).all()
+    varridas = set()
+    ordenou = False
+    for linha in linhas:
+        detalhe = linha[-1]
+        encontrado = re.match(r"SCAN (\w+)(.*)", detalhe)
+        if encontrado and encontrado.group(1) in tabelas and "USING" not in encontrado.group(2):
+            varridas.add(encontrado.group(1))
+        ordenou = ordenou or (ordenado and detalhe.startswith("USE TEMP B-TREE FOR ORDER BY"))
+    return varridas, ordenou, [linha[-1] for linha in linhas]
+
+def problemas_postgres(conn, statement, parametros, tabelas, ordenado):
+    """(tabelas com Seq Scan, ordenou em memória?) pelo EXPLAIN (FORMAT JSON)"""
+    plano = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parametros).scalar()
+    varridas = set()
+    ordenou = False
+    pendentes = [plano[0]['Plan']]
+    while pendentes:
+        no = pendentes.pop()
+        if no['Node Type'] == "Seq Scan" and no.get('Relation Name') in tabelas:
+            varridas.add(no['Relation Name'])
+        ordenou = ordenou or (ordenado and no['Node Type'] in ("Sort", "Incremental Sort"))
+        pendentes.extend(no.get('Plans', []))
+    return varridas, ordenou, [plano]
+
+def verificar(pasta, doadores):
+    os.chdir(pasta)
+    sys.path.insert(0, RAIZ)
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    from database import engine, Base
+    import busca_textual
+    popular(doadores)
+
+    postgres = engine.dialect.name == "postgresql"
+    explicar = problemas_postgres if postgres else problemas_sqlite
+    tabelas = set(Base.metadata.tables)
+    print(f"🔌 {engine.dialect.name}, {doadores} doadores")
+
+    falhas = 0
+    for nome, pagina in casos().items():
+        comandos = []
+
+        def capturar(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                comandos.append((statement, parameters))
+
+        with engine.connect() as conn:
+            event.listen(engine, "before_cursor_execute", capturar)
+            try:
+                with Session(bind=conn) as session:
+                    pagina(session)
+            finally:
+                event.remove(engine, "before_cursor_execute", capturar)
+            if postgres:
+                conn.exec_driver_sql("SET enable_seqscan = off")
+
+            permitidas = dict(PERMITIDAS.get(nome, {}))
+            if nome.endswith("termo") and not busca_textual.FTS_ATIVO:
+                permitidas.update(PERMITIDAS_SEM_FTS)
+            erros = []
+            for statement, parametros in comandos:
+                varridas, ordenou, plano = explicar(conn, statement, parametros, tabelas, nome in ORDENADOS)
+                if varridas - permitidas.keys() or ordenou:
+                    motivo = ", ".join(sorted(varridas - permitidas.keys())) or "ordenação fora do índice"
+                    erros.append(f"  {motivo}: {statement.splitlines()[0][:100]}\n    {plano}")
+            conn.rollback()
+
+        if erros:
+            falhas += 1
+            print(f"❌ {nome}\n" + "\n".join(erros))
+        else:
+            observacao = f" (varredura esperada: {'; '.join(permitidas.values())})" if permitidas else ""
+            print(f"✅ {nome}: {len(comandos)} consulta(s){observacao}")
+    return falhas
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--doadores", type=int, default=3000)
+    parser.add_argument("--postgres-url", help="PostgreSQL existente (banco vazio)")
+    parser.add_argument("--pasta", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.pasta:
+        sys.exit(1 if verificar(args.pasta, args.doadores) else 0)
+
+    falhou = False
+    with tempfile.TemporaryDirectory() as pasta:
+        urls = [f"sqlite:///{os.path.join(pasta, 'planos.db')}"] + ([args.postgres_url] if args.postgres_url else [])
+        for url in urls:
+            # Processo separado por banco: cada um com seu engine
+            ambiente = dict(os.environ, DATABASE_URL=url, FOTOS_DIR=os.path.join(pasta, "fotos"))
+            resultado = subprocess.run([sys.executable, os.path.abspath(__file__), "--pasta", pasta,
+                                        "--doadores", str(args.doadores)], env=ambiente)
+            falhou = falhou or resultado.returncode != 0
+    sys.exit(1 if falhou else 0)
+
+if __name__ == "__main__":
+    main()
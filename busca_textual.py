@@ -0,0 +1,95 @@
+import re
+from sqlalchemy import Table, Column, Integer, Text, MetaData, text, literal_column
+
+# Índice FTS5 (SQLite) sobre item e descrição das doações.
+# "remove_diacritics 2" faz "colchao" casar com "colchão"; prefix acelera buscas por prefixo.
+DDL_INDICE = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS itens_busca USING fts5(
+        item, descricao,
+        content='itens_doacao', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2",
+        prefix='2 3'
+    )""",
+    # Triggers mantêm o índice em sincronia com qualquer escrita em itens_doacao
+    """CREATE TRIGGER IF NOT EXISTS itens_busca_ai AFTER INSERT ON itens_doacao BEGIN
+        INSERT INTO itens_busca(rowid, item, descricao) VALUES (new.id, new.item, new.descricao);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS itens_busca_ad AFTER DELETE ON itens_doacao BEGIN
+        INSERT INTO itens_busca(itens_busca, rowid, item, descricao) VALUES ('delete', old.id, old.item, old.descricao);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS itens_busca_au AFTER UPDATE OF item, descricao ON itens_doacao BEGIN
+        INSERT INTO itens_busca(itens_busca, rowid, item, descricao) VALUES ('delete', old.id, old.item, old.descricao);
+        INSERT INTO itens_busca(rowid, item, descricao) VALUES (new.id, new.item, new.descricao);
+    END""",
+]
+
+# No PostgreSQL a pesquisa continua com ilike, acelerado por índices de trigramas
+DDL_TRIGRAMA = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_itens_doacao_item_trgm ON itens_doacao USING gin (item gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_itens_doacao_descricao_trgm ON itens_doacao USING gin (descricao gin_trgm_ops)",
+]
+
+# Metadata própria: a tabela virtual não deve passar pelo create_all
+itens_busca = Table(
+    "itens_busca", MetaData(),
+    Column("rowid", Integer, primary_key=True),
+    Column("item", Text),
+    Column("descricao", Text),
+)
+
+# Relevância: acerto no nome do item pesa 10x mais que na descrição (menor = melhor)
+RANK = literal_column("bm25(itens_busca, 10.0, 1.0)")
+
+# Fica False quando o banco não é SQLite ou o SQLite não tem FTS5; a pesquisa volta ao ilike
+FTS_ATIVO = False
+
+def criar_indice_busca(engine):
+    """Cria o índice e os triggers se ainda não existirem (preenchendo com as linhas atuais)"""
+    global FTS_ATIVO
+    if engine.dialect.name == "postgresql":
+        FTS_ATIVO = False
+        criar_indices_trigrama(engine)
+        return
+    if engine.dialect.name != "sqlite":
+        FTS_ATIVO = False
+        return
+    try:
+        with engine.begin() as conn:
+            existe = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'itens_busca'")).first()
+            if not existe:
+                for ddl in DDL_INDICE:
+                    conn.execute(text(ddl))
+                conn.execute(text("INSERT INTO itens_busca(itens_busca) VALUES ('rebuild')"))
+                print("🔎 Índice de busca criado")
+        FTS_ATIVO = True
+    except Exception as e:
+        FTS_ATIVO = False
+        print(f"⚠️ Busca textual indisponível, usando ilike: {e}")
+
+def criar_indices_trigrama(engine):
+    """Índices GIN de trigramas (pg_trgm) para o ilike de item e descrição no PostgreSQL"""
+    try:
+        with engine.begin() as conn:
+            for ddl in DDL_TRIGRAMA:
+                conn.execute(text(ddl))
+    except Exception as e:
+        print(f"⚠️ pg_trgm indisponível, pesquisa sem índice de trigramas: {e}")
+
+def reconstruir_indice(engine):
+    """Reindexa todas as linhas de itens_doacao (backfill)"""
+    criar_indice_busca(engine)
+    if not FTS_ATIVO:
+        return False
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO itens_busca(itens_busca) VALUES ('rebuild')"))
+    return True
+
+def montar_consulta(termo):
+    """Converte o texto digitado em consulta FTS5: cada palavra vira um prefixo ("arr"*)"""
+    palavras = re.findall(r"\w+", termo or "")
+    return " ".join(f'"{palavra}"*' for palavra in palavras)
+
+def filtro_busca(consulta):
+    return text("itens_busca MATCH :consulta_busca").bindparams(consulta_busca=consulta)
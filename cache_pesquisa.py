@@ -0,0 +1,95 @@
+"""Cache por sessão dos resultados de "Pesquisar Doações"
+
+Cada rerun do Streamlit (abrir um expander, clicar em "Ver Foto") refazia o
+COUNT e a página. Aqui os resultados ficam no session_state como tuplas leves
+(nada ligado à sessão do SQLAlchemy), num LRU limitado. Qualquer commit em
+itens_doacao/doadores incrementa a geração global e os caches de todas as
+sessões são descartados na próxima leitura; o TTL cobre escritas feitas por
+outros processos (ex.: gerenciar.py importar). "Disponíveis" e "Vencidos"
+dependem da data de hoje, que entra na chave: à meia-noite a consulta muda.
+"""
+import os
+import threading
+import time
+from datetime import date
+from collections import OrderedDict, namedtuple
+from database import ao_confirmar, Doador, ItemDoacao
+from consultas import contar_itens, pagina_itens
+
+PESQUISA_CACHE_MAX = int(os.environ.get("PESQUISA_CACHE_MAX", "32"))
+PESQUISA_CACHE_TTL = int(os.environ.get("PESQUISA_CACHE_TTL", "30"))
+
+# Mesmos nomes de atributo dos modelos: a página usa um ou outro sem mudar
+ItemResultado = namedtuple("ItemResultado", "id item quantidade descricao foto_hash miniatura_hash tem_foto_legada "
+                                             "foto_original_hash")
+DoadorResultado = namedtuple("DoadorResultado", "id nome whatsapp telefone endereco numero bairro cidade estado "
+                                                "pode_entregar prazo_disponibilidade latitude longitude")
+
+_TABELAS = {ItemDoacao.__tablename__, Doador.__tablename__}
+_geracao = 0
+_lock_geracao = threading.Lock()
+
+def geracao_atual():
+    return _geracao
+
+@ao_confirmar
+def _nova_geracao(alteracoes):
+    global _geracao
+    if _TABELAS & alteracoes.keys():
+        with _lock_geracao:
+            _geracao += 1
+
+def _dia(filtro_disponibilidade):
+    """Data que o filtro usa (consultas.filtrar_itens compara o prazo com hoje); "Todos" não usa"""
+    return None if filtro_disponibilidade == "Todos" else date.today()
+
+def resultado_leve(item, doador):
+    """(ItemResultado, DoadorResultado) com só o que a página exibe"""
+    return (ItemResultado(*(getattr(item, campo) for campo in ItemResultado._fields)),
+            DoadorResultado(*(getattr(doador, campo) for campo in DoadorResultado._fields)))
+
+class CachePesquisa:
+    """LRU de até `maximo` consultas, descartado quando a geração muda"""
+
+    def __init__(self, maximo=PESQUISA_CACHE_MAX, ttl=PESQUISA_CACHE_TTL):
+        self.maximo = maximo
+        self.ttl = ttl
+        self.entradas = OrderedDict()  # chave -> (expira_em, valor)
+        self.geracao = geracao_atual()
+        self.acertos = self.faltas = 0
+
+    def obter(self, chave, calcular):
+        geracao = geracao_atual()
+        if geracao != self.geracao:
+            self.entradas.clear()
+            self.geracao = geracao
+        entrada = self.entradas.get(chave)
+        if entrada is not None and time.monotonic() < entrada[0]:
+            self.entradas.move_to_end(chave)
+            self.acertos += 1
+            return entrada[1]
+        self.faltas += 1
+        valor = calcular()
+        # Commit durante o cálculo: o resultado pode já estar velho, não guarda
+        if geracao == geracao_atual():
+            self.entradas[chave] = (time.monotonic() + self.ttl, valor)
+            self.entradas.move_to_end(chave)
+            while len(self.entradas) > self.maximo:
+                self.entradas.popitem(last=False)
+        return valor
+
+    def contar_itens(self, session, termo, filtro_disponibilidade, origem=None, raio_km=None):
+        return self.obter(("total", termo, filtro_disponibilidade, _dia(filtro_disponibilidade), origem, raio_km),
+                          lambda: contar_itens(session, termo, filtro_disponibilidade, origem, raio_km))
+
+    def pagina_itens(self, session, termo, filtro_disponibilidade, tamanho, depois=None, antes=None,
+                     origem=None, raio_km=None, por_distancia=False):
+        """Como consultas.pagina_itens, mas com os resultados como tuplas leves"""
+        def calcular():
+            resultados, anterior, proximo = pagina_itens(
+                session, termo, filtro_disponibilidade, tamanho, depois=depois, antes=antes,
+                origem=origem, raio_km=raio_km, por_distancia=por_distancia)
+            return [resultado_leve(item, doador) for item, doador in resultados], anterior, proximo
+        chave = ("pagina", termo, filtro_disponibilidade, _dia(filtro_disponibilidade), tamanho, depois, antes,
+                 origem, raio_km, por_distancia)
+        return self.obter(chave, calcular)
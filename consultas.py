@@ -0,0 +1,148 @@
+from datetime import datetime
+from sqlalchemy import func, or_
+from sqlalchemy.orm import joinedload, selectinload
+from database import Doador, ItemDoacao, Receptor, Pet, Usuario
+import busca_textual
+from busca_textual import itens_busca, montar_consulta, filtro_busca, RANK
+import geografia
+from geografia import doadores_geo, caixa, distancia_sql, KM_POR_GRAU
+
+# Tamanhos de página oferecidos em "Pesquisar Doações"
+TAMANHOS_PAGINA = [10, 25, 50, 100]
+
+def usa_busca_textual(termo):
+    """Com termo e FTS5 disponível a pesquisa usa o índice e ordena por relevância"""
+    return bool(montar_consulta(termo)) and busca_textual.FTS_ATIVO
+
+def filtrar_itens(query, termo, filtro_disponibilidade, origem=None, raio_km=None):
+    """Aplica os filtros da página de pesquisa em uma query que já tem ItemDoacao e Doador
+
+    origem = (latitude, longitude) de quem pesquisa; com ela só entram doadores localizados
+    e, com raio_km, só os que estão a até raio_km.
+    """
+    if termo:
+        if usa_busca_textual(termo):
+            query = (query.join(itens_busca, itens_busca.c.rowid == ItemDoacao.id)
+                     .filter(filtro_busca(montar_consulta(termo))))
+        else:
+            padrao = f"%{termo}%"
+            query = query.filter(or_(ItemDoacao.item.ilike(padrao), ItemDoacao.descricao.ilike(padrao)))
+
+    hoje = datetime.today().date()
+    if filtro_disponibilidade == "Disponíveis":
+        query = query.filter(Doador.prazo_disponibilidade >= hoje)
+    elif filtro_disponibilidade == "Vencidos":
+        query = query.filter(Doador.prazo_disponibilidade < hoje)
+
+    if origem is not None:
+        query = query.filter(Doador.latitude.isnot(None), Doador.longitude.isnot(None))
+        if raio_km:
+            min_lat, max_lat, min_lon, max_lon = caixa(origem, raio_km)
+            if geografia.GEO_ATIVO:
+                # R*Tree: só os doadores dentro do retângulo, sem varrer a tabela
+                query = (query.join(doadores_geo, doadores_geo.c.id == Doador.id)
+                         .filter(doadores_geo.c.max_lat >= min_lat, doadores_geo.c.min_lat <= max_lat,
+                                 doadores_geo.c.max_lon >= min_lon, doadores_geo.c.min_lon <= max_lon))
+            else:
+                query = query.filter(Doador.latitude.between(min_lat, max_lat),
+                                     Doador.longitude.between(min_lon, max_lon))
+            # Retângulo -> círculo
+            distancia = distancia_sql(origem, Doador.latitude, Doador.longitude)
+            query = query.filter(distancia <= (raio_km / KM_POR_GRAU) ** 2)
+    return query
+
+def contar_itens(session, termo, filtro_disponibilidade, origem=None, raio_km=None):
+    """COUNT separado para o total de resultados (não depende da página)"""
+    query = session.query(func.count(ItemDoacao.id)).join(Doador, ItemDoacao.doador_id == Doador.id)
+    return filtrar_itens(query, termo, filtro_disponibilidade, origem, raio_km).scalar()
+
+def pagina_itens(session, termo, filtro_disponibilidade, tamanho, depois=None, antes=None,
+                 origem=None, raio_km=None, por_distancia=False):
+    """Busca uma página usando keyset em vez de OFFSET
+
+    A ordem é (lower(item), id), (relevância bm25, id) quando há termo e busca textual, ou
+    (distância, id) com por_distancia e origem.
+    depois/antes são cursores devolvidos por uma chamada anterior.
+    Retorna (resultados, cursor_anterior, cursor_proximo); cursor None = não há página.
+    """
+    if por_distancia and origem is not None:
+        ordem = distancia_sql(origem, Doador.latitude, Doador.longitude)
+    elif usa_busca_textual(termo):
+        ordem = RANK
+    else:
+        # Mesma expressão do índice ix_itens_doacao_item_lower
+        ordem = func.lower(ItemDoacao.item)
+    query = session.query(ItemDoacao, Doador, ordem).join(Doador, ItemDoacao.doador_id == Doador.id)
+    query = filtrar_itens(query, termo, filtro_disponibilidade, origem, raio_km)
+    # (ordem, id) > cursor escrito por extenso: a condição só sobre a ordem vira busca por faixa
+    # no índice de expressão, o que a comparação de tuplas não consegue
+
+    if antes is not None:
+        # Voltando: lê de trás para frente a partir do cursor e desinverte
+        valor, ultimo_id = antes
+        linhas = (query.filter(ordem <= valor, or_(ordem < valor, ItemDoacao.id < ultimo_id))
+                  .order_by(ordem.desc(), ItemDoacao.id.desc())
+                  .limit(tamanho + 1).all())
+        tem_anterior = len(linhas) > tamanho
+        linhas = list(reversed(linhas[:tamanho]))
+        tem_proxima = True
+    else:
+        if depois is not None:
+            valor, ultimo_id = depois
+            query = query.filter(ordem >= valor, or_(ordem > valor, ItemDoacao.id > ultimo_id))
+        # Uma linha a mais só para saber se existe próxima página
+        linhas = query.order_by(ordem.asc(), ItemDoacao.id.asc()).limit(tamanho + 1).all()
+        tem_anterior = depois is not None
+        tem_proxima = len(linhas) > tamanho
+        linhas = linhas[:tamanho]
+
+    resultados = [(item, doador) for item, doador, _ in linhas]
+    cursor_anterior = (linhas[0][2], linhas[0][0].id) if linhas and tem_anterior else None
+    cursor_proximo = (linhas[-1][2], linhas[-1][0].id) if linhas and tem_proxima else None
+    return resultados, cursor_anterior, cursor_proximo
+
+# Listagens de "Visualizar Cadastros", "Area dos Pets" e "Administração".
+# Os relacionamentos usados na tela vêm junto (joinedload/selectinload), então o número
+# de consultas não cresce com o número de linhas.
+
+def listar_doadores(session):
+    return (session.query(Doador)
+            .options(joinedload(Doador.usuario), selectinload(Doador.itens))
+            .order_by(Doador.id)
+            .all())
+
+def listar_receptores(session):
+    return session.query(Receptor).options(joinedload(Receptor.usuario)).order_by(Receptor.id).all()
+
+def listar_pets(session):
+    return session.query(Pet).options(joinedload(Pet.usuario)).order_by(Pet.id).all()
+
+def filtrar_pets(session, especie, situacao, nome):
+    """Filtros da aba "Pesquisar Pets" ("Todas" = sem filtro), mais recentes primeiro"""
+    query = session.query(Pet)
+    if especie != "Todas":
+        query = query.filter(Pet.especie == especie)
+    if situacao != "Todas":
+        query = query.filter(Pet.situacao == situacao)
+    if nome:
+        query = query.filter(Pet.nome.ilike(f"%{nome}%"))
+    return query.order_by(Pet.data_cadastro.desc(), Pet.id.desc()).all()
+
+def listar_usuarios_com_contagens(session):
+    """Usuários com a quantidade de doações, solicitações e pets (COUNT agrupado, sem carregar coleções)"""
+    def contagem(modelo):
+        return (session.query(modelo.usuario_id, func.count(modelo.id).label("total"))
+                .group_by(modelo.usuario_id)
+                .subquery())
+
+    doadores, receptores, pets = contagem(Doador), contagem(Receptor), contagem(Pet)
+    linhas = (session.query(Usuario,
+                            func.coalesce(doadores.c.total, 0),
+                            func.coalesce(receptores.c.total, 0),
+                            func.coalesce(pets.c.total, 0))
+              .outerjoin(doadores, doadores.c.usuario_id == Usuario.id)
+              .outerjoin(receptores, receptores.c.usuario_id == Usuario.id)
+              .outerjoin(pets, pets.c.usuario_id == Usuario.id)
+              .order_by(Usuario.id)
+              .all())
+    return [tuple(linha) for linha in linhas]
@@ -0,0 +1,309 @@
+"""Correspondência entre doações (ofertas) e solicitações de ajuda (pedidos)
+
+Os nomes dos itens são normalizados para um catálogo de categorias; as ofertas
+ficam indexadas por (categoria, estado, cidade) e (categoria, estado). Cada
+pedido recebe os candidatos da sua cidade (e do estado, se faltar) ordenados
+por pontuação. Mudanças em uma oferta ou pedido só recalculam os pedidos
+afetados, sem varrer tudo de novo.
+"""
+import heapq
+import re
+import threading
+import unicodedata
+from collections import namedtuple, defaultdict
+from datetime import date
+from functools import lru_cache
+from sqlalchemy import select
+from database import leitura, ao_confirmar, Doador, ItemDoacao, Receptor
+
+# Ordem importa: o primeiro que casar define a categoria ("roupas infantis" é roupa,
+# "água sanitária" é limpeza). Radicais casam com o começo de cada palavra, sem acento;
+# expressões com espaço casam com o texto inteiro.
+CATEGORIAS = {
+    'limpeza': ("Limpeza", ["agua sanitaria", "detergente", "desinfetante", "sabao", "vassoura", "rodo",
+                            "alvejante", "limpeza", "esponja"]),
+    'higiene': ("Higiene pessoal", ["sabonete", "fralda", "absorvente", "pasta de dente", "creme dental",
+                                    "escova de dente", "shampoo", "xampu", "papel higienico", "desodorante",
+                                    "higiene"]),
+    'agua': ("Água", ["agua", "galao", "galoes"]),
+    'alimentos': ("Alimentos", ["aliment", "comida", "cesta", "arroz", "feij", "macarr", "leite", "oleo",
+                                "acucar", "cafe", "farinha", "enlatad", "biscoit", "bolach", "sardinha",
+                                "fuba", "mantiment"]),
+    'roupas': ("Roupas e calçados", ["roupa", "camis", "calca", "blusa", "agasalh", "casaco", "jaqueta",
+                                     "moletom", "sapato", "tenis", "chinelo", "sandalia", "bota", "meia",
+                                     "vestido", "bermuda", "short", "uniforme"]),
+    'cama_banho': ("Cama e banho", ["colch", "cobert", "lencol", "lencois", "travesseir", "toalha",
+                                    "edredom", "manta", "fronha"]),
+    'moveis': ("Móveis", ["cadeira", "mesa", "sofa", "cama", "beliche", "armario", "guarda roupa",
+                          "estante", "comoda"]),
+    'eletro': ("Eletrodomésticos", ["geladeira", "fogao", "fogoes", "microondas", "micro ondas",
+                                    "ventilador", "maquina de lavar", "tanquinho", "liquidificador",
+                                    "televis", "tv", "chuveiro"]),
+    'utensilios': ("Utensílios de cozinha", ["panela", "prato", "talher", "garfo", "colher", "copo",
+                                             "caneca", "frigideira", "utensil"]),
+    'infantil': ("Infantil", ["brinquedo", "berco", "carrinho de bebe", "mamadeira", "bebe", "infantil"]),
+    'escolar': ("Material escolar", ["caderno", "lapis", "caneta", "mochila", "escolar", "livro"]),
+    'saude': ("Saúde", ["remedio", "medicament", "curativo", "mascara", "alcool", "termometro"]),
+    'outros': ("Outros", []),
+}
+
+# Pesos da pontuação (maior = melhor)
+PESO_LOCAL = 3.0       # mesmo bairro > mesma cidade > mesmo estado
+PESO_LOGISTICA = 2.0   # doador entrega e/ou solicitante retira
+PESO_COBERTURA = 2.0   # quantidade oferecida x pessoas na família
+PESO_PRAZO = 1.0       # oferta perto de vencer sobe (para não se perder)
+
+CANDIDATOS_POR_PEDIDO = 10
+
+Oferta = namedtuple("Oferta", "id categoria item quantidade doador_id doador_nome whatsapp "
+                              "bairro cidade estado pode_entregar prazo")
+Pedido = namedtuple("Pedido", "id nome bairro cidade estado qtde_pessoas pode_retirar categorias")
+
+def normalizar(texto):
+    """minúsculas, sem acento e com espaços simples"""
+    texto = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode("ascii")
+    return " ".join(re.findall(r"[a-z0-9]+", texto.lower()))
+
+def _montar_radicais():
+    palavras, expressoes = {}, []
+    for categoria, (_, termos) in CATEGORIAS.items():
+        for termo in termos:
+            if " " in termo:
+                expressoes.append((f" {termo} ", categoria))
+            else:
+                palavras.setdefault(termo, categoria)
+    return palavras, expressoes
+
+_RADICAIS, _EXPRESSOES = _montar_radicais()
+_ORDEM = {categoria: posicao for posicao, categoria in enumerate(CATEGORIAS)}
+_TAMANHOS = sorted({len(radical) for radical in _RADICAIS})
+
+@lru_cache(maxsize=20000)
+def categorizar(nome):
+    """Categoria do catálogo para o nome de um item ('outros' se nenhuma casar)"""
+    texto = normalizar(nome)
+    achadas = [categoria for expressao, categoria in _EXPRESSOES if expressao in f" {texto} "]
+    for palavra in texto.split():
+        achadas += [_RADICAIS[palavra[:tamanho]] for tamanho in _TAMANHOS
+                    if tamanho <= len(palavra) and palavra[:tamanho] in _RADICAIS]
+    return min(achadas, key=_ORDEM.get) if achadas else 'outros'
+
+def categorias_do_pedido(necessidades):
+    """Categorias marcadas pelo solicitante; vazio = qualquer uma"""
+    chaves = [chave.strip() for chave in (necessidades or "").split(",") if chave.strip() in CATEGORIAS]
+    return frozenset(chaves or CATEGORIAS)
+
+def _no_prazo(oferta, hoje):
+    # Mesmo critério do "Disponíveis" de consultas.filtrar_itens
+    return oferta.prazo is not None and oferta.prazo >= hoje
+
+def pontuar(oferta, pedido, hoje):
+    """Pontuação de uma oferta para um pedido (None = não serve)"""
+    if not _no_prazo(oferta, hoje):
+        return None
+    if oferta.cidade != pedido.cidade:
+        local = 0.2
+    elif oferta.bairro and oferta.bairro == pedido.bairro:
+        local = 1.0
+    else:
+        local = 0.6
+    if oferta.pode_entregar and pedido.pode_retirar:
+        logistica = 1.0
+    elif oferta.pode_entregar or pedido.pode_retirar:
+        logistica = 0.7
+    else:
+        logistica = 0.0
+    pessoas = max(pedido.qtde_pessoas or 1, 1)
+    cobertura = min(oferta.quantidade or 0, pessoas) / pessoas
+    dias = (oferta.prazo - hoje).days
+    prazo = 1 / (1 + dias / 7)
+    return round(PESO_LOCAL * local + PESO_LOGISTICA * logistica +
+                 PESO_COBERTURA * cobertura + PESO_PRAZO * prazo, 3)
+
+class MotorCorrespondencia:
+    """Índice de ofertas + candidatos por pedido, atualizados incrementalmente"""
+
+    def __init__(self, limite=CANDIDATOS_POR_PEDIDO):
+        self.limite = limite
+        self.ofertas = {}
+        self.pedidos = {}
+        self.por_cidade = defaultdict(set)    # (categoria, estado, cidade) -> ids de ofertas
+        self.por_estado = defaultdict(set)    # (categoria, estado) -> ids de ofertas
+        self.pedidos_por_estado = defaultdict(set)
+        self.candidatos = {}                  # id do pedido -> [(pontuação, id da oferta)]
+
+    # --- ofertas ---
+    def incluir_oferta(self, oferta):
+        self.remover_oferta(oferta.id, recalcular=False)
+        self.ofertas[oferta.id] = oferta
+        self.por_cidade[(oferta.categoria, oferta.estado, oferta.cidade)].add(oferta.id)
+        self.por_estado[(oferta.categoria, oferta.estado)].add(oferta.id)
+
+    def remover_oferta(self, oferta_id, recalcular=True):
+        oferta = self.ofertas.pop(oferta_id, None)
+        if oferta is None:
+            return
+        self.por_cidade[(oferta.categoria, oferta.estado, oferta.cidade)].discard(oferta_id)
+        self.por_estado[(oferta.categoria, oferta.estado)].discard(oferta_id)
+        if recalcular:
+            self.recalcular_estado(oferta.estado, oferta.categoria)
+
+    # --- pedidos ---
+    def incluir_pedido(self, pedido, hoje=None):
+        self.remover_pedido(pedido.id)
+        self.pedidos[pedido.id] = pedido
+        self.pedidos_por_estado[pedido.estado].add(pedido.id)
+        self.candidatos[pedido.id] = self.calcular(pedido, hoje or date.today())
+
+    def remover_pedido(self, pedido_id):
+        pedido = self.pedidos.pop(pedido_id, None)
+        if pedido is not None:
+            self.pedidos_por_estado[pedido.estado].discard(pedido_id)
+            self.candidatos.pop(pedido_id, None)
+
+    # --- cálculo ---
+    def calcular(self, pedido, hoje):
+        """Melhores ofertas para um pedido: cidade primeiro, estado se faltar"""
+        ids = set()
+        for categoria in pedido.categorias:
+            ids |= self.por_cidade.get((categoria, pedido.estado, pedido.cidade), set())
+        # Só as ofertas ainda no prazo contam para o limite (vencidas não ocupam vaga da cidade)
+        ids = {oferta_id for oferta_id in ids if _no_prazo(self.ofertas[oferta_id], hoje)}
+        if len(ids) < self.limite:
+            for categoria in pedido.categorias:
+                ids |= self.por_estado.get((categoria, pedido.estado), set())
+        pontuados = []
+        for oferta_id in ids:
+            pontuacao = pontuar(self.ofertas[oferta_id], pedido, hoje)
+            if pontuacao is not None:
+                pontuados.append((pontuacao, oferta_id))
+        return heapq.nlargest(self.limite, pontuados)
+
+    def recalcular_estado(self, estado, categoria, hoje=None):
+        """Só os pedidos do estado que aceitam a categoria (os únicos que podem ter mudado)"""
+        hoje = hoje or date.today()
+        for pedido_id in self.pedidos_por_estado.get(estado, ()):
+            pedido = self.pedidos[pedido_id]
+            if categoria in pedido.categorias:
+                self.candidatos[pedido_id] = self.calcular(pedido, hoje)
+
+    def atualizar_oferta(self, oferta, hoje=None):
+        antiga = self.ofertas.get(oferta.id)
+        self.incluir_oferta(oferta)
+        if antiga is not None and (antiga.estado, antiga.categoria) != (oferta.estado, oferta.categoria):
+            self.recalcular_estado(antiga.estado, antiga.categoria, hoje)
+        self.recalcular_estado(oferta.estado, oferta.categoria, hoje)
+
+    def executar(self, hoje=None):
+        """Rodada completa: recalcula os candidatos de todos os pedidos"""
+        hoje = hoje or date.today()
+        for pedido in self.pedidos.values():
+            self.candidatos[pedido.id] = self.calcular(pedido, hoje)
+        return self.candidatos
+
+    def resultado(self, pedido_id):
+        """[(pontuação, Oferta)] do pedido, da melhor para a pior"""
+        return [(pontuacao, self.ofertas[oferta_id]) for pontuacao, oferta_id in self.candidatos.get(pedido_id, [])
+                if oferta_id in self.ofertas]
+
+# --- leitura do banco (colunas, sem montar objetos do ORM) ---
+
+def _consulta_ofertas():
+    return (select(ItemDoacao.id, ItemDoacao.item, ItemDoacao.quantidade, Doador.id, Doador.nome,
+                   Doador.whatsapp, Doador.bairro, Doador.cidade, Doador.estado, Doador.pode_entregar,
+                   Doador.prazo_disponibilidade)
+            .join(Doador, ItemDoacao.doador_id == Doador.id))
+
+def _consulta_pedidos():
+    return select(Receptor.id, Receptor.nome, Receptor.bairro, Receptor.cidade, Receptor.estado,
+                  Receptor.qtde_pessoas, Receptor.pode_retirar, Receptor.necessidades)
+
+def _oferta(linha):
+    item_id, item, quantidade, doador_id, nome, whatsapp, bairro, cidade, estado, entrega, prazo = linha
+    return Oferta(item_id, categorizar(item), item, quantidade, doador_id, nome, whatsapp,
+                  normalizar(bairro), normalizar(cidade), normalizar(estado), bool(entrega), prazo)
+
+def _pedido(linha):
+    pedido_id, nome, bairro, cidade, estado, pessoas, retira, necessidades = linha
+    return Pedido(pedido_id, nome, normalizar(bairro), normalizar(cidade), normalizar(estado),
+                  pessoas, bool(retira), categorias_do_pedido(necessidades))
+
+def carregar(session, motor=None):
+    """Monta o motor com todas as ofertas e pedidos do banco e faz a rodada completa"""
+    motor = motor or MotorCorrespondencia()
+    for linha in session.execute(_consulta_ofertas()):
+        motor.incluir_oferta(_oferta(linha))
+    for linha in session.execute(_consulta_pedidos()):
+        pedido = _pedido(linha)
+        motor.pedidos[pedido.id] = pedido
+        motor.pedidos_por_estado[pedido.estado].add(pedido.id)
+    motor.executar()
+    return motor
+
+def aplicar_alteracoes(session, motor, itens=(), doadores=(), receptores=()):
+    """Relê do banco só as linhas alteradas e atualiza o motor"""
+    if doadores:
+        # Mudar o doador (bairro, entrega, prazo) muda todas as ofertas dele
+        itens = set(itens) | set(session.scalars(select(ItemDoacao.id).where(ItemDoacao.doador_id.in_(doadores))))
+        itens |= {oferta.id for oferta in motor.ofertas.values() if oferta.doador_id in doadores}
+    if itens:
+        atuais = {linha[0]: linha for linha in session.execute(_consulta_ofertas().where(ItemDoacao.id.in_(itens)))}
+        for item_id in itens:
+            if item_id in atuais:
+                motor.atualizar_oferta(_oferta(atuais[item_id]))
+            else:
+                motor.remover_oferta(item_id)
+    if receptores:
+        atuais = {linha[0]: linha for linha in session.execute(_consulta_pedidos().where(Receptor.id.in_(receptores)))}
+        for receptor_id in receptores:
+            if receptor_id in atuais:
+                motor.incluir_pedido(_pedido(atuais[receptor_id]))
+            else:
+                motor.remover_pedido(receptor_id)
+
+# --- motor do processo (compartilhado entre as sessões do Streamlit) ---
+
+_TABELAS = {ItemDoacao.__tablename__: 'itens', Doador.__tablename__: 'doadores', Receptor.__tablename__: 'receptores'}
+_estado = {'motor': None, 'dia': None}
+_pendentes = {'itens': set(), 'doadores': set(), 'receptores': set(), 'recarregar': False}
+_lock = threading.Lock()
+_lock_pendentes = threading.Lock()
+
+def _retirar_pendentes():
+    with _lock_pendentes:
+        pendentes = {chave: set(_pendentes[chave]) for chave in ('itens', 'doadores', 'receptores')}
+        recarregar = _pendentes['recarregar']
+        for chave in pendentes:
+            _pendentes[chave].clear()
+        _pendentes['recarregar'] = False
+    return pendentes, recarregar
+
+def obter_motor():
+    """Motor do processo: carregado no primeiro uso e depois só atualizado com o que mudou"""
+    with _lock:
+        pendentes, recarregar = _retirar_pendentes()
+        with leitura() as session:
+            if _estado['motor'] is None or recarregar:
+                _estado['motor'] = carregar(session)
+                _estado['dia'] = date.today()
+            elif any(pendentes.values()):
+                aplicar_alteracoes(session, _estado['motor'], **pendentes)
+        # Virou o dia: ofertas podem ter vencido, refaz a rodada
+        if _estado['dia'] != date.today():
+            _estado['motor'].executar()
+            _estado['dia'] = date.today()
+        return _estado['motor']
+
+@ao_confirmar
+def _marcar_pendentes(alteracoes):
+    # Só guarda os ids; o motor relê essas linhas na próxima consulta
+    with _lock_pendentes:
+        for tabela, tipos in alteracoes.items():
+            chave = _TABELAS.get(tabela)
+            if chave is None:
+                continue
+            for ids in tipos.values():
+                if ids is None:
+                    _pendentes['recarregar'] = True
+                else:
+                    _pendentes[chave].update(i for i in ids if i is not None)
@@ -0,0 +1,59 @@
+import os
+import threading
+import time
+from sqlalchemy import select, func
+from database import leitura, ao_confirmar, Usuario, Doador, ItemDoacao, Receptor, Pet
+
+# Segundos que os contadores ficam em cache (outros processos também escrevem no banco)
+ESTATISTICAS_TTL = int(os.environ.get("ESTATISTICAS_TTL", "60"))
+
+CONTADORES = {
+    'usuarios': Usuario,
+    'doadores': Doador,
+    'itens': ItemDoacao,
+    'receptores': Receptor,
+    'pets': Pet,
+}
+_TABELAS = {modelo.__tablename__ for modelo in CONTADORES.values()}
+
+_cache = {'valores': None, 'expira_em': 0.0, 'geracao': 0}
+_lock = threading.Lock()
+
+def calcular_estatisticas(session):
+    """Todos os contadores em uma única consulta (um SELECT com subconsultas)"""
+    consulta = select(*[
+        select(func.count()).select_from(modelo).scalar_subquery().label(nome)
+        for nome, modelo in CONTADORES.items()
+    ])
+    return dict(session.execute(consulta).one()._mapping)
+
+def obter_estatisticas():
+    """Contadores da página inicial/administração, em cache no processo por ESTATISTICAS_TTL"""
+    valores = _cache['valores']
+    if valores is not None and time.monotonic() < _cache['expira_em']:
+        return valores
+    # Só uma sessão do Streamlit recalcula; as outras esperam e usam o resultado
+    with _lock:
+        if _cache['valores'] is not None and time.monotonic() < _cache['expira_em']:
+            return _cache['valores']
+        geracao = _cache['geracao']
+        with leitura() as session:
+            valores = calcular_estatisticas(session)
+        # Se houve commit durante o cálculo o resultado pode estar velho: não guarda
+        if geracao == _cache['geracao']:
+            _cache['valores'] = valores
+            _cache['expira_em'] = time.monotonic() + ESTATISTICAS_TTL
+        return valores
+
+def invalidar_estatisticas():
+    _cache['geracao'] += 1
+    _cache['valores'] = None
+    _cache['expira_em'] = 0.0
+
+@ao_confirmar
+def _invalidar_ao_confirmar(alteracoes):
+    # Edições não mudam contagens; só inclusões e exclusões
+    for tabela, tipos in alteracoes.items():
+        if tabela in _TABELAS and tipos.keys() & {"novo", "removido"}:
+            invalidar_estatisticas()
+            return
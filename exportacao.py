@@ -0,0 +1,154 @@
+"""Exportação dos cadastros em CSV, Excel ou Parquet sem carregar as tabelas inteiras
+
+Só as colunas listadas em CONJUNTOS são lidas (nunca os bytes das fotos), como
+tuplas, em blocos de LOTE linhas (yield_per; cursor do lado do servidor no
+PostgreSQL). Cada bloco é escrito no arquivo de saída e descartado, então no
+`gerenciar.py exportar` a memória não cresce com o tamanho da tabela. Na
+Administração o arquivo pronto ainda vai inteiro para a memória (o Streamlit
+guarda o conteúdo do download). Itens e doadores aceitam os mesmos filtros da
+página "Pesquisar Doações" (consultas.filtrar_itens).
+"""
+import csv
+import io
+import tempfile
+from datetime import date, datetime
+from sqlalchemy import or_
+from database import Doador, ItemDoacao, Receptor, Pet
+from consultas import filtrar_itens
+
+LOTE = 2000
+LIMITE_EXCEL = 1048575  # linhas por aba no .xlsx, fora o cabeçalho
+
+# conjunto -> (rótulo, [(cabeçalho, coluna)], modelo da ordem)
+CONJUNTOS = {
+    "itens": ("Itens de doação", [
+        ("item_id", ItemDoacao.id), ("item", ItemDoacao.item), ("quantidade", ItemDoacao.quantidade),
+        ("descricao", ItemDoacao.descricao), ("tem_foto", or_(ItemDoacao.foto_hash.isnot(None),
+                                                                ItemDoacao.tem_foto_legada)),
+        ("doador_id", Doador.id), ("doador", Doador.nome), ("whatsapp", Doador.whatsapp),
+        ("telefone", Doador.telefone), ("cep", Doador.cep), ("bairro", Doador.bairro), ("cidade", Doador.cidade),
+        ("estado", Doador.estado), ("pode_entregar", Doador.pode_entregar),
+        ("prazo_disponibilidade", Doador.prazo_disponibilidade), ("latitude", Doador.latitude),
+        ("longitude", Doador.longitude), ("data_cadastro", ItemDoacao.data_cadastro),
+    ], ItemDoacao),
+    "doadores": ("Doadores", [
+        ("id", Doador.id), ("cpf", Doador.cpf), ("nome", Doador.nome), ("endereco", Doador.endereco),
+        ("numero", Doador.numero), ("cep", Doador.cep), ("bairro", Doador.bairro), ("cidade", Doador.cidade),
+        ("estado", Doador.estado), ("telefone", Doador.telefone), ("whatsapp", Doador.whatsapp),
+        ("pode_entregar", Doador.pode_entregar), ("prazo_disponibilidade", Doador.prazo_disponibilidade),
+        ("latitude", Doador.latitude), ("longitude", Doador.longitude), ("data_cadastro", Doador.data_cadastro),
+    ], Doador),
+    "receptores": ("Solicitações de ajuda", [
+        ("id", Receptor.id), ("cpf", Receptor.cpf), ("nome", Receptor.nome), ("endereco", Receptor.endereco),
+        ("numero", Receptor.numero), ("cep", Receptor.cep), ("bairro", Receptor.bairro),
+        ("cidade", Receptor.cidade), ("estado", Receptor.estado), ("telefone", Receptor.telefone),
+        ("whatsapp", Receptor.whatsapp), ("qtde_pessoas", Receptor.qtde_pessoas),
+        ("pode_retirar", Receptor.pode_retirar), ("necessidades", Receptor.necessidades),
+        ("data_cadastro", Receptor.data_cadastro),
+    ], Receptor),
+    "pets": ("Pets", [
+        ("id", Pet.id), ("nome", Pet.nome), ("especie", Pet.especie), ("raca", Pet.raca),
+        ("descricao", Pet.descricao), ("situacao", Pet.situacao), ("local_encontro", Pet.local_encontro),
+        ("contato", Pet.contato), ("tem_foto", or_(Pet.foto_hash.isnot(None), Pet.tem_foto_legada)),
+        ("data_cadastro", Pet.data_cadastro),
+    ], Pet),
+}
+
+FORMATOS = {"csv": ("CSV", "text/csv"),
+            "xlsx": ("Excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+            "parquet": ("Parquet", "application/vnd.apache.parquet")}
+
+# Filtros da pesquisa só se aplicam aos conjuntos que têm doador
+COM_FILTROS = ("itens", "doadores")
+
+def consulta_exportacao(session, conjunto, termo="", filtro_disponibilidade="Todos", origem=None, raio_km=None):
+    """Query de tuplas (só as colunas exportadas) com os filtros da pesquisa"""
+    _, colunas, modelo = CONJUNTOS[conjunto]
+    query = session.query(*[coluna.label(nome) for nome, coluna in colunas])
+    if conjunto == "itens":
+        query = query.select_from(ItemDoacao).join(Doador, ItemDoacao.doador_id == Doador.id)
+        query = filtrar_itens(query, termo, filtro_disponibilidade, origem, raio_km)
+    elif conjunto == "doadores":
+        query = filtrar_itens(query, "", filtro_disponibilidade, origem, raio_km)
+        if termo:
+            # Doadores com ao menos um item que case com o termo
+            com_item = filtrar_itens(session.query(ItemDoacao.doador_id), termo, "Todos")
+            query = query.filter(Doador.id.in_(com_item))
+    return query.order_by(modelo.id)
+
+def _blocos(query):
+    """Listas de até LOTE tuplas, lidas do cursor aos poucos"""
+    bloco = []
+    for linha in query.yield_per(LOTE):
+        bloco.append(tuple(linha))
+        if len(bloco) == LOTE:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+def _escrever_csv(cabecalho, blocos, saida):
+    texto = io.TextIOWrapper(saida, encoding="utf-8-sig", newline="", write_through=True)
+    escritor = csv.writer(texto, delimiter=";")
+    escritor.writerow(cabecalho)
+    total = 0
+    for bloco in blocos:
+        escritor.writerows(bloco)
+        total += len(bloco)
+    texto.flush()
+    texto.detach()  # devolve o arquivo sem fechá-lo
+    return total
+
+def _escrever_xlsx(cabecalho, blocos, saida):
+    from openpyxl import Workbook
+    # write_only: as linhas vão para um XML temporário em disco, não ficam na memória
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet("dados")
+    aba.append(cabecalho)
+    total = 0
+    for bloco in blocos:
+        if total + len(bloco) > LIMITE_EXCEL:
+            raise ValueError(f"Mais de {LIMITE_EXCEL} linhas não cabem no Excel; exporte em CSV ou Parquet")
+        for linha in bloco:
+            aba.append(linha)
+        total += len(bloco)
+    planilha.save(saida)
+    return total
+
+def _escrever_parquet(cabecalho, blocos, saida, tipos):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    esquema = pa.schema([(nome, tipo) for nome, tipo in zip(cabecalho, tipos)])
+    total = 0
+    with pq.ParquetWriter(saida, esquema) as escritor:
+        for bloco in blocos:
+            # Um row group por bloco, montado por coluna
+            escritor.write_table(pa.Table.from_arrays(
+                [pa.array(valores, type=tipo) for valores, tipo in zip(zip(*bloco), esquema.types)], schema=esquema))
+            total += len(bloco)
+    return total
+
+def _tipos_arrow(colunas):
+    import pyarrow as pa
+    tipos = {int: pa.int64(), float: pa.float64(), bool: pa.bool_(), date: pa.date32(), datetime: pa.timestamp("us")}
+    return [tipos.get(coluna.type.python_type, pa.string()) for _, coluna in colunas]
+
+def exportar(session, conjunto, formato, saida, **filtros):
+    """Escreve o conjunto no arquivo binário `saida`; devolve o número de linhas"""
+    _, colunas, _ = CONJUNTOS[conjunto]
+    cabecalho = [nome for nome, _ in colunas]
+    blocos = _blocos(consulta_exportacao(session, conjunto, **filtros))
+    if formato == "csv":
+        return _escrever_csv(cabecalho, blocos, saida)
+    if formato == "xlsx":
+        return _escrever_xlsx(cabecalho, blocos, saida)
+    if formato == "parquet":
+        return _escrever_parquet(cabecalho, blocos, saida, _tipos_arrow(colunas))
+    raise ValueError(f"Formato desconhecido: {formato}")
+
+def exportar_temporario(session, conjunto, formato, **filtros):
+    """Exporta para um arquivo temporário (apagado ao fechar) já posicionado no início"""
+    arquivo = tempfile.TemporaryFile()
+    exportar(session, conjunto, formato, arquivo, **filtros)
+    arquivo.seek(0)
+    return arquivo
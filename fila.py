@@ -0,0 +1,262 @@
+"""Fila de tarefas em segundo plano numa tabela do próprio banco (sem broker externo)
+
+O formulário só grava a tarefa (enfileirar) e segue; quem executa é o worker:
+`python gerenciar.py worker` num processo separado e/ou TAREFAS_NO_APP threads
+dentro do processo do Streamlit. Vários workers podem rodar juntos: cada um pega
+a próxima tarefa com um UPDATE atômico (FOR UPDATE SKIP LOCKED no PostgreSQL; no
+SQLite o próprio UPDATE já é serializado pela trava de escrita).
+
+Estados: pendente -> executando -> concluida. Uma falha volta para pendente com
+espera exponencial (TAREFAS_ESPERA_S, 2x, 4x...); depois de max_tentativas a
+tarefa fica em "falhou" (lista de falhas da Administração), de onde pode ser
+reenfileirada ou descartada. Tarefa "executando" há mais de TAREFAS_TIMEOUT_S é
+de um worker que morreu e volta para a fila.
+"""
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, literal, func
+from database import engine, Tarefa
+
+TAREFAS_MAX_TENTATIVAS = int(os.environ.get("TAREFAS_MAX_TENTATIVAS", "5"))
+TAREFAS_ESPERA_S = float(os.environ.get("TAREFAS_ESPERA_S", "5"))
+TAREFAS_ESPERA_MAX_S = float(os.environ.get("TAREFAS_ESPERA_MAX_S", "600"))
+TAREFAS_TIMEOUT_S = int(os.environ.get("TAREFAS_TIMEOUT_S", "300"))
+TAREFAS_INTERVALO_S = float(os.environ.get("TAREFAS_INTERVALO_S", "1"))
+TAREFAS_RETENCAO_DIAS = int(os.environ.get("TAREFAS_RETENCAO_DIAS", "7"))
+# Threads do worker dentro do app (0 quando só o `gerenciar.py worker` deve executar)
+TAREFAS_NO_APP = int(os.environ.get("TAREFAS_NO_APP", "1"))
+
+PENDENTE, EXECUTANDO, CONCLUIDA, FALHOU = "pendente", "executando", "concluida", "falhou"
+
+_tabela = Tarefa.__table__
+_funcoes = {}
+# Acorda os workers deste processo assim que algo é enfileirado (os outros processos esperam o intervalo)
+_acordar = threading.Event()
+
+def tarefa(tipo):
+    """Registra a função que executa as tarefas de um tipo: funcao(dados) -> resultado (JSON)"""
+    def registrar(funcao):
+        _funcoes[tipo] = funcao
+        return funcao
+    return registrar
+
+def _agora():
+    return datetime.utcnow()
+
+def enfileirar(tipo, dados=None, chave=None, max_tentativas=TAREFAS_MAX_TENTATIVAS):
+    """Grava uma tarefa pendente; com chave, não duplica uma pendente do mesmo tipo e chave.
+    Retorna True se gravou. Chamar depois do commit do que a tarefa vai ler."""
+    agora = _agora()
+    valores = {'tipo': tipo, 'chave': chave, 'dados': json.dumps(dados or {}), 'estado': PENDENTE,
+               'tentativas': 0, 'max_tentativas': max_tentativas, 'disponivel_em': agora, 'criada_em': agora}
+    with engine.begin() as conn:
+        if chave is None:
+            conn.execute(insert(_tabela).values(**valores))
+            gravou = True
+        else:
+            # Conferência e inclusão num comando só: nada entra entre as duas
+            repetida = (select(_tabela.c.id)
+                        .where(_tabela.c.tipo == tipo, _tabela.c.chave == chave, _tabela.c.estado == PENDENTE)
+                        .exists())
+            linha = select(*[literal(valor, _tabela.c[nome].type) for nome, valor in valores.items()]).where(~repetida)
+            gravou = conn.execute(insert(_tabela).from_select(list(valores), linha)).rowcount > 0
+    if gravou:
+        _acordar.set()
+    return gravou
+
+def resultado_tarefa(tipo, chave):
+    """Resultado da última tarefa concluída com este tipo e chave, ou None"""
+    with engine.connect() as conn:
+        resultado = conn.execute(select(_tabela.c.resultado)
+                                 .where(_tabela.c.tipo == tipo, _tabela.c.chave == chave,
+                                        _tabela.c.estado == CONCLUIDA)
+                                 .order_by(_tabela.c.concluida_em.desc())
+                                 .limit(1)).scalar()
+    return json.loads(resultado) if resultado else None
+
+def _pegar(trabalhador):
+    """Marca a próxima tarefa disponível como executando e a retorna (ou None)"""
+    agora = _agora()
+    proxima = (select(_tabela.c.id)
+               .where(_tabela.c.estado == PENDENTE, _tabela.c.disponivel_em <= agora)
+               .order_by(_tabela.c.disponivel_em, _tabela.c.id)
+               .limit(1))
+    if engine.dialect.name == "postgresql":
+        proxima = proxima.with_for_update(skip_locked=True)
+    comando = (_tabela.update()
+               .where(_tabela.c.id == proxima.scalar_subquery(), _tabela.c.estado == PENDENTE)
+               .values(estado=EXECUTANDO, trabalhador=trabalhador, iniciada_em=agora,
+                       tentativas=_tabela.c.tentativas + 1)
+               .returning(_tabela.c.id, _tabela.c.tipo, _tabela.c.dados, _tabela.c.tentativas,
+                          _tabela.c.max_tentativas))
+    with engine.begin() as conn:
+        return conn.execute(comando).first()
+
+def _finalizar(tarefa_id, pego_por, **valores):
+    # Só quem pegou finaliza: tarefa devolvida à fila por tempo esgotado não é sobrescrita
+    with engine.begin() as conn:
+        conn.execute(_tabela.update()
+                     .where(_tabela.c.id == tarefa_id, _tabela.c.estado == EXECUTANDO,
+                            _tabela.c.trabalhador == pego_por)
+                     .values(**valores))
+
+def espera_nova_tentativa(tentativas):
+    """Segundos até a próxima tentativa depois de `tentativas` falhas"""
+    return min(TAREFAS_ESPERA_S * 2 ** (tentativas - 1), TAREFAS_ESPERA_MAX_S)
+
+def executar_proxima(trabalhador):
+    """Executa uma tarefa; retorna (tarefa, erro) ou None se não havia nenhuma disponível"""
+    atual = _pegar(trabalhador)
+    if atual is None:
+        return None
+    try:
+        funcao = _funcoes.get(atual.tipo)
+        if funcao is None:
+            raise LookupError(f"Tipo de tarefa sem função registrada: {atual.tipo}")
+        resultado = funcao(json.loads(atual.dados or "{}"))
+    except Exception as erro:
+        agora = _agora()
+        valores = {'erro': traceback.format_exc()[-2000:], 'trabalhador': None}
+        if atual.tentativas >= atual.max_tentativas:
+            valores.update(estado=FALHOU, concluida_em=agora)
+        else:
+            valores.update(estado=PENDENTE,
+                           disponivel_em=agora + timedelta(seconds=espera_nova_tentativa(atual.tentativas)))
+        _finalizar(atual.id, trabalhador, **valores)
+        return atual, erro
+    _finalizar(atual.id, trabalhador, estado=CONCLUIDA, concluida_em=_agora(), erro=None,
+               resultado=None if resultado is None else json.dumps(resultado))
+    return atual, None
+
+def recuperar_travadas():
+    """Devolve à fila as tarefas de workers que morreram no meio (executando há mais de TAREFAS_TIMEOUT_S)"""
+    agora = _agora()
+    limite = agora - timedelta(seconds=TAREFAS_TIMEOUT_S)
+    travadas = (_tabela.c.estado == EXECUTANDO, _tabela.c.iniciada_em < limite)
+    erro = f"Tempo esgotado: mais de {TAREFAS_TIMEOUT_S} s executando"
+    with engine.begin() as conn:
+        esgotadas = conn.execute(_tabela.update()
+                                 .where(*travadas, _tabela.c.tentativas >= _tabela.c.max_tentativas)
+                                 .values(estado=FALHOU, concluida_em=agora, erro=erro, trabalhador=None)).rowcount
+        devolvidas = conn.execute(_tabela.update().where(*travadas)
+                                  .values(estado=PENDENTE, disponivel_em=agora, erro=erro,
+                                          trabalhador=None)).rowcount
+    return devolvidas + esgotadas
+
+def limpar_concluidas():
+    """Apaga as concluídas há mais de TAREFAS_RETENCAO_DIAS (as falhas ficam até alguém decidir)"""
+    limite = _agora() - timedelta(days=TAREFAS_RETENCAO_DIAS)
+    with engine.begin() as conn:
+        return conn.execute(_tabela.delete()
+                            .where(_tabela.c.estado == CONCLUIDA, _tabela.c.concluida_em < limite)).rowcount
+
+def executar_worker(intervalo=TAREFAS_INTERVALO_S, uma_vez=False, parar=None, avisar=None):
+    """Executa tarefas até `parar` ser sinalizado (ou, com uma_vez, até a fila esvaziar).
+    avisar(tarefa, erro, segundos) é chamada depois de cada tarefa. Retorna quantas executou."""
+    trabalhador = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    parar = parar or threading.Event()
+    executadas = 0
+    manutencao_em = 0.0
+    while not parar.is_set():
+        try:
+            if time.monotonic() >= manutencao_em:
+                recuperar_travadas()
+                limpar_concluidas()
+                manutencao_em = time.monotonic() + 60
+            _acordar.clear()
+            inicio = time.perf_counter()
+            executada = executar_proxima(trabalhador)
+        except Exception:
+            if uma_vez:
+                raise
+            # Banco fora do ar, disco cheio...: a thread do app não pode morrer (iniciar_no_app não a
+            # sobe de novo); espera o intervalo e tenta outra vez
+            print(f"⚠️ Worker {trabalhador}: erro na fila, nova tentativa em {intervalo:g} s", file=sys.stderr)
+            traceback.print_exc()
+            parar.wait(intervalo)
+            continue
+        if executada is not None:
+            executadas += 1
+            if avisar:
+                avisar(executada[0], executada[1], time.perf_counter() - inicio)
+            continue
+        if uma_vez:
+            break
+        _acordar.wait(intervalo)
+    return executadas
+
+_threads = []
+_lock_threads = threading.Lock()
+
+def iniciar_no_app():
+    """Sobe TAREFAS_NO_APP threads de worker neste processo (uma vez por processo)"""
+    with _lock_threads:
+        if _threads:
+            return False
+        for numero in range(TAREFAS_NO_APP):
+            thread = threading.Thread(target=executar_worker, name=f"tarefas-{numero}", daemon=True)
+            thread.start()
+            _threads.append(thread)
+    return bool(_threads)
+
+# --- Administração ---
+
+def _percentil(valores, fracao):
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(fracao * len(valores)))]
+
+def metricas_fila(session, janela_min=60):
+    """Profundidade da fila e vazão/tempos das tarefas concluídas na última janela_min"""
+    por_estado = dict(session.execute(select(_tabela.c.estado, func.count()).group_by(_tabela.c.estado)).all())
+    agora = _agora()
+    atrasada = session.execute(select(func.min(_tabela.c.disponivel_em))
+                               .where(_tabela.c.estado == PENDENTE, _tabela.c.disponivel_em <= agora)).scalar()
+    concluidas = session.execute(select(_tabela.c.criada_em, _tabela.c.iniciada_em, _tabela.c.concluida_em)
+                                 .where(_tabela.c.estado == CONCLUIDA,
+                                        _tabela.c.concluida_em >= agora - timedelta(minutes=janela_min))).all()
+    duracoes = [(fim - inicio).total_seconds() * 1000 for _, inicio, fim in concluidas]
+    esperas = [(inicio - criada).total_seconds() * 1000 for criada, inicio, _ in concluidas]
+    return {
+        'pendentes': por_estado.get(PENDENTE, 0),
+        'executando': por_estado.get(EXECUTANDO, 0),
+        'falhas': por_estado.get(FALHOU, 0),
+        'concluidas': len(concluidas),
+        'por_minuto': len(concluidas) / janela_min,
+        'atraso_s': (agora - atrasada).total_seconds() if atrasada else 0.0,
+        'duracao_p50_ms': _percentil(duracoes, 0.5),
+        'duracao_p95_ms': _percentil(duracoes, 0.95),
+        'espera_p50_ms': _percentil(esperas, 0.5),
+        'espera_p95_ms': _percentil(esperas, 0.95),
+        'janela_min': janela_min,
+    }
+
+def listar_falhas(session, limite=200):
+    """Tarefas que esgotaram as tentativas, mais recentes primeiro"""
+    return session.execute(select(_tabela.c.id, _tabela.c.tipo, _tabela.c.chave, _tabela.c.tentativas,
+                                  _tabela.c.erro, _tabela.c.criada_em, _tabela.c.concluida_em)
+                           .where(_tabela.c.estado == FALHOU)
+                           .order_by(_tabela.c.concluida_em.desc())
+                           .limit(limite)).all()
+
+def reenfileirar(ids):
+    """Devolve tarefas com falha à fila, com as tentativas zeradas"""
+    with engine.begin() as conn:
+        total = conn.execute(_tabela.update()
+                             .where(_tabela.c.id.in_(ids), _tabela.c.estado == FALHOU)
+                             .values(estado=PENDENTE, tentativas=0, disponivel_em=_agora(),
+                                     concluida_em=None)).rowcount
+    _acordar.set()
+    return total
+
+def descartar(ids):
+    """Apaga tarefas com falha"""
+    with engine.begin() as conn:
+        return conn.execute(_tabela.delete().where(_tabela.c.id.in_(ids), _tabela.c.estado == FALHOU)).rowcount
@@ -0,0 +1,107 @@
+import csv
+import math
+import os
+import re
+from sqlalchemy import Table, Column, Integer, Float, MetaData, text
+
+# Tabela offline prefixo de CEP -> centroide aproximado (cidade/bairro principal da faixa).
+# Vale o prefixo mais longo: nas capitais chega ao bairro, no interior é a cidade polo da
+# região (dezenas de km de erro). Nada é geocodificado na hora da pesquisa.
+ARQUIVO_CENTROIDES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados", "cep_centroides.csv")
+
+KM_POR_GRAU = 111.32
+RAIOS_KM = [5, 10, 25, 50, 100, 200]
+
+# Índice R*Tree (SQLite) com um ponto por doador; triggers mantêm em sincronia com doadores
+DDL_INDICE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS doadores_geo USING rtree(id, min_lat, max_lat, min_lon, max_lon)",
+    """CREATE TRIGGER IF NOT EXISTS doadores_geo_ai AFTER INSERT ON doadores
+       WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN
+        INSERT INTO doadores_geo VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS doadores_geo_ad AFTER DELETE ON doadores BEGIN
+        DELETE FROM doadores_geo WHERE id = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS doadores_geo_au AFTER UPDATE OF latitude, longitude ON doadores BEGIN
+        DELETE FROM doadores_geo WHERE id = old.id;
+        INSERT INTO doadores_geo SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+        WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+    END""",
+]
+
+doadores_geo = Table(
+    "doadores_geo", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("min_lat", Float),
+    Column("max_lat", Float),
+    Column("min_lon", Float),
+    Column("max_lon", Float),
+)
+
+# Fica False fora do SQLite (ou sem o módulo rtree): o filtro usa só latitude/longitude de doadores
+GEO_ATIVO = False
+
+_centroides = None
+
+def carregar_centroides(caminho=ARQUIVO_CENTROIDES):
+    """{prefixo: (latitude, longitude)} lido uma vez do arquivo"""
+    global _centroides
+    if _centroides is None:
+        with open(caminho, encoding="utf-8") as arquivo:
+            _centroides = {linha['prefixo']: (float(linha['latitude']), float(linha['longitude']))
+                           for linha in csv.DictReader(arquivo)}
+    return _centroides
+
+def localizar_cep(cep):
+    """(latitude, longitude) aproximada do CEP pelo prefixo mais longo conhecido, ou None"""
+    digitos = re.sub(r"\D", "", cep or "")
+    if len(digitos) != 8:
+        return None
+    centroides = carregar_centroides()
+    for tamanho in range(5, 1, -1):
+        if digitos[:tamanho] in centroides:
+            return centroides[digitos[:tamanho]]
+    return None
+
+def distancia_km(origem, destino):
+    """Distância em km entre dois pontos (haversine)"""
+    lat1, lon1 = map(math.radians, origem)
+    lat2, lon2 = map(math.radians, destino)
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+def caixa(origem, raio_km):
+    """Retângulo (min_lat, max_lat, min_lon, max_lon) que contém o círculo do raio"""
+    latitude, longitude = origem
+    dlat = raio_km / KM_POR_GRAU
+    dlon = raio_km / (KM_POR_GRAU * max(math.cos(math.radians(latitude)), 0.01))
+    return latitude - dlat, latitude + dlat, longitude - dlon, longitude + dlon
+
+def distancia_sql(origem, latitude, longitude):
+    """Distância plana ao quadrado, em graus de latitude (ordena igual à distância real em
+    escala de cidade/estado e só usa + e *, então funciona em qualquer banco)"""
+    lat0, lon0 = origem
+    escala = math.cos(math.radians(lat0))
+    return (latitude - lat0) * (latitude - lat0) + (longitude - lon0) * (longitude - lon0) * (escala * escala)
+
+def criar_indice_geo(engine):
+    """Cria o R*Tree e os triggers se ainda não existirem (preenchendo com os doadores atuais)"""
+    global GEO_ATIVO
+    if engine.dialect.name != "sqlite":
+        GEO_ATIVO = False
+        return
+    try:
+        with engine.begin() as conn:
+            existe = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'doadores_geo'")).first()
+            if not existe:
+                for ddl in DDL_INDICE:
+                    conn.execute(text(ddl))
+                conn.execute(text("""INSERT INTO doadores_geo
+                    SELECT id, latitude, latitude, longitude, longitude FROM doadores
+                    WHERE latitude IS NOT NULL AND longitude IS NOT NULL"""))
+                print("📍 Índice geográfico criado")
+        GEO_ATIVO = True
+    except Exception as e:
+        GEO_ATIVO = False
+        print(f"⚠️ R*Tree indisponível, filtro de distância sem índice espacial: {e}")
@@ -0,0 +1,302 @@
+"""Comandos de manutenção do sistema
+
+Uso:
+    python gerenciar.py inicializar
+    python gerenciar.py migrar-fotos
+    python gerenciar.py gerar-miniaturas
+    python gerenciar.py calcular-hashes
+    python gerenciar.py limpar-fotos
+    python gerenciar.py reindexar-busca
+    python gerenciar.py localizar-doadores
+    python gerenciar.py importar doacoes planilha.csv
+    python gerenciar.py exportar itens itens.parquet
+    python gerenciar.py worker
+"""
+import argparse
+import io
+from sqlalchemy import text, bindparam
+from sqlalchemy.orm import undefer
+from database import engine, get_session, leitura, inicializar_banco, notificar_alteracoes, ItemDoacao, Pet, Doador
+from armazenamento import get_armazenamento, guardar_foto, limpar_fotos_sem_uso, FOTOS_CARENCIA_HORAS
+from imagens import gerar_rendicoes, hash_perceptual, ImagemInvalida
+from busca_textual import reconstruir_indice
+from geografia import localizar_cep
+from importacao import ler_planilha, importar, relatorio_erros, TAMANHO_LOTE
+from exportacao import CONJUNTOS, FORMATOS, COM_FILTROS, exportar
+from fila import executar_worker, espera_nova_tentativa, TAREFAS_INTERVALO_S
+
+def migrar_fotos(lote=200):
+    """Move os bytes da coluna foto para o armazenamento de fotos"""
+    total = 0
+    for modelo in (ItemDoacao, Pet):
+        session = get_session()
+        migradas = 0
+        try:
+            ultimo_id = 0
+            while True:
+                registros = (session.query(modelo)
+                             .options(undefer(modelo.foto))
+                             .filter(modelo.foto.isnot(None), modelo.id > ultimo_id)
+                             .order_by(modelo.id)
+                             .limit(lote)
+                             .all())
+                if not registros:
+                    break
+                for registro in registros:
+                    ultimo_id = registro.id
+                    try:
+                        rendicoes = gerar_rendicoes(io.BytesIO(registro.foto))
+                    except ImagemInvalida as erro:
+                        # Fica na coluna legada; o lote segue
+                        print(f"⚠️ {modelo.__tablename__} {registro.id}: {erro}")
+                        continue
+                    for campo, valor in guardar_foto(rendicoes).items():
+                        setattr(registro, campo, valor)
+                    registro.foto = None
+                    migradas += 1
+                session.commit()
+                # Libera as fotos já gravadas da memória antes do próximo lote
+                session.expunge_all()
+                print(f"📦 {modelo.__tablename__}: {migradas} foto(s) migrada(s)")
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        total += migradas
+
+    # Devolve ao sistema o espaço que as fotos ocupavam no arquivo do banco
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+    print(f"✅ {total} foto(s) migrada(s) para o armazenamento")
+    return total
+
+def gerar_miniaturas(lote=200):
+    """Gera as versões que faltam para fotos já no armazenamento"""
+    armazenamento = get_armazenamento()
+    total = 0
+    for modelo in (ItemDoacao, Pet):
+        session = get_session()
+        try:
+            ultimo_id = 0
+            while True:
+                registros = (session.query(modelo)
+                             .filter(modelo.foto_hash.isnot(None), modelo.miniatura_hash.is_(None),
+                                     modelo.id > ultimo_id)
+                             .order_by(modelo.id)
+                             .limit(lote)
+                             .all())
+                if not registros:
+                    break
+                for registro in registros:
+                    ultimo_id = registro.id
+                    dados = armazenamento.abrir(registro.foto_hash)
+                    if dados is None:
+                        print(f"⚠️ {modelo.__tablename__} {registro.id}: foto {registro.foto_hash} não encontrada")
+                        continue
+                    try:
+                        rendicoes = gerar_rendicoes(io.BytesIO(dados))
+                    except ImagemInvalida as erro:
+                        print(f"⚠️ {modelo.__tablename__} {registro.id}: {erro}")
+                        continue
+                    for campo, valor in guardar_foto(rendicoes).items():
+                        setattr(registro, campo, valor)
+                    total += 1
+                session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    print(f"✅ {total} foto(s) com versões geradas")
+    return total
+
+def calcular_hashes(lote=500):
+    """Preenche o hash perceptual (foto_phash) das fotos que já têm versões"""
+    armazenamento = get_armazenamento()
+    total = 0
+    for modelo in (ItemDoacao, Pet):
+        tabela = modelo.__table__
+        ultimo_id = 0
+        while True:
+            with engine.connect() as conn:
+                linhas = conn.execute(tabela.select()
+                                      .with_only_columns(tabela.c.id, tabela.c.miniatura_hash, tabela.c.foto_hash)
+                                      .where(tabela.c.foto_hash.isnot(None), tabela.c.foto_phash.is_(None),
+                                             tabela.c.id > ultimo_id)
+                                      .order_by(tabela.c.id)
+                                      .limit(lote)).all()
+            if not linhas:
+                break
+            valores = []
+            for registro_id, miniatura, foto in linhas:
+                ultimo_id = registro_id
+                dados = armazenamento.abrir(miniatura or foto)
+                if dados is None:
+                    print(f"⚠️ {tabela.name} {registro_id}: foto {miniatura or foto} não encontrada")
+                    continue
+                valores.append({'b_id': registro_id, 'b_phash': hash_perceptual(dados)})
+            if valores:
+                with engine.begin() as conn:
+                    conn.execute(tabela.update().where(tabela.c.id == bindparam('b_id'))
+                                 .values(foto_phash=bindparam('b_phash')), valores)
+                # Escrita fora do ORM: avisa o índice de fotos parecidas (semelhanca.py)
+                notificar_alteracoes({tabela.name: {"alterado": {valor['b_id'] for valor in valores}}})
+            total += len(valores)
+    print(f"✅ {total} foto(s) com hash perceptual calculado")
+    return total
+
+def limpar_fotos(carencia_horas=FOTOS_CARENCIA_HORAS, simular=False):
+    """Apaga do armazenamento as fotos que nenhuma linha usa mais (trocadas ou de cadastros apagados)"""
+    total = limpar_fotos_sem_uso(carencia_horas, simular)
+    if simular:
+        print(f"🔎 {total} arquivo(s) sem uso seriam apagados")
+    else:
+        print(f"✅ {total} arquivo(s) sem uso apagado(s)")
+    return total
+
+def localizar_doadores(todos=False):
+    """Preenche latitude/longitude dos doadores pelo CEP (tabela offline de centroides)"""
+    with engine.begin() as conn:
+        consulta = Doador.__table__.select().with_only_columns(Doador.id, Doador.cep)
+        if not todos:
+            consulta = consulta.where(Doador.latitude.is_(None))
+        linhas = conn.execute(consulta).all()
+        valores = []
+        for doador_id, cep in linhas:
+            latitude, longitude = localizar_cep(cep) or (None, None)
+            valores.append({'b_id': doador_id, 'b_latitude': latitude, 'b_longitude': longitude})
+        if valores:
+            tabela = Doador.__table__
+            conn.execute(tabela.update().where(tabela.c.id == bindparam('b_id'))
+                         .values(latitude=bindparam('b_latitude'), longitude=bindparam('b_longitude')), valores)
+    localizados = sum(1 for valor in valores if valor['b_latitude'] is not None)
+    print(f"✅ {localizados} de {len(valores)} doador(es) localizados pelo CEP")
+    return localizados
+
+def importar_planilha(tipo, caminho, relatorio=None, lote=TAMANHO_LOTE):
+    """Importa doações ou solicitações de um CSV/XLSX e grava o relatório de erros"""
+    tabela = ler_planilha(caminho, caminho)
+    resultado = importar(tabela, tipo, lote=lote)
+    if resultado['ignoradas']:
+        print(f"⚠️ Colunas ignoradas: {', '.join(resultado['ignoradas'])}")
+    print(f"✅ {resultado['cadastrados']} cadastro(s) e {resultado['itens']} item(ns) importados "
+          f"de {len(tabela)} linha(s)")
+    if resultado['erros']:
+        print(f"❌ {len(resultado['erros'])} linha(s) com erro")
+        if relatorio:
+            with open(relatorio, "w", encoding="utf-8-sig") as saida:
+                saida.write(relatorio_erros(resultado['erros']))
+            print(f"📄 Relatório de erros em {relatorio}")
+        else:
+            for erro in resultado['erros'][:20]:
+                print(f"   linha {erro['linha']}: {erro['erro']}")
+    return resultado
+
+def exportar_arquivo(conjunto, caminho, termo="", status="Todos", cep=None, raio_km=None):
+    """Exporta um conjunto para CSV/XLSX/Parquet (formato pela extensão do arquivo)"""
+    formato = caminho.rsplit(".", 1)[-1].lower()
+    if formato not in FORMATOS:
+        raise SystemExit(f"❌ Extensão não suportada: use {', '.join(FORMATOS)}")
+    filtros = {}
+    if conjunto in COM_FILTROS:
+        origem = localizar_cep(cep) if cep else None
+        if cep and origem is None:
+            print("⚠️ CEP não reconhecido; exportando sem filtro de distância")
+        filtros = {'termo': termo, 'filtro_disponibilidade': status, 'origem': origem, 'raio_km': raio_km}
+    with leitura() as session, open(caminho, "wb") as saida:
+        total = exportar(session, conjunto, formato, saida, **filtros)
+    print(f"✅ {total} linha(s) de {CONJUNTOS[conjunto][0].lower()} exportadas para {caminho}")
+    return total
+
+def avisar_tarefa(tarefa, erro, segundos):
+    if erro is None:
+        print(f"✅ {tarefa.tipo} #{tarefa.id} em {segundos * 1000:.0f} ms")
+    elif tarefa.tentativas >= tarefa.max_tentativas:
+        print(f"❌ {tarefa.tipo} #{tarefa.id}: {erro} (foi para a lista de falhas)")
+    else:
+        print(f"⚠️ {tarefa.tipo} #{tarefa.id}: {erro} (tentativa {tarefa.tentativas} de {tarefa.max_tentativas}, "
+              f"nova tentativa em {espera_nova_tentativa(tarefa.tentativas):.0f} s)")
+
+def rodar_worker(intervalo=TAREFAS_INTERVALO_S, uma_vez=False):
+    """Executa as tarefas da fila (fila.py) até Ctrl+C, ou até a fila esvaziar com uma_vez"""
+    print(f"👷 Worker da fila iniciado (intervalo {intervalo} s)")
+    try:
+        total = executar_worker(intervalo, uma_vez=uma_vez, avisar=avisar_tarefa)
+    except KeyboardInterrupt:
+        # A tarefa interrompida fica "executando" e volta para a fila depois de TAREFAS_TIMEOUT_S
+        print("🛑 Worker interrompido")
+        return
+    print(f"✅ {total} tarefa(s) executada(s)")
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Manutenção do Sistema de Doações")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    comandos.add_parser("inicializar", help="Aplica as migrações pendentes (Alembic) e cria o admin (idempotente)")
+
+    cmd = comandos.add_parser("migrar-fotos", help="Move as fotos do banco para o armazenamento em disco")
+    cmd.add_argument("--lote", type=int, default=200, help="Registros por transação")
+
+    cmd = comandos.add_parser("gerar-miniaturas", help="Gera as versões de 150px/800px das fotos que ainda não têm")
+    cmd.add_argument("--lote", type=int, default=200, help="Registros por transação")
+
+    cmd = comandos.add_parser("calcular-hashes", help="Calcula o hash das fotos parecidas para as fotos que ainda não têm")
+    cmd.add_argument("--lote", type=int, default=500, help="Registros por transação")
+
+    cmd = comandos.add_parser("limpar-fotos", help="Apaga do armazenamento as fotos que nenhum cadastro usa")
+    cmd.add_argument("--carencia", type=float, default=FOTOS_CARENCIA_HORAS,
+                     help="Horas desde a gravação antes de um arquivo sem uso poder ser apagado")
+    cmd.add_argument("--simular", action="store_true", help="Só conta, sem apagar")
+
+    comandos.add_parser("reindexar-busca", help="Recria o índice de busca textual com todos os itens")
+
+    cmd = comandos.add_parser("localizar-doadores", help="Preenche as coordenadas dos doadores pelo CEP")
+    cmd.add_argument("--todos", action="store_true", help="Recalcula também os já localizados")
+
+    cmd = comandos.add_parser("importar", help="Importa doações ou solicitações de uma planilha CSV/XLSX")
+    cmd.add_argument("tipo", choices=["doacoes", "solicitacoes"])
+    cmd.add_argument("arquivo")
+    cmd.add_argument("--relatorio", help="Grava as linhas com erro neste CSV")
+    cmd.add_argument("--lote", type=int, default=TAMANHO_LOTE, help="Cadastros por transação")
+
+    cmd = comandos.add_parser("exportar", help="Exporta itens, doadores, receptores ou pets (CSV, XLSX ou Parquet)")
+    cmd.add_argument("conjunto", choices=list(CONJUNTOS))
+    cmd.add_argument("arquivo", help="Destino; o formato vem da extensão (.csv, .xlsx, .parquet)")
+    cmd.add_argument("--termo", default="", help="Filtro de texto da pesquisa (itens/doadores)")
+    cmd.add_argument("--status", default="Todos", choices=["Todos", "Disponíveis", "Vencidos"])
+    cmd.add_argument("--cep", help="CEP de origem para o filtro de distância")
+    cmd.add_argument("--raio", type=int, help="Distância máxima em km a partir do CEP")
+
+    cmd = comandos.add_parser("worker", help="Executa as tarefas em segundo plano (fotos enviadas etc.)")
+    cmd.add_argument("--intervalo", type=float, default=TAREFAS_INTERVALO_S,
+                     help="Segundos entre consultas à fila quando ela está vazia")
+    cmd.add_argument("--uma-vez", action="store_true", help="Sai quando a fila esvaziar")
+
+    args = parser.parse_args()
+    # Todos os comandos precisam do esquema em dia
+    inicializar_banco()
+    if args.comando == "migrar-fotos":
+        migrar_fotos(args.lote)
+    elif args.comando == "gerar-miniaturas":
+        gerar_miniaturas(args.lote)
+    elif args.comando == "calcular-hashes":
+        calcular_hashes(args.lote)
+    elif args.comando == "limpar-fotos":
+        limpar_fotos(args.carencia, args.simular)
+    elif args.comando == "reindexar-busca":
+        if reconstruir_indice(engine):
+            print("✅ Índice de busca reconstruído")
+    elif args.comando == "localizar-doadores":
+        localizar_doadores(args.todos)
+    elif args.comando == "importar":
+        importar_planilha(args.tipo, args.arquivo, args.relatorio, args.lote)
+    elif args.comando == "exportar":
+        exportar_arquivo(args.conjunto, args.arquivo, args.termo, args.status, args.cep, args.raio)
+    elif args.comando == "worker":
+        rodar_worker(args.intervalo, args.uma_vez)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import io
+import os
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Versões geradas uma única vez por foto (da maior para a menor)
+RENDICOES = {
+    'foto': (800, 800),       # tamanho real exibido nos cards e no "Ver Foto"
+    'miniatura': (150, 150),  # preview das listagens
+}
+
+# Orçamento de bytes por versão: a qualidade desce em QUALIDADES até caber (se nem a
+# última couber, fica a última)
+ORCAMENTO_BYTES = {'foto': 150_000, 'miniatura': 12_000}
+QUALIDADES = (85, 75, 65, 55)
+
+# Limites contra "bombas de descompressão" (arquivo pequeno que declara dimensões enormes):
+# pixels declarados no cabeçalho e pixels realmente decodificados. O JPEG é decodificado já
+# reduzido (Image.draft: 1/2, 1/4 ou 1/8), então uma foto de 48 MP decodifica ~1 MP; PNG e
+# os outros formatos decodificam inteiros e esbarram no segundo limite.
+IMAGEM_MAX_PIXELS = int(os.environ.get("IMAGEM_MAX_PIXELS", str(64_000_000)))
+IMAGEM_MAX_PIXELS_DECODIFICADOS = int(os.environ.get("IMAGEM_MAX_PIXELS_DECODIFICADOS", str(16_000_000)))
+
+FORMATOS_ACEITOS = {"JPEG", "MPO", "PNG", "WEBP", "GIF", "BMP"}  # MPO: JPEG de algumas câmeras
+ORIENTACAO_EXIF = 0x0112
+
+class ImagemInvalida(ValueError):
+    """Arquivo que não é uma imagem aceita ou que passa dos limites de tamanho"""
+
+def _tamanho_final(tamanho, caixa):
+    """Tamanho depois do thumbnail para caber na caixa (nunca amplia)"""
+    escala = min(caixa[0] / tamanho[0], caixa[1] / tamanho[1], 1)
+    return max(1, round(tamanho[0] * escala)), max(1, round(tamanho[1] * escala))
+
+def abrir_imagem(arquivo, caixa=RENDICOES['foto']):
+    """Abre lendo só o cabeçalho, confere formato e limites e prepara a decodificação reduzida
+
+    Nada é decodificado aqui: serve também para recusar o arquivo no upload.
+    """
+    try:
+        imagem = Image.open(arquivo)
+    except UnidentifiedImageError as erro:
+        raise ImagemInvalida("O arquivo enviado não é uma imagem válida.") from erro
+    except Image.DecompressionBombError as erro:
+        # Acima de 2x Image.MAX_IMAGE_PIXELS o próprio Pillow recusa já no cabeçalho
+        raise ImagemInvalida("Imagem grande demais.") from erro
+    if imagem.format not in FORMATOS_ACEITOS:
+        raise ImagemInvalida(f"Formato de imagem não aceito: {imagem.format}.")
+    largura, altura = imagem.size
+    if largura * altura > IMAGEM_MAX_PIXELS:
+        raise ImagemInvalida(f"Imagem grande demais ({largura}x{altura} pixels).")
+    if imagem.format in ("JPEG", "MPO"):
+        # Rotação de 90° (EXIF 5 a 8): a caixa vale para a imagem já girada
+        if imagem.getexif().get(ORIENTACAO_EXIF, 1) >= 5:
+            caixa = caixa[1], caixa[0]
+        imagem.draft(imagem.mode, _tamanho_final(imagem.size, caixa))
+    largura, altura = imagem.size
+    if largura * altura > IMAGEM_MAX_PIXELS_DECODIFICADOS:
+        raise ImagemInvalida(f"Imagem grande demais para processar ({largura}x{altura} pixels); "
+                             f"envie em JPEG ou em resolução menor.")
+    return imagem
+
+def _normalizar(imagem):
+    """(imagem em RGB/L ou RGBA, tem transparência?) para codificar em JPEG ou WebP"""
+    if imagem.mode in ("RGBA", "LA", "PA", "RGBa", "La") or (imagem.mode == "P" and "transparency" in imagem.info):
+        if imagem.mode != "RGBA":
+            imagem = imagem.convert("RGBA")
+        # Canal alfa todo opaco (comum em prints de tela) não precisa de WebP
+        if imagem.getchannel("A").getextrema()[0] == 255:
+            return imagem.convert("RGB"), False
+        return imagem, True
+    if imagem.mode in ("RGB", "L"):
+        return imagem, False
+    if imagem.mode.startswith("I;16"):
+        # Cinza de 16 bits: convert("L") saturaria em branco; reduz a escala para 8 bits
+        return imagem.convert("I").point(lambda valor: valor / 256).convert("L"), False
+    return imagem.convert("RGB"), False  # P, CMYK, 1, YCbCr...
+
+def _codificar(imagem, transparente, orcamento):
+    """Bytes da versão em JPEG (ou WebP com transparência), na maior qualidade que cabe no orçamento"""
+    for qualidade in QUALIDADES:
+        saida = io.BytesIO()
+        if transparente:
+            imagem.save(saida, format='WEBP', quality=qualidade)
+        else:
+            imagem.save(saida, format='JPEG', quality=qualidade, optimize=True)
+        if saida.tell() <= orcamento:
+            break
+    return saida.getvalue()
+
+def gerar_rendicoes(arquivo):
+    """Decodifica a imagem uma vez (JPEG já reduzido) e gera todas as versões
+
+    A orientação do EXIF é aplicada nos pixels e os metadados (inclusive a
+    localização do GPS) não vão para as versões.
+    """
+    imagem = abrir_imagem(arquivo)
+    ImageOps.exif_transpose(imagem, in_place=True)
+    imagem, transparente = _normalizar(imagem)
+    rendicoes = {}
+    # Cada versão reduz a anterior no lugar (sem cópias do tamanho original)
+    for nome, tamanho in RENDICOES.items():
+        imagem.thumbnail(tamanho)
+        rendicoes[nome] = _codificar(imagem, transparente, ORCAMENTO_BYTES[nome])
+    return rendicoes
+
+def eh_webp(dados):
+    """Versão salva em WebP (imagem com transparência) em vez de JPEG"""
+    return dados[:4] == b"RIFF" and dados[8:12] == b"WEBP"
+
+def hash_perceptual(dados):
+    """dHash de 64 bits de uma versão já gerada (fotos iguais ou quase iguais ficam a poucos bits)
+
+    Escala de cinza 9x8: cada bit diz se o pixel é mais escuro que o vizinho da direita.
+    Volta com sinal (-2^63 a 2^63-1) para caber no BIGINT do banco.
+    """
+    imagem = Image.open(io.BytesIO(dados))
+    imagem.draft("L", (9, 8))  # JPEG: decodifica já em cinza e reduzido
+    pixels = imagem.convert("L").resize((9, 8), Image.Resampling.BOX).tobytes()
+    valor = 0
+    for linha in range(0, 72, 9):
+        for coluna in range(linha, linha + 8):
+            valor = (valor << 1) | (pixels[coluna] < pixels[coluna + 1])
+    return valor - (1 << 64) if valor >= 1 << 63 else valor
@@ -0,0 +1,263 @@
+"""Importação em massa de doações e solicitações a partir de planilhas (CSV ou XLSX)
+
+A planilha é lida de uma vez com o pandas, cada linha é validada em Python e os
+CPFs são conferidos contra o banco numa única consulta (tabela temporária +
+JOIN). As linhas válidas entram em lotes, cada lote numa transação, por
+executemany/COPY (database.inserir_em_massa). Linhas com problema não param a
+importação: vão para o relatório de erros com o número da linha na planilha.
+
+Doações: uma linha por item; linhas com o mesmo CPF viram um doador com vários
+itens (os dados pessoais vêm da primeira linha). Solicitações: uma linha por
+solicitante.
+"""
+import io
+from datetime import datetime
+from functools import lru_cache
+import pandas as pd
+from sqlalchemy import Table, Column, String, MetaData, select
+from database import engine, inserir_em_massa, notificar_alteracoes, Doador, ItemDoacao, Receptor
+from geografia import localizar_cep
+from correspondencia import CATEGORIAS, normalizar
+
+TAMANHO_LOTE = 5000
+
+CAMPOS_PESSOAIS = ["cpf", "nome", "endereco", "numero", "cep", "bairro", "cidade", "estado", "telefone", "whatsapp"]
+CAMPOS = {
+    "doacoes": CAMPOS_PESSOAIS + ["pode_entregar", "prazo_disponibilidade", "item", "quantidade", "descricao"],
+    "solicitacoes": CAMPOS_PESSOAIS + ["qtde_pessoas", "pode_retirar", "necessidades"],
+}
+OBRIGATORIOS = {
+    "doacoes": ["cpf", "nome", "whatsapp", "cidade", "estado", "prazo_disponibilidade", "item"],
+    "solicitacoes": ["cpf", "nome", "whatsapp", "cidade", "estado"],
+}
+# Nomes de coluna aceitos além do próprio campo (comparados já normalizados)
+SINONIMOS = {
+    "endereco": ["rua", "logradouro"], "numero": ["n", "no", "num"], "estado": ["uf"],
+    "telefone": ["fone"], "whatsapp": ["celular", "zap"], "pode_entregar": ["entrega"],
+    "prazo_disponibilidade": ["prazo", "disponivel ate", "validade"], "item": ["produto", "doacao"],
+    "quantidade": ["qtd", "qtde"], "descricao": ["observacao", "obs"], "qtde_pessoas": ["pessoas", "familia"],
+    "pode_retirar": ["retira", "retirada"],
+}
+
+SIM = {"sim", "s", "x", "true", "1", "yes"}
+NAO = {"nao", "n", "false", "0", "no", ""}
+
+_CATEGORIAS_POR_NOME = {normalizar(chave): chave for chave in CATEGORIAS}
+_CATEGORIAS_POR_NOME.update({normalizar(rotulo): chave for chave, (rotulo, _) in CATEGORIAS.items()})
+
+class LinhaInvalida(ValueError):
+    pass
+
+# --- leitura ---
+
+def _nome_coluna(nome):
+    normalizado = normalizar(str(nome))
+    for campo, sinonimos in SINONIMOS.items():
+        if normalizado in sinonimos:
+            return campo
+    return normalizado.replace(" ", "_")
+
+def ler_planilha(arquivo, nome_arquivo):
+    """DataFrame só com texto (CPF e CEP não perdem zeros à esquerda) e colunas normalizadas"""
+    if nome_arquivo.lower().endswith((".xlsx", ".xlsm")):
+        tabela = pd.read_excel(arquivo, dtype=str, keep_default_na=False, engine="openpyxl")
+    else:
+        if hasattr(arquivo, "read"):
+            conteudo = arquivo.read()
+        else:
+            with open(arquivo, "rb") as entrada:
+                conteudo = entrada.read()
+        texto = conteudo.decode("utf-8-sig") if isinstance(conteudo, bytes) else conteudo
+        # CSV do Excel em português vem com ";"
+        cabecalho = texto.split("\n", 1)[0]
+        separador = ";" if cabecalho.count(";") > cabecalho.count(",") else ","
+        tabela = pd.read_csv(io.StringIO(texto), sep=separador, dtype=str, keep_default_na=False)
+    tabela.columns = [_nome_coluna(coluna) for coluna in tabela.columns]
+    return tabela
+
+# --- validação ---
+
+def cpf_valido(cpf):
+    """11 dígitos, não todos iguais, com os dois dígitos verificadores corretos"""
+    if len(cpf) != 11 or not cpf.isdigit() or cpf == cpf[0] * 11:
+        return False
+    for posicao in (9, 10):
+        soma = sum(int(cpf[i]) * (posicao + 1 - i) for i in range(posicao))
+        if (soma * 10 % 11) % 10 != int(cpf[posicao]):
+            return False
+    return True
+
+# Planilhas repetem os mesmos valores (Sim/Não, prazos): convertidos uma vez só
+@lru_cache(maxsize=4096)
+def _booleano(valor, campo):
+    normalizado = normalizar(valor)
+    if normalizado in SIM:
+        return True
+    if normalizado in NAO:
+        return False
+    raise LinhaInvalida(f"{campo}: use Sim ou Não (recebido '{valor}')")
+
+def _inteiro(valor, campo, padrao):
+    if not valor:
+        return padrao
+    try:
+        numero = int(float(valor.replace(",", ".")))
+    except ValueError:
+        raise LinhaInvalida(f"{campo}: número inválido '{valor}'")
+    if numero < 1:
+        raise LinhaInvalida(f"{campo}: deve ser pelo menos 1")
+    return numero
+
+@lru_cache(maxsize=4096)
+def _data(valor, campo):
+    for formato in ("%d/%m/%Y", "%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%d/%m/%y"):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            pass
+    raise LinhaInvalida(f"{campo}: data inválida '{valor}' (use DD/MM/AAAA)")
+
+def _necessidades(valor):
+    chaves = []
+    for parte in valor.replace(";", ",").split(","):
+        if not parte.strip():
+            continue
+        chave = _CATEGORIAS_POR_NOME.get(normalizar(parte))
+        if chave is None:
+            raise LinhaInvalida(f"necessidades: categoria desconhecida '{parte.strip()}'")
+        if chave not in chaves:
+            chaves.append(chave)
+    return ",".join(chaves) or None
+
+def _conferir_tamanhos(modelo, valores):
+    # O PostgreSQL recusa texto maior que a coluna e derrubaria o lote inteiro (o SQLite aceitaria)
+    colunas = modelo.__table__.c
+    for campo, valor in valores.items():
+        limite = getattr(colunas[campo].type, "length", None)
+        if limite and isinstance(valor, str) and len(valor) > limite:
+            raise LinhaInvalida(f"{campo}: no máximo {limite} caracteres (recebido {len(valor)})")
+
+def validar_linha(tipo, dados):
+    """Valores prontos para o banco (dados pessoais e, nas doações, o item) ou LinhaInvalida"""
+    faltando = [campo for campo in OBRIGATORIOS[tipo] if not dados.get(campo)]
+    if faltando:
+        raise LinhaInvalida(f"campo(s) obrigatório(s) vazio(s): {', '.join(faltando)}")
+    # O Excel guarda CPF digitado como número e perde os zeros à esquerda
+    cpf = "".join(filter(str.isdigit, dados["cpf"])).zfill(11)
+    if not cpf_valido(cpf):
+        raise LinhaInvalida(f"CPF inválido '{dados['cpf']}'")
+    estado = dados["estado"].upper()
+    if len(estado) != 2:
+        raise LinhaInvalida(f"estado: use a sigla com 2 letras (recebido '{dados['estado']}')")
+    pessoa = {campo: dados.get(campo) or None for campo in CAMPOS_PESSOAIS}
+    pessoa.update(cpf=cpf, estado=estado)
+    if tipo == "doacoes":
+        pessoa.update(pode_entregar=_booleano(dados.get("pode_entregar", ""), "pode_entregar"),
+                      prazo_disponibilidade=_data(dados["prazo_disponibilidade"], "prazo_disponibilidade"))
+        item = {'item': dados["item"], 'quantidade': _inteiro(dados.get("quantidade"), "quantidade", 1),
+                'descricao': dados.get("descricao") or None}
+        _conferir_tamanhos(Doador, pessoa)
+        _conferir_tamanhos(ItemDoacao, item)
+        return pessoa, item
+    pessoa.update(qtde_pessoas=_inteiro(dados.get("qtde_pessoas"), "qtde_pessoas", 1),
+                  pode_retirar=_booleano(dados.get("pode_retirar", ""), "pode_retirar"),
+                  necessidades=_necessidades(dados.get("necessidades", "")))
+    _conferir_tamanhos(Receptor, pessoa)
+    return pessoa, None
+
+def cpfs_existentes(conn, tabela, cpfs):
+    """CPFs da lista que já estão na tabela, numa consulta só (sem limite de parâmetros do IN)"""
+    temporaria = Table("importacao_cpfs", MetaData(), Column("cpf", String(14), primary_key=True),
+                       prefixes=["TEMPORARY"])
+    # Criada dentro da transação: um erro no meio desfaz a criação junto
+    temporaria.create(conn)
+    inserir_em_massa(conn, temporaria, [{'cpf': cpf} for cpf in cpfs])
+    existentes = set(conn.execute(select(tabela.c.cpf).join(temporaria, temporaria.c.cpf == tabela.c.cpf)).scalars())
+    temporaria.drop(conn)
+    return existentes
+
+# --- importação ---
+
+def importar(tabela_planilha, tipo, usuario_id=None, lote=TAMANHO_LOTE):
+    """Importa as linhas do DataFrame
+
+    Devolve {'cadastrados', 'itens', 'ignoradas' (colunas desconhecidas), 'erros': [{linha, cpf, erro}]}.
+    """
+    desconhecidas = [coluna for coluna in tabela_planilha.columns if coluna not in CAMPOS[tipo]]
+    faltando = [campo for campo in OBRIGATORIOS[tipo] if campo not in tabela_planilha.columns]
+    if faltando:
+        raise ValueError(f"Coluna(s) obrigatória(s) ausente(s) na planilha: {', '.join(faltando)}")
+
+    erros = []
+    pessoas = {}  # cpf -> (linhas na planilha, dados, itens)
+    colunas = [coluna for coluna in tabela_planilha.columns if coluna not in desconhecidas]
+    # Colunas como listas Python: iterar o DataFrame linha a linha é bem mais lento
+    for indice, valores in enumerate(zip(*(tabela_planilha[coluna].tolist() for coluna in colunas))):
+        linha = indice + 2  # linha 1 é o cabeçalho
+        dados = {campo: valor.strip() for campo, valor in zip(colunas, valores)}
+        try:
+            pessoa, item = validar_linha(tipo, dados)
+        except LinhaInvalida as e:
+            erros.append({'linha': linha, 'cpf': dados.get("cpf"), 'erro': str(e)})
+            continue
+        if pessoa['cpf'] in pessoas:
+            linhas, _, itens_pessoa = pessoas[pessoa['cpf']]
+            if item is None:
+                erros.append({'linha': linha, 'cpf': pessoa['cpf'],
+                              'erro': f"CPF repetido na planilha (já na linha {linhas[0]})"})
+            else:
+                linhas.append(linha)
+                itens_pessoa.append(item)
+            continue
+        pessoas[pessoa['cpf']] = ([linha], pessoa, [item] if item else [])
+
+    modelo = Doador if tipo == "doacoes" else Receptor
+    with engine.begin() as conn:
+        existentes = cpfs_existentes(conn, modelo.__table__, list(pessoas))
+    for cpf in existentes:
+        linhas, _, _ = pessoas.pop(cpf)
+        erros.extend({'linha': linha, 'cpf': cpf, 'erro': "CPF já cadastrado"} for linha in linhas)
+
+    cadastrados = itens = 0
+    fila = list(pessoas.values())
+    try:
+        for inicio in range(0, len(fila), lote):
+            pedaco = fila[inicio:inicio + lote]
+            try:
+                with engine.begin() as conn:
+                    itens += _inserir_lote(conn, modelo, pedaco, usuario_id)
+                cadastrados += len(pedaco)
+            except Exception as e:
+                erros.extend({'linha': linha, 'cpf': pessoa['cpf'], 'erro': f"lote não gravado: {e}"}
+                             for linhas, pessoa, _ in pedaco for linha in linhas)
+    finally:
+        if cadastrados:
+            # executemany/COPY não passam pelo ORM: avisa os caches sem ids (recarregam tudo)
+            alteracoes = {modelo.__tablename__: {"novo": None}}
+            if itens:
+                alteracoes[ItemDoacao.__tablename__] = {"novo": None}
+            notificar_alteracoes(alteracoes)
+    erros.sort(key=lambda erro: erro['linha'])
+    return {'cadastrados': cadastrados, 'itens': itens, 'ignoradas': desconhecidas, 'erros': erros}
+
+def _inserir_lote(conn, modelo, lote, usuario_id):
+    linhas = []
+    for _, pessoa, _ in lote:
+        linha = dict(pessoa, usuario_id=usuario_id)
+        if modelo is Doador:
+            # Os eventos do mapper não rodam em executemany: coordenadas calculadas aqui
+            linha['latitude'], linha['longitude'] = localizar_cep(pessoa['cep']) or (None, None)
+        linhas.append(linha)
+    if modelo is not Doador:
+        inserir_em_massa(conn, modelo.__table__, linhas)
+        return 0
+    ids = conn.execute(Doador.__table__.insert().returning(Doador.id, sort_by_parameter_order=True),
+                       linhas).scalars().all()
+    itens = [dict(item, doador_id=doador_id) for doador_id, (_, _, itens_doador) in zip(ids, lote)
+             for item in itens_doador]
+    inserir_em_massa(conn, ItemDoacao.__table__, itens)
+    return len(itens)
+
+def relatorio_erros(erros):
+    """CSV (texto) com linha, CPF e motivo de cada linha não importada"""
+    return pd.DataFrame(erros, columns=['linha', 'cpf', 'erro']).to_csv(index=False, sep=";")
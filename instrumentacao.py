@@ -0,0 +1,267 @@
+"""Contagem de consultas (verificações) e métricas de desempenho por página
+
+contar_consultas/limitar_consultas contam os comandos SQL de um bloco e são
+usados pelos scripts de benchmarks/ para detectar N+1.
+
+O app marca o início e o fim de cada rerun com iniciar_pagina/finalizar_pagina.
+Os eventos before/after_cursor_execute do engine (instrumentar_engine, chamado
+em database.py) contam e cronometram cada comando SQL e atribuem à página do
+rerun em andamento (contextvar: cada sessão do Streamlit roda numa thread).
+Funções decoradas com @medir("nome") entram como blocos da página.
+
+Cada série guarda as últimas INSTRUMENTACAO_AMOSTRAS medidas (p50/p95/p99 saem
+delas) e contadores desde o início do processo. Os resultados aparecem no
+painel de Administração e em texto no formato do Prometheus (texto_prometheus),
+servido em http://METRICAS_HOST:METRICAS_PORTA/metrics quando a porta existe.
+Um rerun interrompido por st.rerun() não chega a finalizar_pagina: é registrado
+no iniciar_pagina seguinte, que o Streamlit roda logo depois na mesma thread.
+"""
+import contextvars
+import functools
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sqlalchemy import event
+
+class ContadorConsultas:
+    """Conta os comandos SQL enviados ao banco enquanto está ativo"""
+
+    def __init__(self):
+        self.comandos = []
+
+    @property
+    def total(self):
+        return len(self.comandos)
+
+    def _registrar(self, conn, cursor, statement, parameters, context, executemany):
+        self.comandos.append(statement)
+
+@contextmanager
+def contar_consultas(engine):
+    """with contar_consultas(engine) as contador: ...; contador.total"""
+    contador = ContadorConsultas()
+    event.listen(engine, "before_cursor_execute", contador._registrar)
+    try:
+        yield contador
+    finally:
+        event.remove(engine, "before_cursor_execute", contador._registrar)
+
+@contextmanager
+def limitar_consultas(engine, maximo, descricao="bloco"):
+    """Falha (AssertionError) se o bloco emitir mais que `maximo` comandos SQL"""
+    with contar_consultas(engine) as contador:
+        yield contador
+    if contador.total > maximo:
+        comandos = "\n".join(f"  {comando.splitlines()[0]}" for comando in contador.comandos)
+        raise AssertionError(f"{descricao}: {contador.total} consultas (máximo {maximo})\n{comandos}")
+
+# --- métricas por página ---
+
+INSTRUMENTACAO = os.environ.get("INSTRUMENTACAO", "1") != "0"
+INSTRUMENTACAO_AMOSTRAS = int(os.environ.get("INSTRUMENTACAO_AMOSTRAS", "1000"))
+METRICAS_PORTA = os.environ.get("METRICAS_PORTA")
+# /metrics não tem autenticação: só na máquina local, a não ser que se escolha outra interface
+METRICAS_HOST = os.environ.get("METRICAS_HOST", "127.0.0.1")
+
+# SQL fora de um rerun (pool de senhas, exportação em outra thread, ouvintes de commit)
+FORA_DE_PAGINA = "(segundo plano)"
+
+# (série, página, bloco) -> medidas; séries: "pagina" e "sql" em segundos por rerun,
+# "comandos" em comandos por rerun, "consulta" e "bloco" em segundos por chamada
+_amostras = {}
+_totais = {}  # mesma chave -> [quantidade, soma] desde o início do processo
+_lock = threading.Lock()
+_rerun = contextvars.ContextVar("rerun", default=None)
+_servidor = {'iniciado': False}
+
+def _registrar(serie, pagina, valor, bloco=""):
+    chave = (serie, pagina, bloco)
+    with _lock:
+        amostras = _amostras.get(chave)
+        if amostras is None:
+            amostras = _amostras[chave] = deque(maxlen=INSTRUMENTACAO_AMOSTRAS)
+            _totais[chave] = [0, 0.0]
+        amostras.append(valor)
+        total = _totais[chave]
+        total[0] += 1
+        total[1] += valor
+
+def _pagina_atual():
+    rerun = _rerun.get()
+    return rerun['pagina'] if rerun else FORA_DE_PAGINA
+
+# --- reruns ---
+
+def iniciar_pagina(pagina):
+    """Começa a medir um rerun; o anterior, se parou num st.rerun(), é registrado agora"""
+    if not INSTRUMENTACAO:
+        return
+    finalizar_pagina()
+    _rerun.set({'pagina': pagina, 'inicio': time.perf_counter(), 'comandos': 0, 'sql': 0.0})
+
+def finalizar_pagina():
+    rerun = _rerun.get()
+    if rerun is None:
+        return
+    _rerun.set(None)
+    _registrar("pagina", rerun['pagina'], time.perf_counter() - rerun['inicio'])
+    _registrar("comandos", rerun['pagina'], rerun['comandos'])
+    _registrar("sql", rerun['pagina'], rerun['sql'])
+
+def medir(bloco):
+    """Decorador: registra a duração de cada chamada como um bloco da página atual"""
+    def decorar(funcao):
+        if not INSTRUMENTACAO:
+            return funcao
+
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                _registrar("bloco", _pagina_atual(), time.perf_counter() - inicio, bloco)
+        return medida
+    return decorar
+
+# --- SQL ---
+
+def instrumentar_engine(engine):
+    """Cronometra cada comando SQL executado pelo engine"""
+    if not INSTRUMENTACAO:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.inicio_instrumentacao = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        inicio = getattr(context, "inicio_instrumentacao", None)
+        if inicio is None:
+            return
+        duracao = time.perf_counter() - inicio
+        rerun = _rerun.get()
+        if rerun is not None:
+            rerun['comandos'] += 1
+            rerun['sql'] += duracao
+        _registrar("consulta", rerun['pagina'] if rerun else FORA_DE_PAGINA, duracao)
+
+# --- resultados ---
+
+def percentil(valores_ordenados, fracao):
+    """Percentil pelo posto mais próximo de uma lista já ordenada"""
+    if not valores_ordenados:
+        return 0.0
+    return valores_ordenados[max(0, math.ceil(fracao * len(valores_ordenados)) - 1)]
+
+def _copiar():
+    with _lock:
+        return ({chave: sorted(amostras) for chave, amostras in _amostras.items()},
+                {chave: tuple(total) for chave, total in _totais.items()})
+
+def resumo():
+    """(páginas, blocos): listas de dicts com p50/p95/p99 em ms das últimas amostras"""
+    amostras, totais = _copiar()
+    vazio = []
+    paginas = []
+    for pagina in sorted({pagina for serie, pagina, _ in amostras if serie in ("pagina", "consulta")}):
+        tempos = amostras.get(("pagina", pagina, ""), vazio)
+        comandos = amostras.get(("comandos", pagina, ""), vazio)
+        sql = amostras.get(("sql", pagina, ""), vazio)
+        consultas = amostras.get(("consulta", pagina, ""), vazio)
+        paginas.append({
+            'pagina': pagina,
+            'reruns': totais.get(("pagina", pagina, ""), (0, 0))[0],
+            'p50_ms': percentil(tempos, 0.50) * 1000,
+            'p95_ms': percentil(tempos, 0.95) * 1000,
+            'p99_ms': percentil(tempos, 0.99) * 1000,
+            'sql_p50_ms': percentil(sql, 0.50) * 1000,
+            'sql_p95_ms': percentil(sql, 0.95) * 1000,
+            'comandos_media': sum(comandos) / len(comandos) if comandos else 0.0,
+            'comandos_p95': percentil(comandos, 0.95),
+            'consulta_p95_ms': percentil(consultas, 0.95) * 1000,
+            'consulta_p99_ms': percentil(consultas, 0.99) * 1000,
+            'comandos_total': totais.get(("consulta", pagina, ""), (0, 0))[0],
+        })
+    blocos = []
+    for (serie, pagina, bloco), valores in sorted(amostras.items()):
+        if serie != "bloco":
+            continue
+        blocos.append({
+            'bloco': bloco,
+            'pagina': pagina,
+            'chamadas': totais[(serie, pagina, bloco)][0],
+            'p50_ms': percentil(valores, 0.50) * 1000,
+            'p95_ms': percentil(valores, 0.95) * 1000,
+            'p99_ms': percentil(valores, 0.99) * 1000,
+        })
+    return paginas, blocos
+
+# Série -> (métrica do Prometheus, descrição)
+_METRICAS = {
+    "pagina": ("doacoes_pagina_segundos", "Tempo de um rerun da página"),
+    "sql": ("doacoes_pagina_sql_segundos", "Tempo em SQL por rerun da página"),
+    "comandos": ("doacoes_pagina_comandos_sql", "Comandos SQL por rerun da página"),
+    "consulta": ("doacoes_comando_sql_segundos", "Duração de cada comando SQL"),
+    "bloco": ("doacoes_bloco_segundos", "Duração de cada chamada de um bloco instrumentado"),
+}
+
+def _rotulo(valor):
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def texto_prometheus():
+    """Summaries (quantis 0.5/0.95/0.99 + _count/_sum) no formato de texto do Prometheus"""
+    amostras, totais = _copiar()
+    linhas = []
+    for serie, (nome, descricao) in _METRICAS.items():
+        linhas += [f"# HELP {nome} {descricao}", f"# TYPE {nome} summary"]
+        for chave in sorted(chave for chave in amostras if chave[0] == serie):
+            _, pagina, bloco = chave
+            rotulos = f'pagina="{_rotulo(pagina)}"' + (f',bloco="{_rotulo(bloco)}"' if bloco else "")
+            for quantil in (0.5, 0.95, 0.99):
+                linhas.append(f'{nome}{{{rotulos},quantile="{quantil}"}} {percentil(amostras[chave], quantil):.6g}')
+            quantidade, soma = totais[chave]
+            linhas.append(f"{nome}_count{{{rotulos}}} {quantidade}")
+            linhas.append(f"{nome}_sum{{{rotulos}}} {soma:.6g}")
+    return "\n".join(linhas) + "\n"
+
+def zerar():
+    with _lock:
+        _amostras.clear()
+        _totais.clear()
+
+# --- endpoint ---
+
+class _Metricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        corpo = texto_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+def iniciar_servidor_metricas(porta=METRICAS_PORTA, host=METRICAS_HOST):
+    """Sobe /metrics numa thread do processo (uma vez só); sem porta configurada não faz nada"""
+    if not porta or not INSTRUMENTACAO:
+        return None
+    with _lock:
+        if _servidor['iniciado']:
+            return None
+        _servidor['iniciado'] = True
+    servidor = ThreadingHTTPServer((host, int(porta)), _Metricas)
+    threading.Thread(target=servidor.serve_forever, name="metricas", daemon=True).start()
+    print(f"📈 Métricas em http://{host}:{porta}/metrics")
+    return servidor
@@ -0,0 +1,61 @@
+"""Ambiente do Alembic ligado a database.Base e ao engine do app
+
+O app (database.migrar_esquema) passa a própria conexão em
+config.attributes['connection']; pela linha de comando (alembic ...) usa o
+engine de database.py, então DATABASE_URL vale nos dois casos.
+
+No SQLite as revisões geradas usam batch_alter_table ("move and copy"): o
+SQLite não altera nem remove colunas com ALTER TABLE, então a tabela é recriada
+com os dados numa única transação.
+"""
+from logging.config import fileConfig
+from alembic import context
+import database
+
+config = context.config
+target_metadata = database.Base.metadata
+
+# Criados fora dos modelos e mantidos por código próprio: FTS5 (busca_textual),
+# R*Tree (geografia), índices de trigramas do PostgreSQL e tabelas temporárias
+PREFIXOS_IGNORADOS = ("itens_busca", "doadores_geo", "importacao_")
+SUFIXOS_IGNORADOS = ("_trgm",)
+
+def incluir_objeto(objeto, nome, tipo, refletido, comparado):
+    """Filtro do autogenerate: só o que os modelos declaram"""
+    return not (nome and (nome.startswith(PREFIXOS_IGNORADOS) or nome.endswith(SUFIXOS_IGNORADOS)))
+
+def configurar(**opcoes):
+    context.configure(
+        target_metadata=target_metadata,
+        include_object=incluir_objeto,
+        transaction_per_migration=True,
+        **opcoes,
+    )
+
+def migrar_offline():
+    """alembic upgrade --sql: gera o SQL sem conectar"""
+    configurar(url=database.DATABASE_URL, literal_binds=True, dialect_opts={"paramstyle": "named"},
+               render_as_batch=database.DATABASE_URL.startswith("sqlite"))
+    with context.begin_transaction():
+        context.run_migrations()
+
+def migrar(conexao):
+    configurar(connection=conexao, render_as_batch=conexao.dialect.name == "sqlite")
+    with context.begin_transaction():
+        context.run_migrations()
+
+def migrar_online():
+    conexao = config.attributes.get("connection")
+    if conexao is not None:
+        migrar(conexao)
+        return
+    # Linha de comando: logs do alembic.ini (no app o logging é do Streamlit)
+    if config.config_file_name is not None:
+        fileConfig(config.config_file_name)
+    with database.engine.connect() as conexao:
+        migrar(conexao)
+
+if context.is_offline_mode():
+    migrar_offline()
+else:
+    migrar_online()
@@ -0,0 +1,178 @@
+"""Esquema inicial: usuários, doações, solicitações e pets
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Banco vazio: cria as tabelas e os índices. Banco criado antes das migrações
+(create_all + garantir_colunas das versões anteriores, sem alembic_version):
+completa as colunas e os índices que faltam e apaga o índice de item trocado
+por lower(item). No PostgreSQL os índices entram com CREATE INDEX CONCURRENTLY,
+sem travar as escritas em tabelas grandes.
+
+O esquema fica congelado aqui (não importa database.py): as próximas revisões
+descrevem só o que muda a partir dele.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Índices de versões anteriores que nenhuma consulta usa mais
+INDICES_REMOVIDOS = ["ix_itens_doacao_item"]  # trocado por ix_itens_doacao_item_lower
+
+
+def _esquema():
+    metadata = sa.MetaData()
+    sa.Table(
+        "usuarios", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("login", sa.String(100), unique=True, index=True),
+        sa.Column("email", sa.String(200)),
+        sa.Column("whatsapp", sa.String(20)),
+        sa.Column("senha_hash", sa.String(128)),
+        sa.Column("salt", sa.String(32)),
+        sa.Column("cpf", sa.String(14), unique=True),
+        sa.Column("is_admin", sa.Boolean),
+        sa.Column("data_cadastro", sa.DateTime),
+    )
+    sa.Table(
+        "doadores", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("usuario_id", sa.Integer, sa.ForeignKey("usuarios.id"), index=True),
+        sa.Column("cpf", sa.String(14), unique=True, index=True),
+        sa.Column("nome", sa.String(200)),
+        sa.Column("endereco", sa.String(300)),
+        sa.Column("numero", sa.String(20)),
+        sa.Column("cep", sa.String(10)),
+        sa.Column("bairro", sa.String(100)),
+        sa.Column("cidade", sa.String(100)),
+        sa.Column("estado", sa.String(2)),
+        sa.Column("telefone", sa.String(20)),
+        sa.Column("whatsapp", sa.String(20)),
+        sa.Column("pode_entregar", sa.Boolean),
+        sa.Column("prazo_disponibilidade", sa.Date, index=True),
+        sa.Column("latitude", sa.Float),
+        sa.Column("longitude", sa.Float),
+        sa.Column("data_cadastro", sa.DateTime),
+        sa.Index("ix_doadores_lat_lon", "latitude", "longitude"),
+    )
+    itens = sa.Table(
+        "itens_doacao", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("doador_id", sa.Integer, sa.ForeignKey("doadores.id"), index=True),
+        sa.Column("item", sa.String(200)),
+        sa.Column("quantidade", sa.Integer),
+        sa.Column("descricao", sa.Text),
+        sa.Column("foto", sa.LargeBinary),
+        sa.Column("foto_hash", sa.String(64), index=True),
+        sa.Column("foto_tamanho", sa.Integer),
+        sa.Column("foto_largura", sa.Integer),
+        sa.Column("foto_altura", sa.Integer),
+        sa.Column("miniatura_hash", sa.String(64)),
+        sa.Column("data_cadastro", sa.DateTime),
+    )
+    sa.Index("ix_itens_doacao_item_lower", sa.func.lower(itens.c.item), itens.c.id)
+    sa.Table(
+        "receptores", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("usuario_id", sa.Integer, sa.ForeignKey("usuarios.id"), index=True),
+        sa.Column("cpf", sa.String(14), unique=True, index=True),
+        sa.Column("nome", sa.String(200)),
+        sa.Column("endereco", sa.String(300)),
+        sa.Column("numero", sa.String(20)),
+        sa.Column("cep", sa.String(10)),
+        sa.Column("bairro", sa.String(100)),
+        sa.Column("cidade", sa.String(100)),
+        sa.Column("estado", sa.String(2)),
+        sa.Column("telefone", sa.String(20)),
+        sa.Column("whatsapp", sa.String(20)),
+        sa.Column("qtde_pessoas", sa.Integer),
+        sa.Column("pode_retirar", sa.Boolean),
+        sa.Column("necessidades", sa.String(500)),
+        sa.Column("data_cadastro", sa.DateTime),
+    )
+    sa.Table(
+        "pets", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("usuario_id", sa.Integer, sa.ForeignKey("usuarios.id"), index=True),
+        sa.Column("nome", sa.String(100)),
+        sa.Column("especie", sa.String(50)),
+        sa.Column("raca", sa.String(100)),
+        sa.Column("descricao", sa.Text),
+        sa.Column("situacao", sa.String(50)),
+        sa.Column("local_encontro", sa.String(200)),
+        sa.Column("contato", sa.String(20)),
+        sa.Column("foto", sa.LargeBinary),
+        sa.Column("foto_hash", sa.String(64), index=True),
+        sa.Column("foto_tamanho", sa.Integer),
+        sa.Column("foto_largura", sa.Integer),
+        sa.Column("foto_altura", sa.Integer),
+        sa.Column("miniatura_hash", sa.String(64)),
+        sa.Column("data_cadastro", sa.DateTime),
+        sa.Index("ix_pets_especie_situacao_data", "especie", "situacao", "data_cadastro"),
+    )
+    return metadata
+
+
+def _nomes_indices(conexao):
+    """Índices existentes, lidos do catálogo (a reflexão ignora índices de expressão)"""
+    if conexao.dialect.name == "postgresql":
+        sql = "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()"
+    else:
+        sql = "SELECT name FROM sqlite_master WHERE type = 'index'"
+    return set(conexao.execute(sa.text(sql)).scalars())
+
+
+def _criar_indice(indice):
+    """CREATE INDEX (CONCURRENTLY no PostgreSQL: a tabela continua aceitando escritas)"""
+    colunas = [expressao.name if isinstance(expressao, sa.Column) else expressao
+               for expressao in indice.expressions]
+    op.create_index(indice.name, indice.table.name, colunas, unique=indice.unique,
+                    postgresql_concurrently=True)
+
+
+def _completar_banco_antigo(conexao, esquema):
+    inspetor = sa.inspect(conexao)
+    for tabela in esquema.sorted_tables:
+        if not inspetor.has_table(tabela.name):
+            tabela.create(conexao)
+            continue
+        existentes = {coluna['name'] for coluna in inspetor.get_columns(tabela.name)}
+        for coluna in tabela.columns:
+            if coluna.name not in existentes:
+                # Colunas novas são todas anuláveis e sem default: ALTER TABLE sem reescrever a tabela
+                op.add_column(tabela.name, sa.Column(coluna.name, coluna.type))
+
+    indices = _nomes_indices(conexao)
+    faltando = [indice for tabela in esquema.sorted_tables for indice in tabela.indexes
+                if indice.name not in indices]
+    if conexao.dialect.name == "postgresql":
+        # CONCURRENTLY não roda dentro de transação
+        with op.get_context().autocommit_block():
+            for indice in faltando:
+                _criar_indice(indice)
+    else:
+        for indice in faltando:
+            _criar_indice(indice)
+    for nome in INDICES_REMOVIDOS:
+        op.execute(f"DROP INDEX IF EXISTS {nome}")
+    if faltando:
+        # Índices novos num banco com dados: estatísticas para o planejador escolher bem
+        op.execute("ANALYZE")
+
+
+def upgrade():
+    conexao = op.get_bind()
+    esquema = _esquema()
+    if sa.inspect(conexao).has_table("usuarios"):
+        _completar_banco_antigo(conexao, esquema)
+    else:
+        esquema.create_all(conexao)
+
+
+def downgrade():
+    _esquema().drop_all(op.get_bind())
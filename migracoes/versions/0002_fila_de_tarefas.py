@@ -0,0 +1,63 @@
+"""Fila de tarefas e foto original à espera do worker
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Tabela tarefas (fila.py) e a coluna foto_original_hash em itens_doacao e pets.
+A coluna nova é anulável e sem default: ADD COLUMN não reescreve a tabela em
+nenhum dos dois bancos. Os índices dela entram com CREATE INDEX CONCURRENTLY no
+PostgreSQL, como na 0001.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+TABELAS_FOTO = ["itens_doacao", "pets"]
+
+
+def upgrade():
+    op.create_table(
+        "tarefas",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("tipo", sa.String(50), nullable=False),
+        sa.Column("chave", sa.String(100)),
+        sa.Column("dados", sa.Text),
+        sa.Column("estado", sa.String(20), nullable=False),
+        sa.Column("tentativas", sa.Integer, nullable=False),
+        sa.Column("max_tentativas", sa.Integer, nullable=False),
+        sa.Column("disponivel_em", sa.DateTime, nullable=False),
+        sa.Column("trabalhador", sa.String(100)),
+        sa.Column("erro", sa.Text),
+        sa.Column("resultado", sa.Text),
+        sa.Column("criada_em", sa.DateTime, nullable=False),
+        sa.Column("iniciada_em", sa.DateTime),
+        sa.Column("concluida_em", sa.DateTime),
+    )
+    op.create_index("ix_tarefas_estado_disponivel", "tarefas", ["estado", "disponivel_em"])
+    op.create_index("ix_tarefas_tipo_chave", "tarefas", ["tipo", "chave"])
+
+    for tabela in TABELAS_FOTO:
+        op.add_column(tabela, sa.Column("foto_original_hash", sa.String(64)))
+    if op.get_bind().dialect.name == "postgresql":
+        # CONCURRENTLY não roda dentro de transação
+        with op.get_context().autocommit_block():
+            for tabela in TABELAS_FOTO:
+                op.create_index(f"ix_{tabela}_foto_original_hash", tabela, ["foto_original_hash"],
+                                postgresql_concurrently=True)
+    else:
+        for tabela in TABELAS_FOTO:
+            op.create_index(f"ix_{tabela}_foto_original_hash", tabela, ["foto_original_hash"])
+
+
+def downgrade():
+    for tabela in TABELAS_FOTO:
+        op.drop_index(f"ix_{tabela}_foto_original_hash", table_name=tabela)
+        # DROP COLUMN direto (SQLite 3.35+), sem batch: recriar a tabela perderia o índice
+        # de lower(item) e os gatilhos da busca textual, que a reflexão não enxerga
+        op.drop_column(tabela, "foto_original_hash")
+    op.drop_table("tarefas")
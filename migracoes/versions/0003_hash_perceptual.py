@@ -0,0 +1,40 @@
+"""Hash perceptual das fotos (fotos parecidas)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Coluna foto_phash (dHash de 64 bits, imagens.hash_perceptual) em itens_doacao e
+pets. Anulável e sem default, como a foto_original_hash da 0002; as fotos já
+existentes são preenchidas com `python gerenciar.py calcular-hashes`, que lê as
+miniaturas do armazenamento (fora do alcance de uma migração).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+TABELAS_FOTO = ["itens_doacao", "pets"]
+
+
+def upgrade():
+    for tabela in TABELAS_FOTO:
+        op.add_column(tabela, sa.Column("foto_phash", sa.BigInteger))
+    if op.get_bind().dialect.name == "postgresql":
+        # CONCURRENTLY não roda dentro de transação
+        with op.get_context().autocommit_block():
+            for tabela in TABELAS_FOTO:
+                op.create_index(f"ix_{tabela}_foto_phash", tabela, ["foto_phash"], postgresql_concurrently=True)
+    else:
+        for tabela in TABELAS_FOTO:
+            op.create_index(f"ix_{tabela}_foto_phash", tabela, ["foto_phash"])
+
+
+def downgrade():
+    for tabela in TABELAS_FOTO:
+        op.drop_index(f"ix_{tabela}_foto_phash", table_name=tabela)
+        # Sem batch, pelo mesmo motivo da 0002
+        op.drop_column(tabela, "foto_phash")
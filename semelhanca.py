@@ -0,0 +1,182 @@
+"""Fotos parecidas: busca por distância de Hamming entre hashes perceptuais
+
+Cada foto tem um dHash de 64 bits (imagens.hash_perceptual, coluna foto_phash).
+O índice em memória é um "multi-index hashing": os 64 bits em 4 blocos de 16,
+cada bloco com um dicionário valor -> ids. Se dois hashes diferem em até r bits,
+algum bloco difere em até r // 4 (casa dos pombos; ver _raios); então basta
+procurar, em cada bloco, os valores a poucos bits do procurado e conferir a
+distância inteira só desses candidatos. Com r = 7 são 4 x 17 consultas a
+dicionário, sem depender da quantidade de fotos.
+
+Na Area dos Pets, um pet "Perdido" recebe como possíveis correspondências os
+"Encontrado" da mesma espécie com foto parecida, e vice-versa.
+"""
+import os
+import threading
+from collections import defaultdict
+from functools import lru_cache
+from itertools import combinations
+from sqlalchemy import select
+from database import engine, ao_confirmar, ItemDoacao, Pet
+
+# Bits diferentes para considerar duas fotos parecidas: a mesma foto reenviada, recortada ou
+# recomprimida fica a 0-3 bits, fotos sem relação perto de 32. Até 7 cada bloco procura a 1 bit
+# (4 x 17 consultas); a partir de 8 um bloco passa a 2 bits e a busca fica ~3x mais cara.
+SEMELHANCA_DISTANCIA_MAX = int(os.environ.get("SEMELHANCA_DISTANCIA_MAX", "7"))
+SUGESTOES_POR_PET = 3
+SITUACOES_OPOSTAS = {"Perdido": "Encontrado", "Encontrado": "Perdido"}
+
+BLOCOS = 4
+BITS_BLOCO = 64 // BLOCOS
+MASCARA_BLOCO = (1 << BITS_BLOCO) - 1
+MASCARA_64 = (1 << 64) - 1
+
+def distancia(a, b):
+    """Bits diferentes entre dois hashes (com ou sem sinal)"""
+    return ((a ^ b) & MASCARA_64).bit_count()
+
+@lru_cache(maxsize=None)
+def _variacoes(raio):
+    """Máscaras de BITS_BLOCO bits com até `raio` bits ligados (XOR com a chave = vizinhos do bloco)"""
+    if raio < 0:
+        return ()
+    mascaras = [0]
+    for bits in range(1, raio + 1):
+        for posicoes in combinations(range(BITS_BLOCO), bits):
+            mascaras.append(sum(1 << posicao for posicao in posicoes))
+    return tuple(mascaras)
+
+def _raios(distancia_max):
+    """Raio de busca de cada bloco: com distancia_max = q * BLOCOS + a, os a + 1 primeiros blocos
+    procuram até q bits e os outros até q - 1 (se todos passassem disso, a soma passaria de distancia_max)"""
+    q, a = divmod(distancia_max, BLOCOS)
+    return [q if bloco <= a else q - 1 for bloco in range(BLOCOS)]
+
+class IndiceHamming:
+    """ids -> hash de 64 bits, com busca de todos a até N bits de um hash"""
+
+    def __init__(self):
+        self.hashes = {}
+        # bloco -> valor do bloco -> {id: hash}: o hash inteiro fica junto para conferir sem outra consulta
+        self.blocos = [defaultdict(dict) for _ in range(BLOCOS)]
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def _chaves(self, valor):
+        return [(valor >> (bloco * BITS_BLOCO)) & MASCARA_BLOCO for bloco in range(BLOCOS)]
+
+    def incluir(self, registro_id, valor):
+        self.remover(registro_id)
+        valor &= MASCARA_64
+        self.hashes[registro_id] = valor
+        for tabela, chave in zip(self.blocos, self._chaves(valor)):
+            tabela[chave][registro_id] = valor
+
+    def remover(self, registro_id):
+        valor = self.hashes.pop(registro_id, None)
+        if valor is None:
+            return
+        for tabela, chave in zip(self.blocos, self._chaves(valor)):
+            balde = tabela[chave]
+            del balde[registro_id]
+            if not balde:
+                del tabela[chave]
+
+    def buscar(self, valor, distancia_max=SEMELHANCA_DISTANCIA_MAX):
+        """[(distância, id)] a até distancia_max bits, do mais parecido para o menos"""
+        valor &= MASCARA_64
+        encontrados = {}
+        for tabela, chave, raio in zip(self.blocos, self._chaves(valor), _raios(distancia_max)):
+            for mascara in _variacoes(raio):
+                balde = tabela.get(chave ^ mascara)
+                if balde:
+                    for registro_id, outro in balde.items():
+                        bits = (outro ^ valor).bit_count()
+                        if bits <= distancia_max:
+                            encontrados[registro_id] = bits
+        return sorted((bits, registro_id) for registro_id, bits in encontrados.items())
+
+# --- índices do processo (um por tabela, compartilhados entre as sessões do Streamlit) ---
+
+_MODELOS = {ItemDoacao.__tablename__: ItemDoacao, Pet.__tablename__: Pet}
+_indices = {}
+_pendentes = {tabela: set() for tabela in _MODELOS}
+_recarregar = set()
+_lock = threading.Lock()
+_lock_pendentes = threading.Lock()
+
+def carregar(conn, modelo):
+    indice = IndiceHamming()
+    for registro_id, valor in conn.execute(select(modelo.id, modelo.foto_phash)
+                                           .where(modelo.foto_phash.isnot(None))):
+        indice.incluir(registro_id, valor)
+    return indice
+
+def obter_indice(modelo):
+    """Índice da tabela: carregado no primeiro uso e depois só atualizado com as linhas alteradas"""
+    tabela = modelo.__tablename__
+    with _lock:
+        with _lock_pendentes:
+            ids = set(_pendentes[tabela])
+            _pendentes[tabela].clear()
+            recarregar = tabela in _recarregar
+            _recarregar.discard(tabela)
+        # Só duas colunas, sem ORM: uma conexão basta (nada da sessão de leitura)
+        if tabela not in _indices or recarregar:
+            with engine.connect() as conn:
+                _indices[tabela] = carregar(conn, modelo)
+        elif ids:
+            indice = _indices[tabela]
+            with engine.connect() as conn:
+                atuais = dict(conn.execute(select(modelo.id, modelo.foto_phash).where(modelo.id.in_(ids))).all())
+            for registro_id in ids:
+                if atuais.get(registro_id) is None:
+                    indice.remover(registro_id)
+                else:
+                    indice.incluir(registro_id, atuais[registro_id])
+        return _indices[tabela]
+
+@ao_confirmar
+def _marcar_pendentes(alteracoes):
+    # Só guarda os ids; o índice relê essas linhas no próximo uso
+    with _lock_pendentes:
+        for tabela, tipos in alteracoes.items():
+            if tabela not in _pendentes:
+                continue
+            for ids in tipos.values():
+                if ids is None:
+                    _recarregar.add(tabela)
+                else:
+                    _pendentes[tabela].update(i for i in ids if i is not None)
+
+def fotos_parecidas(modelo, valor, distancia_max=SEMELHANCA_DISTANCIA_MAX):
+    """[(distância, id)] das linhas de `modelo` com foto parecida com o hash `valor`"""
+    return obter_indice(modelo).buscar(valor, distancia_max)
+
+def possiveis_correspondencias(session, pets, limite=SUGESTOES_POR_PET):
+    """{pet_id: [(distância, Pet)]} para os pets perdidos/encontrados da lista
+
+    Uma consulta só (os candidatos de todos os pets juntos), e nenhuma se a foto
+    de nenhum deles se parece com outra.
+    """
+    indice = obter_indice(Pet)
+    candidatos = {}
+    for pet in pets:
+        if pet.situacao in SITUACOES_OPOSTAS and pet.foto_phash is not None:
+            parecidos = [(bits, pet_id) for bits, pet_id in indice.buscar(pet.foto_phash) if pet_id != pet.id]
+            if parecidos:
+                candidatos[pet.id] = (pet, parecidos)
+    ids = {pet_id for _, parecidos in candidatos.values() for _, pet_id in parecidos}
+    if not ids:
+        return {}
+    outros = {outro.id: outro for outro in session.query(Pet).filter(Pet.id.in_(ids))}
+    resultado = {}
+    for pet_id, (pet, parecidos) in candidatos.items():
+        situacao = SITUACOES_OPOSTAS[pet.situacao]
+        sugestoes = [(bits, outros[outro_id]) for bits, outro_id in parecidos
+                     if outro_id in outros and outros[outro_id].situacao == situacao
+                     and outros[outro_id].especie == pet.especie]
+        if sugestoes:
+            resultado[pet_id] = sugestoes[:limite]
+    return resultado